@@ -1,95 +1,1005 @@
-# app/database.py
 import os
+import time
+import asyncio
 import logging
+import threading
+import itertools
+import functools
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, asynccontextmanager
 import psycopg2
+import psycopg2.pool
+import psycopg2.extensions
 from psycopg2.extras import RealDictCursor
 from fastapi import HTTPException
-from .utils.env import get_db_config
+from .utils.env import (
+    get_db_config, get_pool_config, get_executor_config, get_metrics_config, get_tracing_config, get_replica_config,
+)
+from .utils.metrics import query_name, observe_db
+from .utils.tracing import span, start_statement, extend_statement, finish_statement
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def get_db_connection():
-    """Establish connection to PostgreSQL database"""
-    try:
-        # Get connection parameters from environment variables
-        config = get_db_config()
-        db_host = config["host"]
-        db_port = config["port"]
-        db_name = config["dbname"]
-        db_user = config["user"]
-        db_password = config["password"]
-                
-        if not db_host or not db_name or not db_user:
-            raise ValueError("Missing required database connection parameters")
-            
+def _instrumented_cursor(factory):
+    metrics = get_metrics_config()["enabled"]
+    tracing = get_tracing_config()["enabled"]
+
+    class InstrumentedCursor(factory):
+        _query_name = "unknown"
+        _statement = None
+
+        def _finish_statement(self):
+            if self._statement is not None:
+                finish_statement(self._statement)
+                self._statement = None
+
+        def _observe_fetch(self, started, rows):
+            elapsed = time.perf_counter() - started
+            if metrics:
+                observe_db(self._query_name, "fetch", elapsed, rows, self.connection.backend)
+            if self._statement is not None:
+                extend_statement(self._statement, elapsed, rows)
+
+        def execute(self, query, vars=None):
+            self._finish_statement()
+            self._query_name = query_name()
+            started = time.perf_counter()
+            try:
+                return super().execute(query, vars)
+            finally:
+                elapsed = time.perf_counter() - started
+                if metrics:
+                    observe_db(self._query_name, "execute", elapsed, backend=self.connection.backend)
+                if tracing:
+                    self._statement = start_statement(self._query_name, query, vars, elapsed, self.connection.backend)
+
+        def fetchone(self):
+            started = time.perf_counter()
+            row = super().fetchone()
+            self._observe_fetch(started, 0 if row is None else 1)
+            return row
+
+        def fetchmany(self, *args, **kwargs):
+            started = time.perf_counter()
+            rows = super().fetchmany(*args, **kwargs)
+            self._observe_fetch(started, len(rows))
+            return rows
+
+        def fetchall(self):
+            started = time.perf_counter()
+            rows = super().fetchall()
+            self._observe_fetch(started, len(rows))
+            return rows
+
+        def close(self):
+            self._finish_statement()
+            return super().close()
+
+    InstrumentedCursor.__name__ = f"Instrumented{factory.__name__}"
+    return InstrumentedCursor
+
+_instrumented_cursors = {}
+
+class InstrumentedConnection(psycopg2.extensions.connection):
+    """
+    Connection whose cursors report execute/fetch time and rows to
+    app/utils/metrics.py and to the request trace (app/utils/tracing.py).
+
+    Works for any cursor_factory, including the ones passed to cursor().
+    A statement is complete (and checked against the slow-query log) when
+    its cursor runs the next one or is closed. Statements are labelled with
+    the connection's `backend` (the name of the pool that opened it).
+    """
+
+    backend = "primary"
+
+    def cursor(self, *args, **kwargs):
+        factory = kwargs.get("cursor_factory") or self.cursor_factory or psycopg2.extensions.cursor
+        instrumented = _instrumented_cursors.get(factory)
+        if instrumented is None:
+            instrumented = _instrumented_cursors[factory] = _instrumented_cursor(factory)
+        kwargs["cursor_factory"] = instrumented
+        return super().cursor(*args, **kwargs)
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the acquire timeout"""
+
+class ConnectionPool:
+    """
+    Thread-safe PostgreSQL connection pool.
+
+    Keeps up to `max_size` connections open, pre-opens `min_size` of them, and
+    hands them out through `connection()`. Idle connections are health-checked
+    before reuse so a dropped server session never reaches a router.
+    `connection_factory` is passed to psycopg2.connect (tools use it to
+    observe the statements the app sends). `name` identifies the server in
+    traces and metrics ("primary" or a replica's address).
+    """
+
+    def __init__(self, config, min_size=1, max_size=10, acquire_timeout=10.0,
+                 health_check_interval=30.0, connection_factory=None, name="primary"):
+        self._config = config
+        self.name = name
+        self.connection_factory = connection_factory
+        self.min_size = min_size
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.health_check_interval = health_check_interval
+
+        self._idle = deque()  # (connection, returned_at)
+        self._in_use = 0
+        self._waiting = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+        self._stats = {
+            "connections_created": 0,
+            "connections_discarded": 0,
+            "acquired": 0,
+            "timeouts": 0,
+            "health_check_failures": 0,
+            "total_wait_ms": 0.0,
+        }
+
+        for _ in range(self.min_size):
+            self._idle.append((self._connect(), time.monotonic()))
+
+    def _connect(self):
         conn = psycopg2.connect(
-            host=db_host,
-            port=db_port,
-            database=db_name,
-            user=db_user,
-            password=db_password,
+            host=self._config["host"],
+            port=self._config["port"],
+            database=self._config["dbname"],
+            user=self._config["user"],
+            password=self._config["password"],
+            connect_timeout=self._config.get("connect_timeout"),
+            connection_factory=self.connection_factory,
             cursor_factory=RealDictCursor
         )
-        
-        logger.info("Database connection successful")
+        if isinstance(conn, InstrumentedConnection):
+            conn.backend = self.name
+        with self._cond:
+            self._stats["connections_created"] += 1
         return conn
-        
+
+    def _discard(self, conn):
+        with self._cond:
+            self._stats["connections_discarded"] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, conn, idle_since):
+        """Check a connection taken from the idle list before handing it out"""
+        if conn.closed:
+            return False
+        if time.monotonic() - idle_since < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            with self._cond:
+                self._stats["health_check_failures"] += 1
+            return False
+
+    def getconn(self, timeout=None):
+        """
+        Take a connection from the pool, opening a new one if below max_size.
+
+        Args:
+            timeout: Seconds to wait for a free connection (default:
+                acquire_timeout); 0 raises PoolTimeout right away
+        """
+        started = time.monotonic()
+        wait_limit = self.acquire_timeout if timeout is None else timeout
+        deadline = started + wait_limit
+        with self._cond:
+            self._waiting += 1
+            try:
+                while True:
+                    if self._closed:
+                        raise psycopg2.pool.PoolError("connection pool is closed")
+                    if self._idle or self._in_use + len(self._idle) < self.max_size:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        if wait_limit > 0:
+                            self._stats["timeouts"] += 1
+                        raise PoolTimeout(
+                            f"Timed out after {wait_limit}s waiting for a database connection"
+                        )
+                    self._cond.wait(remaining)
+                idle = self._idle.popleft() if self._idle else None
+                self._in_use += 1
+            finally:
+                self._waiting -= 1
+
+        # Connect and health-check outside the lock so other threads are not held up
+        try:
+            conn = None
+            if idle is not None:
+                conn, idle_since = idle
+                if not self._is_healthy(conn, idle_since):
+                    self._discard(conn)
+                    conn = None
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._stats["acquired"] += 1
+            self._stats["total_wait_ms"] += (time.monotonic() - started) * 1000
+        return conn
+
+    def putconn(self, conn):
+        """Return a connection to the pool, rolling back any open transaction"""
+        keep = not self._closed and not conn.closed
+        if keep:
+            try:
+                status = conn.info.transaction_status
+                if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                    keep = False
+                elif status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                keep = False
+
+        with self._cond:
+            self._in_use -= 1
+            if keep and not self._closed:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                self._discard(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Context manager that borrows a connection and always gives it back"""
+        conn = self.getconn()
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def close(self):
+        """Close every idle connection and refuse further checkouts"""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.popleft()
+                self._discard(conn)
+            self._cond.notify_all()
+
+    def stats(self):
+        """Return a snapshot of pool usage counters"""
+        with self._cond:
+            acquired = self._stats["acquired"]
+            return {
+                "name": self.name,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._in_use + len(self._idle),
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "acquire_timeout": self.acquire_timeout,
+                "connections_created": self._stats["connections_created"],
+                "connections_discarded": self._stats["connections_discarded"],
+                "acquired": acquired,
+                "timeouts": self._stats["timeouts"],
+                "health_check_failures": self._stats["health_check_failures"],
+                "avg_wait_ms": round(self._stats["total_wait_ms"] / acquired, 3) if acquired else 0.0,
+                "closed": self._closed,
+            }
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def init_db_pool(connection_factory=None):
+    """
+    Create the application-wide connection pool (called at startup).
+
+    Args:
+        connection_factory: psycopg2 connection class for the pooled connections
+            (default: InstrumentedConnection when METRICS_ENABLED or TRACING_ENABLED)
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            return _pool
+
+        config = get_db_config()
+        if not config["host"] or not config["dbname"] or not config["user"]:
+            raise ValueError("Missing required database connection parameters")
+
+        if connection_factory is None and (get_metrics_config()["enabled"] or get_tracing_config()["enabled"]):
+            connection_factory = InstrumentedConnection
+
+        pool_config = get_pool_config()
+        _pool = ConnectionPool(
+            config,
+            min_size=pool_config["min_size"],
+            max_size=pool_config["max_size"],
+            acquire_timeout=pool_config["acquire_timeout"],
+            health_check_interval=pool_config["health_check_interval"],
+            connection_factory=connection_factory,
+        )
+        logger.info(
+            f"Database pool created (min={_pool.min_size}, max={_pool.max_size}, "
+            f"timeout={_pool.acquire_timeout}s)"
+        )
+        _init_replicas(connection_factory)
+        return _pool
+
+def close_db_pool():
+    """Close the application-wide connection pool (called at shutdown)"""
+    global _pool, _replicas
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+            logger.info("Database pool closed")
+        if _replicas is not None:
+            _replicas.close()
+            _replicas = None
+
+def get_pool_stats():
+    """Return pool statistics, or None if the pool has not been created"""
+    return _pool.stats() if _pool is not None else None
+
+REPLICA_LAG_SQL = """
+    SELECT pg_is_in_recovery() AS standby,
+           CASE
+               WHEN NOT pg_is_in_recovery() THEN 0
+               -- Everything received is replayed: caught up, however old the last commit is
+               WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+               ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+           END AS lag
+"""
+
+class Replica:
+    """
+    A read replica: its own connection pool and the result of the last lag check.
+
+    A replica is unavailable until its first check succeeds, and again after
+    a check or a checkout fails, until the next check succeeds.
+    """
+
+    def __init__(self, config, max_size, acquire_timeout, health_check_interval, connection_factory=None):
+        self.name = f"{config['host']}:{config['port']}/{config['dbname']}"
+        # No connections at startup: a replica that is down must not stop the app
+        self.pool = ConnectionPool(
+            config,
+            min_size=0,
+            max_size=max_size,
+            acquire_timeout=acquire_timeout,
+            health_check_interval=health_check_interval,
+            connection_factory=connection_factory,
+            name=self.name,
+        )
+        self.available = False
+        self.standby = None
+        self.lag = None
+        self.checked_at = None
+        self.error = None
+
+    def check(self):
+        """Measure the replica's lag behind its primary"""
+        try:
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(REPLICA_LAG_SQL)
+                row = cursor.fetchone()
+                cursor.close()
+        except PoolTimeout:
+            # Busy, not broken: keep the last known state
+            return
+        except psycopg2.Error as e:
+            self.mark_unavailable(e)
+            return
+
+        if self.available is False and self.checked_at is not None:
+            logger.info(f"Replica {self.name} is available again")
+        if not row["standby"] and self.standby is not False:
+            logger.warning(f"Replica {self.name} is not in recovery; reads are served from it without lag checks")
+        self.standby = row["standby"]
+        self.lag = float(row["lag"]) if row["lag"] is not None else None
+        self.error = None
+        self.available = True
+        self.checked_at = time.time()
+
+    def mark_unavailable(self, error):
+        # libpq messages span several lines
+        message = " ".join(str(error).split())
+        if self.available:
+            logger.warning(f"Replica {self.name} unavailable: {message}")
+        self.available = False
+        self.error = message
+        self.checked_at = time.time()
+
+    def load(self):
+        """Share of the replica's pool that is busy or waited for"""
+        stats = self.pool.stats()
+        return (stats["in_use"] + stats["waiting"]) / stats["max_size"]
+
+    def status(self):
+        return {
+            "name": self.name,
+            "available": self.available,
+            "standby": self.standby,
+            "lag_seconds": self.lag,
+            "checked_at": self.checked_at,
+            "error": self.error,
+            "pool": self.pool.stats(),
+        }
+
+class ReplicaSet:
+    """
+    Read replicas for the routes marked with `replica_reads`, and the choice between them.
+
+    Replicas that are available and no more than `max_lag` seconds behind
+    are eligible. `round_robin` takes them in turn; `least_loaded` takes the
+    one with the smallest share of its pool in use (ties in turn). When
+    none is eligible, or the chosen one fails, the primary serves the call.
+
+    Args:
+        replicas: List of Replica
+        strategy: "round_robin" or "least_loaded"
+        max_lag: Seconds of replication lag beyond which a replica is skipped
+    """
+
+    def __init__(self, replicas, strategy="round_robin", max_lag=30.0):
+        self.replicas = replicas
+        self.strategy = strategy
+        self.max_lag = max_lag
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+        self._served = {replica.name: 0 for replica in replicas}
+        self._fallbacks = {"no_replica": 0, "unavailable": 0, "error": 0}
+
+    def eligible(self):
+        return [
+            replica for replica in self.replicas
+            if replica.available and replica.lag is not None and replica.lag <= self.max_lag
+        ]
+
+    def choose(self):
+        """Replica for the next call, or None to use the primary"""
+        candidates = self.eligible()
+        if not candidates:
+            self.fallback("no_replica")
+            return None
+        start = next(self._turn) % len(candidates)
+        candidates = candidates[start:] + candidates[:start]
+        if self.strategy == "least_loaded":
+            return min(candidates, key=lambda replica: replica.load())
+        return candidates[0]
+
+    def served(self, replica):
+        with self._lock:
+            self._served[replica.name] += 1
+
+    def fallback(self, reason):
+        with self._lock:
+            self._fallbacks[reason] += 1
+
+    def check(self):
+        """Check every replica's availability and lag"""
+        for replica in self.replicas:
+            replica.check()
+
+    def close(self):
+        for replica in self.replicas:
+            replica.pool.close()
+
+    def status(self):
+        with self._lock:
+            served, fallbacks = dict(self._served), dict(self._fallbacks)
+        return {
+            "strategy": self.strategy,
+            "max_lag_seconds": self.max_lag,
+            "replicas": [{**replica.status(), "served": served[replica.name]} for replica in self.replicas],
+            "primary_fallbacks": fallbacks,
+        }
+
+_replicas = None
+
+def _init_replicas(connection_factory):
+    global _replicas
+    config = get_replica_config()
+    if not config["replicas"]:
+        return
+    pool_config = get_pool_config()
+    replicas = [
+        Replica(
+            replica_config,
+            max_size=config["max_size"],
+            acquire_timeout=pool_config["acquire_timeout"],
+            health_check_interval=pool_config["health_check_interval"],
+            connection_factory=connection_factory,
+        )
+        for replica_config in config["replicas"]
+    ]
+    _replicas = ReplicaSet(replicas, config["strategy"], config["max_lag"])
+    _replicas.check()
+    logger.info(
+        f"Read replicas: {', '.join(replica.name for replica in replicas)} "
+        f"({config['strategy']}, max lag {config['max_lag']}s, {len(_replicas.eligible())} eligible)"
+    )
+
+def get_replica_status():
+    """Return replica state and routing counters, or None if no replicas are configured"""
+    return _replicas.status() if _replicas is not None else None
+
+async def monitor_replicas():
+    """Re-check replica availability and lag every DB_REPLICA_CHECK_INTERVAL seconds"""
+    interval = get_replica_config()["check_interval"]
+    executor = _executor or init_db_executor()
+    loop = asyncio.get_running_loop()
+    while _replicas is not None and interval > 0:
+        await asyncio.sleep(interval)
+        replicas = _replicas
+        if replicas is None:
+            return
+        try:
+            await loop.run_in_executor(executor, replicas.check)
+        except Exception as e:
+            logger.error(f"Replica check failed: {str(e)}")
+
+# Set while a route marked with replica_reads runs; run_db copies it into the worker
+_replica_reads = contextvars.ContextVar("replica_reads", default=False)
+
+def replica_reads(func):
+    """
+    Send the database work of a read-only route handler to the read replicas.
+
+    Apply below the router decorator. run_db, stream_db and db_snapshot
+    calls made by the handler are served by a replica chosen by the
+    ReplicaSet when one is configured and eligible, by the primary otherwise.
+    The handler must not write.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        token = _replica_reads.set(True)
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            _replica_reads.reset(token)
+
+    return wrapper
+
+def _routed_replica():
+    # Replica for a call made in the current context, or None for the primary
+    replicas = _replicas
+    if replicas is None or not _replica_reads.get():
+        return None
+    return replicas.choose()
+
+def _replica_connection(replica):
+    """Borrow a connection from a replica, or None (replica marked unavailable) if that fails"""
+    try:
+        return replica.pool.getconn()
+    except PoolTimeout:
+        _replicas.fallback("unavailable")
+        return None
+    except psycopg2.Error as e:
+        replica.mark_unavailable(e)
+        _replicas.fallback("unavailable")
+        return None
+
+@contextmanager
+def db_connection():
+    """
+    Borrow a pooled database connection.
+
+    Usage:
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            ...
+
+    The connection is returned to the pool (and any open transaction rolled
+    back) when the block exits.
+    """
+    try:
+        pool = _pool or init_db_pool()
+        conn = pool.getconn()
+
     except ValueError as ve:
         error_msg = f"Database configuration error: {str(ve)}"
         logger.error(error_msg)
         raise HTTPException(status_code=500, detail=error_msg)
-        
+
+    except PoolTimeout as e:
+        error_msg = f"Database busy: {str(e)}"
+        logger.error(error_msg)
+        raise HTTPException(status_code=503, detail=error_msg)
+
     except psycopg2.OperationalError as e:
         error_msg = f"Could not connect to database: {str(e)}"
         logger.error(error_msg)
         raise HTTPException(status_code=500, detail=error_msg)
-        
+
     except Exception as e:
         error_msg = f"Database connection error: {str(e)}"
         logger.error(error_msg)
         raise HTTPException(status_code=500, detail=error_msg)
 
-def test_db_connection():
-    """Test the database connection and return details"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Get PostgreSQL version
-        cursor.execute("SELECT version();")
-        version = cursor.fetchone()["version"]
-        
-        # Check if required tables exist
-        cursor.execute("""
-            SELECT table_name 
-            FROM information_schema.tables 
-            WHERE table_schema = 'public_data' 
-            AND table_name IN ('thai_govt_project', 'thai_project_bid_info');
-        """)
-        tables = [row["table_name"] for row in cursor.fetchall()]
-        
-        # Get row counts
-        table_counts = {}
-        for table in tables:
-            cursor.execute(f"SELECT COUNT(*) as count FROM public_data.{table}")
-            count = cursor.fetchone()["count"]
-            table_counts[table] = count
-        
-        # Close connection
+        yield conn
+    finally:
+        pool.putconn(conn)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def init_db_executor():
+    """
+    Create the bounded thread pool that runs blocking database work.
+
+    Route handlers are `async def`, so psycopg2 calls must never run on the
+    event loop. Every query goes through this executor instead; its size
+    defaults to the connection pool's max_size so a worker never waits on
+    the pool while holding a thread.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = get_executor_config()["max_workers"]
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db")
+            logger.info(f"Database executor created (workers={workers})")
+        return _executor
+
+def close_db_executor():
+    """Shut down the database executor, waiting for running queries"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+            logger.info("Database executor closed")
+
+def _call_name(func):
+    # Trace span name, e.g. winrates._load_bid_strategy
+    return f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+def _call_with_connection(func, args, kwargs):
+    with span(_call_name(func)) as current:
+        replica = _routed_replica()
+        conn = _replica_connection(replica) if replica is not None else None
+        if conn is not None:
+            try:
+                result = func(conn, *args, **kwargs)
+            except psycopg2.OperationalError as e:
+                # Lost connection or a query cancelled by recovery: the primary answers instead
+                if conn.closed:
+                    replica.mark_unavailable(e)
+                _replicas.fallback("error")
+                logger.warning(f"{_call_name(func)} failed on replica {replica.name}, retrying on the primary: {' '.join(str(e).split())}")
+            else:
+                _replicas.served(replica)
+                if current is not None:
+                    current.backend = replica.name
+                return result
+            finally:
+                replica.pool.putconn(conn)
+
+        if current is not None:
+            current.backend = "primary"
+        with db_connection() as conn:
+            return func(conn, *args, **kwargs)
+
+async def run_db(func, *args, **kwargs):
+    """
+    Run `func(conn, *args, **kwargs)` on the database executor.
+
+    A pooled connection is borrowed inside the worker thread and returned
+    when `func` finishes, so the event loop never blocks on the driver.
+    Inside a `replica_reads` handler the connection comes from a read
+    replica; if that fails with an OperationalError, `func` is run again on
+    the primary.
+
+    Args:
+        func: Synchronous function taking a connection as first argument
+
+    Returns:
+        Whatever `func` returns
+    """
+    executor = _executor or init_db_executor()
+    loop = asyncio.get_running_loop()
+    # Carry the request's context variables (metrics, tracing) into the worker
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        executor, context.run, functools.partial(_call_with_connection, func, args, kwargs)
+    )
+
+def _iterate_with_connection(func, args, kwargs):
+    replica = _routed_replica()
+    conn = _replica_connection(replica) if replica is not None else None
+    if conn is None:
+        with db_connection() as conn:
+            yield from func(conn, *args, **kwargs)
+        return
+
+    _replicas.served(replica)
+    try:
+        yield from func(conn, *args, **kwargs)
+    finally:
+        replica.pool.putconn(conn)
+
+async def stream_db(func, *args, **kwargs):
+    """
+    Run the generator `func(conn, *args, **kwargs)` on the database executor.
+
+    The first item is produced before this returns, so connection and query
+    errors still surface as HTTP errors rather than a truncated response.
+    Every later item is pulled on the executor as the client consumes the
+    stream; the pooled connection is held until the stream ends or is closed.
+    Streams are routed like run_db but not retried on the primary.
+
+    Returns:
+        Async iterator over the generator's items
+    """
+    executor = _executor or init_db_executor()
+    loop = asyncio.get_running_loop()
+    generator = _iterate_with_connection(func, args, kwargs)
+    done = object()
+    context = contextvars.copy_context()
+    first = await loop.run_in_executor(executor, context.run, next, generator, done)
+
+    async def iterate():
+        try:
+            item = first
+            while item is not done:
+                yield item
+                item = await loop.run_in_executor(executor, context.run, next, generator, done)
+        finally:
+            await loop.run_in_executor(executor, context.run, generator.close)
+
+    return iterate()
+
+def _export_snapshot(conn):
+    cursor = conn.cursor()
+    cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+    cursor.execute("SELECT pg_export_snapshot() AS snapshot_id")
+    snapshot_id = cursor.fetchone()["snapshot_id"]
+    cursor.close()
+    return snapshot_id
+
+def _import_snapshot(conn, snapshot_id):
+    cursor = conn.cursor()
+    cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+    cursor.execute("SET TRANSACTION SNAPSHOT %s", (snapshot_id,))
+    cursor.close()
+
+class DbSnapshot:
+    """
+    One consistent view of the database shared by several connections.
+
+    The exporting connection opens a REPEATABLE READ transaction and exports
+    its snapshot; `run()` executes work on other pooled connections that
+    import it, so concurrent queries all see the same data. When the pool
+    has no free connection, the work runs on the exporting connection
+    instead (one call at a time) rather than waiting, so a busy pool cannot
+    deadlock on connections held by exporters.
+
+    Use through `db_snapshot()`.
+    """
+
+    def __init__(self, pool, conn, snapshot_id):
+        self.pool = pool
+        self.snapshot_id = snapshot_id
+        self._conn = conn
+        self._conn_lock = threading.Lock()
+
+    def _call(self, func, args, kwargs):
+        with span(_call_name(func)) as current:
+            if current is not None:
+                current.backend = self.pool.name
+            try:
+                conn = self.pool.getconn(timeout=0)
+            except PoolTimeout:
+                conn = None
+
+            if conn is None:
+                with self._conn_lock:
+                    return func(self._conn, *args, **kwargs)
+
+            try:
+                _import_snapshot(conn, self.snapshot_id)
+                return func(conn, *args, **kwargs)
+            finally:
+                self.pool.putconn(conn)
+
+    async def run(self, func, *args, **kwargs):
+        """Run `func(conn, *args, **kwargs)` on the executor inside the snapshot"""
+        executor = _executor or init_db_executor()
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            executor, context.run, functools.partial(self._call, func, args, kwargs)
+        )
+
+@asynccontextmanager
+async def db_snapshot():
+    """
+    Export a consistent snapshot for the duration of the block.
+
+    Usage:
+        async with db_snapshot() as snapshot:
+            a, b = await asyncio.gather(snapshot.run(load_a), snapshot.run(load_b))
+
+    Inside a `replica_reads` handler the whole snapshot is taken on one
+    replica (snapshots are per server).
+    """
+    executor = _executor or init_db_executor()
+    loop = asyncio.get_running_loop()
+    replica = _routed_replica()
+    conn = await loop.run_in_executor(executor, _replica_connection, replica) if replica is not None else None
+    if conn is not None:
+        _replicas.served(replica)
+        pool = replica.pool
+        release = functools.partial(pool.putconn, conn)
+    else:
+        holder = db_connection()
+        conn = await loop.run_in_executor(executor, holder.__enter__)
+        pool = _pool
+        release = functools.partial(holder.__exit__, None, None, None)
+    try:
+        snapshot_id = await loop.run_in_executor(executor, _export_snapshot, conn)
+        yield DbSnapshot(pool, conn, snapshot_id)
+    finally:
+        await loop.run_in_executor(executor, release)
+
+def _fetch_all(conn, query, params):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query, params)
+        return cursor.fetchall()
+    finally:
         cursor.close()
-        conn.close()
-        
-        return {
-            "status": "connected",
-            "version": version,
-            "tables": tables,
-            "row_counts": table_counts
-        }
-        
-    except Exception as e:
-        return {
-            "status": "error",
-            "message": str(e)
-        }
\ No newline at end of file
+
+# NUMERIC as float for the columnar encodings (JSON renders it as a float anyway)
+_NUMERIC_AS_FLOAT = psycopg2.extensions.new_type(
+    psycopg2.extensions.DECIMAL.values,
+    "NUMERIC_AS_FLOAT",
+    lambda value, cursor: float(value) if value is not None else None,
+)
+
+def _fetch_columns(conn, query, params):
+    # Tuple rows transposed into columns: no per-row dicts
+    cursor = conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+    psycopg2.extensions.register_type(_NUMERIC_AS_FLOAT, cursor)
+    try:
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        description = cursor.description
+        columns = list(zip(*rows)) if rows else [() for _ in description]
+        return description, columns
+    finally:
+        cursor.close()
+
+class RowSet:
+    """
+    Query result kept as plain tuples plus the column names.
+
+    The renderers in app/utils/serialization.py encode it without building
+    a dict per row; `as_dicts()` is there for code that needs mappings.
+    """
+
+    __slots__ = ("columns", "rows")
+
+    def __init__(self, columns, rows):
+        self.columns = columns
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def as_dicts(self):
+        return [dict(zip(self.columns, row)) for row in self.rows]
+
+def iter_row_batches(conn, query, params=None, batch_size=5000):
+    """
+    Run a query on a server-side cursor and yield its rows in batches.
+
+    Only one batch of rows is in client memory at a time, instead of the
+    whole result twice (libpq buffer plus Python rows).
+
+    Yields:
+        (column names, list of row tuples)
+    """
+    cursor = conn.cursor(name="row_batches", cursor_factory=psycopg2.extensions.cursor)
+    cursor.itersize = batch_size
+    try:
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield tuple(column.name for column in cursor.description), rows
+    finally:
+        cursor.close()
+
+def _fetch_rowset(conn, query, params, batch_size=5000):
+    columns, rows = (), []
+    for columns, batch in iter_row_batches(conn, query, params, batch_size):
+        rows.extend(batch)
+    return RowSet(columns, rows)
+
+def _fetch_one(conn, query, params):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query, params)
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+
+async def fetch_all(query, params=None):
+    """Execute a query off the event loop and return all rows"""
+    return await run_db(_fetch_all, query, params)
+
+async def fetch_one(query, params=None):
+    """Execute a query off the event loop and return the first row (or None)"""
+    return await run_db(_fetch_one, query, params)
+
+async def fetch_rowset(query, params=None):
+    """Execute a query off the event loop and return the rows as a RowSet of tuples"""
+    return await run_db(_fetch_rowset, query, params)
+
+async def fetch_columns(query, params=None):
+    """
+    Execute a query off the event loop and return its result by column.
+
+    Returns:
+        (cursor.description, list with one tuple of values per column)
+    """
+    return await run_db(_fetch_columns, query, params)
+
+def test_db_connection(conn):
+    """
+    Test the database connection and return details.
+
+    Meant for run_db, which supplies the connection; connection errors
+    surface from there to the caller.
+    """
+    cursor = conn.cursor()
+
+    # Get PostgreSQL version
+    cursor.execute("SELECT version();")
+    version = cursor.fetchone()["version"]
+
+    # Check if required tables exist
+    cursor.execute("""
+        SELECT table_name
+        FROM information_schema.tables
+        WHERE table_schema = 'public_data'
+        AND table_name IN ('thai_govt_project', 'thai_project_bid_info');
+    """)
+    tables = [row["table_name"] for row in cursor.fetchall()]
+
+    # Get row counts
+    table_counts = {}
+    for table in tables:
+        cursor.execute(f"SELECT COUNT(*) as count FROM public_data.{table}")
+        count = cursor.fetchone()["count"]
+        table_counts[table] = count
+
+    cursor.close()
+
+    return {
+        "status": "connected",
+        "version": version,
+        "tables": tables,
+        "row_counts": table_counts
+    }
@@ -1,6 +1,6 @@
 # app/models.py
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Union
 import datetime
 
 class ProjectData(BaseModel):
@@ -8,6 +8,8 @@ class ProjectData(BaseModel):
     year: int
     total_sum_price_agree: float
     count: int
+    period: Optional[str] = None
+    period_start: Optional[str] = None
 
 class CompanyProject(BaseModel):
     winner: str
@@ -59,9 +61,76 @@ class DepartmentAnalysis(BaseModel):
     bids: int
     wins: int
     win_rate: float
-    avg_bid_ratio: float
+    # None when no project of the department has a contract value
+    avg_bid_ratio: Optional[float] = None
 
 class BidStrategyResponse(BaseModel):
     company: str
     bid_ratio_stats: BidRatioStats
-    department_analysis: List[DepartmentAnalysis]
\ No newline at end of file
+    department_analysis: List[DepartmentAnalysis]
+
+class AdjacentCompany(BaseModel):
+    tin: str
+    company: str
+    common_bids: int
+    total_bids: int
+    wins: int
+    win_rate: float
+
+class CompanyDashboardResponse(BaseModel):
+    tin: str
+    company: str
+    overview: Optional[CompanyWinRate] = None
+    projects: List[CompanyProject]
+    adjacent_companies: List[AdjacentCompany]
+    head_to_head: Optional[HeadToHeadResponse] = None
+    bid_strategy: Optional[BidStrategyResponse] = None
+    errors: Dict[str, str] = {}
+
+class BidRatioBin(BaseModel):
+    start: float
+    end: float
+    count: int
+
+class BidRatioPosition(BaseModel):
+    tin: str
+    avg_bid_ratio: Optional[float] = None
+    percentile: Optional[float] = None
+
+class BidRatioDistributionResponse(BaseModel):
+    companies: int
+    undefined: int
+    min_bid_ratio: Optional[float] = None
+    max_bid_ratio: Optional[float] = None
+    quantiles: Dict[str, Optional[float]]
+    bins: List[BidRatioBin]
+    company: Optional[BidRatioPosition] = None
+
+class BidRatioQuantile(BaseModel):
+    q: float
+    value: float
+
+class BidRatioQuantilesResponse(BaseModel):
+    company_tins: List[str]
+    outcome: str
+    count: int
+    mean: float
+    std: Optional[float] = None
+    min: float
+    max: float
+    relative_accuracy: float
+    quantiles: List[BidRatioQuantile]
+
+class AnalysisSeries(BaseModel):
+    company_tin: str
+    company_name: Optional[str] = None
+    key: List[Union[str, float, None]]
+    bids: List[int]
+    wins: List[int]
+    total_value: List[Optional[float]]
+    total_bid: List[Optional[float]]
+    avg_price_cut: List[Optional[float]]
+
+class AnalysisSeriesResponse(BaseModel):
+    group_by: str
+    series: List[AnalysisSeries]
@@ -0,0 +1,114 @@
+# app/routers/admin.py
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+import logging
+from ..database import run_db
+from ..services.refresh import refresh_all
+from ..services.company_summary import get_company_summary_status
+from ..services.project_rollup import get_project_rollup_status
+from ..services.bid_ratio_sketch import get_bid_ratio_sketch_status
+from ..services.search_index import get_search_index
+from ..services.cobid_graph import get_cobid_graph
+from ..services.bid_ratio_distribution import get_bid_ratio_distribution
+from ..services.company_directory import get_company_directory
+from ..services.cache import get_response_cache
+from ..utils.tracing import recent_traces, clear_traces
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/api/admin",
+    tags=["admin"],
+    responses={500: {"description": "Internal server error"}},
+)
+
+@router.get("/summaries")
+async def get_summaries_status():
+    """
+    Report when the derived analytics stores were last refreshed and how
+    many source changes are still waiting to be applied.
+    """
+    try:
+        index = get_search_index()
+        graph = get_cobid_graph()
+        distribution = get_bid_ratio_distribution()
+        directory = get_company_directory()
+        return {
+            "company_summary": await run_db(get_company_summary_status),
+            "project_rollup": await run_db(get_project_rollup_status),
+            "bid_ratio_sketch": await run_db(get_bid_ratio_sketch_status),
+            "search_index": index.stats() if index is not None else None,
+            "cobid_graph": graph.stats() if graph is not None else None,
+            "bid_ratio_distribution": distribution.stats() if distribution is not None else None,
+            "company_directory": directory.stats() if directory is not None else None,
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error reading summary status: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error reading summary status: {str(e)}")
+
+@router.post("/refresh-summaries")
+async def refresh_summaries(full: bool = Query(False, description="Rebuild from scratch instead of applying logged changes")):
+    """
+    Refresh the derived analytics stores now.
+
+    Args:
+        full: Rebuild every store from the source tables
+
+    Returns:
+        Per-store refresh results
+    """
+    logger.info(f"Refreshing summaries: full={full}")
+    try:
+        return await run_db(refresh_all, full)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error refreshing summaries: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error refreshing summaries: {str(e)}")
+
+@router.get("/cache")
+async def get_cache_status():
+    """
+    Report response cache size, TTLs and hit/miss/eviction counters.
+    """
+    return get_response_cache().stats()
+
+@router.delete("/cache")
+async def invalidate_cache(endpoint: Optional[str] = Query(None, description="Only drop entries of this endpoint (e.g. head_to_head)")):
+    """
+    Drop cached responses.
+
+    Args:
+        endpoint: Cache policy name; all entries are dropped when omitted
+
+    Returns:
+        Number of entries removed
+    """
+    cache = get_response_cache()
+    if endpoint is not None and endpoint not in cache.ttls:
+        raise HTTPException(status_code=404, detail=f"Unknown cache endpoint: {endpoint}")
+
+    logger.info(f"Invalidating response cache: endpoint={endpoint}")
+    return {"invalidated": cache.invalidate(endpoint)}
+
+@router.get("/traces")
+async def get_traces(limit: int = Query(20, ge=1, le=500, description="Number of traces to return")):
+    """
+    Span trees of the latest requests slower than TRACE_SLOW_REQUEST_MS,
+    newest first: run_db calls, SQL statements and response rendering with
+    their timings.
+    """
+    return recent_traces(limit)
+
+@router.delete("/traces")
+async def delete_traces():
+    """
+    Drop the kept request traces.
+    """
+    clear_traces()
+    return {"cleared": True}
@@ -0,0 +1,145 @@
+# app/routers/dashboard.py
+from fastapi import APIRouter, HTTPException, Query, Response
+import asyncio
+import logging
+import time
+from ..database import db_snapshot, replica_reads
+from ..models import CompanyDashboardResponse
+from ..services.cache import cached
+from ..utils.serialization import render_json
+from ..services.company_summary import require_company_summary
+from ..services.company_directory import company_name_for_tin
+from .search import _load_company_projects, _split_sort_key, _load_adjacent_companies
+from .winrates import _load_head_to_head, _load_bid_strategy
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/api",
+    tags=["dashboard"],
+    responses={404: {"description": "Not found"}},
+)
+
+def _load_company_context(conn, company_tin):
+    """Look up the company name and the projects it bid on, shared by every analysis"""
+    cursor = conn.cursor()
+
+    # Resolve the company name first
+    company_name = company_name_for_tin(cursor, company_tin)
+
+    if company_name is None:
+        raise HTTPException(status_code=404, detail=f"Company with TIN {company_tin} not found")
+
+    # Query to get projects where the company participated
+    cursor.execute(
+        "SELECT DISTINCT project_id FROM public_data.thai_project_bid_info WHERE tin = %s",
+        (company_tin,)
+    )
+    project_ids = [row["project_id"] for row in cursor.fetchall()]
+
+    # Close cursor
+    cursor.close()
+
+    return company_name, project_ids
+
+def _load_overview(conn, company_tin):
+    """Return the company's summary row (the one search-companies shows first)"""
+    cursor = conn.cursor()
+    require_company_summary(cursor)
+
+    cursor.execute(
+        """
+        SELECT
+            tin, company, total_bids, wins, win_rate,
+            total_bid_value, avg_bid, avg_bid_ratio
+        FROM public_data.company_bid_summary
+        WHERE tin = %s
+        ORDER BY total_bids DESC
+        LIMIT 1
+        """,
+        (company_tin,)
+    )
+    result = cursor.fetchone()
+
+    # Close cursor
+    cursor.close()
+
+    return dict(result) if result else None
+
+def _load_projects(conn, company_tin, company_name):
+    rows, _ = _load_company_projects(conn, company_tin, company_name=company_name)
+    return [_split_sort_key(row)[0] for row in rows]
+
+@router.get("/company-dashboard/{company_tin}", response_model=CompanyDashboardResponse)
+@replica_reads
+@cached("company_dashboard", CompanyDashboardResponse)
+async def get_company_dashboard(
+    company_tin: str,
+    top_n: int = Query(5, ge=1, le=20, description="Number of top competitors in head-to-head")
+):
+    """
+    Get every dashboard view of a company in one response.
+
+    The overview, projects, adjacent companies, head-to-head and bid strategy
+    are loaded concurrently on separate connections that share one exported
+    database snapshot, so they are consistent with each other. The company
+    name and project set are looked up once and reused. An analysis that
+    fails is reported under `errors` instead of failing the whole bundle.
+
+    Args:
+        company_tin: Company TIN
+        top_n: Number of top competitors to include in head-to-head
+
+    Returns:
+        Combined dashboard payload
+    """
+    logger.info(f"Getting dashboard for company with TIN: {company_tin}")
+    started = time.monotonic()
+    try:
+        async with db_snapshot() as snapshot:
+            company_name, project_ids = await snapshot.run(_load_company_context, company_tin)
+
+            analyses = {
+                "overview": snapshot.run(_load_overview, company_tin),
+                "projects": snapshot.run(_load_projects, company_tin, company_name),
+                "adjacent_companies": snapshot.run(_load_adjacent_companies, company_tin, project_ids),
+                "head_to_head": snapshot.run(_load_head_to_head, company_tin, top_n, company_name, project_ids),
+                "bid_strategy": snapshot.run(_load_bid_strategy, company_tin, company_name),
+            }
+            results = await asyncio.gather(*analyses.values(), return_exceptions=True)
+
+        dashboard = {
+            "tin": company_tin,
+            "company": company_name,
+            "overview": None,
+            "projects": [],
+            "adjacent_companies": [],
+            "head_to_head": None,
+            "bid_strategy": None,
+            "errors": {},
+        }
+        for name, result in zip(analyses, results):
+            if isinstance(result, HTTPException):
+                dashboard["errors"][name] = result.detail
+            elif isinstance(result, Exception):
+                logger.error(f"Error loading dashboard {name}: {str(result)}")
+                dashboard["errors"][name] = f"Error loading {name}: {str(result)}"
+            else:
+                dashboard[name] = result
+
+        logger.info(
+            f"Dashboard for {company_tin} loaded in {round((time.monotonic() - started) * 1000, 1)}ms "
+            f"(errors: {list(dashboard['errors'])})"
+        )
+
+        # Partial results are returned as-is rather than cached
+        if dashboard["errors"]:
+            return Response(content=render_json(dashboard, CompanyDashboardResponse), media_type="application/json")
+        return dashboard
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error loading company dashboard: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error loading company dashboard: {str(e)}")
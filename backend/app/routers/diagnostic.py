@@ -1,7 +1,8 @@
 # app/routers/diagnostic.py
 from fastapi import APIRouter, HTTPException
 import os
-from ..database import test_db_connection
+from ..database import test_db_connection, get_pool_stats, get_replica_status, run_db
+from ..services.migrations import get_schema_status
 
 router = APIRouter(
     prefix="/api",
@@ -15,8 +16,21 @@ async def check_database_status():
     Check the status of the database connection and return diagnostic information.
     This endpoint is useful for troubleshooting database connectivity issues.
     """
-    # Test database connection
-    db_status = test_db_connection()
+    # Test database connection (on the executor: the row counts scan both source tables)
+    try:
+        db_status = await run_db(test_db_connection)
+    except HTTPException as e:
+        db_status = {"status": "error", "message": e.detail}
+    except Exception as e:
+        db_status = {"status": "error", "message": str(e)}
+
+    # Pending migrations and missing or invalid indexes
+    schema_status = None
+    if db_status["status"] == "connected":
+        try:
+            schema_status = await run_db(get_schema_status)
+        except Exception as e:
+            schema_status = {"status": "error", "message": str(e)}
     
     # Get environment variable information (without exposing passwords)
     env_info = {
@@ -29,5 +43,8 @@ async def check_database_status():
     
     return {
         "database": db_status,
+        "schema": schema_status,
+        "pool": get_pool_stats(),
+        "replicas": get_replica_status(),
         "environment": env_info
     }
\ No newline at end of file
@@ -0,0 +1,67 @@
+# app/routers/metrics.py
+from fastapi import APIRouter, Response
+from ..database import get_pool_stats, get_replica_status
+from ..services.cache import get_response_cache
+from ..utils.metrics import render_metrics, render_family
+
+router = APIRouter(tags=["metrics"])
+
+# Starlette appends "; charset=utf-8"
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+def _pool_lines():
+    stats = get_pool_stats()
+    if stats is None:
+        return []
+    return [
+        *render_family("db_pool_connections", "gauge", "Pooled connections by state",
+                       [(("in_use",), stats["in_use"]), (("idle",), stats["idle"])], ("state",)),
+        *render_family("db_pool_max_connections", "gauge", "Pool size limit", [((), stats["max_size"])]),
+        *render_family("db_pool_waiting", "gauge", "Threads waiting for a connection", [((), stats["waiting"])]),
+        *render_family("db_pool_acquired_total", "counter", "Connections handed out", [((), stats["acquired"])]),
+        *render_family("db_pool_timeouts_total", "counter", "Checkouts that timed out", [((), stats["timeouts"])]),
+        *render_family("db_pool_connections_created_total", "counter", "Connections opened",
+                       [((), stats["connections_created"])]),
+        *render_family("db_pool_connections_discarded_total", "counter", "Connections closed as broken or surplus",
+                       [((), stats["connections_discarded"])]),
+    ]
+
+def _replica_lines():
+    status = get_replica_status()
+    if status is None:
+        return []
+    replicas = status["replicas"]
+    return [
+        *render_family("db_replica_available", "gauge", "1 if the replica passed its last check",
+                       [((replica["name"],), int(replica["available"])) for replica in replicas], ("replica",)),
+        *render_family("db_replica_lag_seconds", "gauge", "Replication lag at the last check",
+                       [((replica["name"],), replica["lag_seconds"]) for replica in replicas
+                        if replica["lag_seconds"] is not None], ("replica",)),
+        *render_family("db_replica_connections_in_use", "gauge", "Replica connections checked out",
+                       [((replica["name"],), replica["pool"]["in_use"]) for replica in replicas], ("replica",)),
+        *render_family("db_replica_calls_total", "counter", "Routed database calls served by each replica",
+                       [((replica["name"],), replica["served"]) for replica in replicas], ("replica",)),
+        *render_family("db_replica_fallbacks_total", "counter", "Routed database calls served by the primary, by reason",
+                       [((reason,), count) for reason, count in status["primary_fallbacks"].items()], ("reason",)),
+    ]
+
+def _cache_lines():
+    stats = get_response_cache().stats()
+    lines = [
+        *render_family("response_cache_entries", "gauge", "Cached responses", [((), stats["entries"])]),
+        *render_family("response_cache_bytes", "gauge", "Size of cached bodies", [((), stats["size_bytes"])]),
+        *render_family("response_cache_max_bytes", "gauge", "Cache byte budget", [((), stats["max_bytes"])]),
+    ]
+    for counter in ("hits", "misses", "evictions", "expirations", "invalidations"):
+        samples = [((endpoint,), counters.get(counter, 0)) for endpoint, counters in stats["endpoints"].items()]
+        lines += render_family(f"response_cache_{counter}_total", "counter", f"Response cache {counter} per endpoint",
+                               samples, ("endpoint",))
+    return lines
+
+@router.get("/metrics", response_class=Response)
+async def get_metrics():
+    """
+    Request latency, response size, SQL timing, pool, replica and cache
+    metrics in the Prometheus text format.
+    """
+    return Response(render_metrics(_pool_lines() + _replica_lines() + _cache_lines()), media_type=CONTENT_TYPE)
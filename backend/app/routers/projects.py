@@ -1,9 +1,15 @@
 # app/routers/projects.py
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Depends, Response
 from typing import List, Optional
+import datetime
 import logging
-from ..database import get_db_connection
+import numpy as np
+from ..database import fetch_all, fetch_columns, fetch_rowset, run_db, replica_reads
 from ..models import ProjectData, CompanyProject
+from ..services.cache import cached
+from ..services.project_rollup import require_project_rollup, rollup_period_query
+from ..services.downsample import downsample
+from ..utils.columnar import COLUMNAR_RESPONSES, negotiate_format, columnar_response
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -14,87 +20,106 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+def _load_period_data(conn, granularity, start_date, end_date, dept_name):
+    """Aggregate the daily project rollup into periods"""
+    cursor = conn.cursor()
+    require_project_rollup(cursor)
+
+    # Execute query
+    query, params = rollup_period_query(granularity, start_date, end_date, dept_name)
+    cursor.execute(query, params)
+    results = cursor.fetchall()
+
+    # Convert to list of dictionaries
+    period_data = [dict(row) for row in results]
+
+    # Close cursor
+    cursor.close()
+
+    return period_data
+
 @router.get("/data", response_model=List[ProjectData])
-async def get_monthly_data(year: Optional[int] = None):
+@replica_reads
+@cached("data", List[ProjectData])
+async def get_monthly_data(
+    year: Optional[int] = None,
+    start_date: Optional[datetime.date] = Query(None, description="First contract date to include (YYYY-MM-DD)"),
+    end_date: Optional[datetime.date] = Query(None, description="Last contract date to include (YYYY-MM-DD)"),
+    granularity: str = Query("month", pattern="^(week|month|quarter|year)$", description="Period to aggregate by"),
+    dept_name: Optional[str] = Query(None, description="Only include projects of this department"),
+    max_points: Optional[int] = Query(None, ge=3, description="Downsample the series to about this many periods"),
+):
     """
-    Get monthly project data.
+    Get project totals per period (monthly by default).
     
     Args:
         year: Optional year filter
+        start_date: Optional first contract date
+        end_date: Optional last contract date
+        granularity: week, month, quarter or year
+        dept_name: Optional department filter
+        max_points: Optional number of periods to keep; the series is
+            downsampled with Largest-Triangle-Three-Buckets on the agreed
+            price, always keeping outlying periods
         
     Returns:
-        List of monthly project data
+        List of project data per period
     """
-    logger.info(f"Getting monthly data: year={year}")
-    conn = None
+    logger.info(
+        f"Getting {granularity} data: year={year}, start_date={start_date}, "
+        f"end_date={end_date}, dept_name={dept_name}"
+    )
     try:
-        # Connect to database
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Base query to get monthly data
-        query = """
-            SELECT 
-                TO_CHAR(contract_date, 'Month') AS month,
-                EXTRACT(YEAR FROM contract_date) AS year,
-                SUM(sum_price_agree) AS total_sum_price_agree,
-                COUNT(project_id) AS count
-            FROM public_data.thai_govt_project
-            WHERE contract_date IS NOT NULL
-        """
-        
-        # Add year filter if specified
-        params = []
+        # A year filter is a date range, so it combines with start/end dates
         if year:
-            query += " AND EXTRACT(YEAR FROM contract_date) = %s"
-            params.append(year)
-        
-        # Group and order
-        query += """
-            GROUP BY month, year
-            ORDER BY year, TO_CHAR(TO_DATE(month, 'Month'), 'MM')
-        """
-        
-        # Execute query
-        cursor.execute(query, params)
-        results = cursor.fetchall()
-        
-        # Convert to list of dictionaries
-        monthly_data = [dict(row) for row in results]
-        
-        logger.info(f"Found {len(monthly_data)} months of data")
-        
-        # Close connection
-        cursor.close()
-        
-        return monthly_data
+            year_start, year_end = datetime.date(year, 1, 1), datetime.date(year, 12, 31)
+            start_date = max(start_date, year_start) if start_date else year_start
+            end_date = min(end_date, year_end) if end_date else year_end
+
+        if start_date and end_date and start_date > end_date:
+            return []
+
+        period_data = await run_db(_load_period_data, granularity, start_date, end_date, dept_name)
+
+        logger.info(f"Found {len(period_data)} periods of data")
+
+        if max_points is not None and len(period_data) > max_points:
+            x = np.array([row["period_start"] for row in period_data], dtype="datetime64[D]").astype(np.float64)
+            y = np.array([float(row["total_sum_price_agree"] or 0) for row in period_data])
+            period_data = [period_data[i] for i in downsample(x, y, max_points)]
+            logger.info(f"Downsampled to {len(period_data)} periods")
+
+        return period_data
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing data: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing data: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
-            logger.info("Database connection closed")
 
-@router.get("/company-projects", response_model=List[CompanyProject])
-async def get_company_projects(limit: int = Query(20, ge=1, le=100)):
+@router.get("/company-projects", response_model=List[CompanyProject], responses=COLUMNAR_RESPONSES)
+@replica_reads
+@cached("company_projects_top", List[CompanyProject], fast=True)
+async def get_company_projects(
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    output_format: str = Depends(negotiate_format)
+):
     """
     Get top companies and their projects.
+
+    Sends Arrow IPC or msgpack columns instead of JSON when the Accept
+    header asks for them.
     
     Args:
         limit: Number of top companies to include (default: 20)
+        output_format: Encoding negotiated from the Accept header
         
     Returns:
         List of company projects
     """
     logger.info(f"Getting top company projects: limit={limit}")
-    conn = None
     try:
-        # Connect to database
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         # Query to get top companies and their projects
         query = """
             WITH company_totals AS (
@@ -120,24 +145,20 @@ async def get_company_projects(limit: int = Query(20, ge=1, le=100)):
             ORDER BY p.sum_price_agree DESC
         """
         
-        # Execute query
-        cursor.execute(query, (limit,))
-        results = cursor.fetchall()
-        
-        # Convert to list of dictionaries
-        company_projects = [dict(row) for row in results]
+        if output_format != "json":
+            description, columns = await fetch_columns(query, (limit,))
+            return columnar_response(output_format, description, columns)
+
+        # Tuple rows, rendered by column position
+        company_projects = await fetch_rowset(query, (limit,))
         
         logger.info(f"Found {len(company_projects)} company projects")
         
-        # Close connection
-        cursor.close()
-        
+        response.headers["Vary"] = "Accept"
         return company_projects
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing data: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error processing data: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
-            logger.info("Database connection closed")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error processing data: {str(e)}")
\ No newline at end of file
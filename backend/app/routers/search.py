@@ -1,10 +1,23 @@
 # app/routers/search.py
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
+from pydantic import BaseModel
+import json
+import time
 import logging
+from json.encoder import encode_basestring
 import traceback
-from ..database import get_db_connection
+from ..database import fetch_all, run_db, stream_db, iter_row_batches, replica_reads
 from ..models import CompanyWinRate, CompanyProject
+from ..services.company_summary import require_company_summary
+from ..services.search_index import get_search_index
+from ..services.cobid_graph import get_cobid_graph
+from ..services.company_directory import COMPANY_NAME_EXPR, get_company_directory, company_name_for_tin
+from ..services.cache import cached
+from ..utils.pagination import encode_cursor, decode_cursor, next_page_headers
+from ..utils.serialization import fast_json, compile_row_encoder
+from ..utils.tracing import record_serialize
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -15,7 +28,45 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# Page size when a cursor is given without a limit
+DEFAULT_COMPANY_PROJECTS_PAGE = 100
+
+def _search_companies(conn, search_pattern):
+    """Match companies by name or TIN against the maintained company summary"""
+    cursor = conn.cursor()
+    require_company_summary(cursor)
+
+    # Query to search companies
+    query_sql = """
+        SELECT 
+            tin,
+            company,
+            total_bids,
+            wins,
+            win_rate,
+            total_bid_value,
+            avg_bid,
+            avg_bid_ratio
+        FROM public_data.company_bid_summary
+        WHERE (company ILIKE %s OR tin ILIKE %s)
+        ORDER BY total_bids DESC
+        LIMIT 20
+    """
+
+    logger.info(f"Executing SQL query...")
+
+    # Execute query
+    cursor.execute(query_sql, (search_pattern, search_pattern))
+    results = cursor.fetchall()
+
+    # Close cursor
+    cursor.close()
+
+    return results
+
 @router.get("/search-companies", response_model=List[CompanyWinRate])
+@replica_reads
+@fast_json(List[CompanyWinRate])
 async def search_companies(query: str = Query(..., min_length=2, description="Company name or TIN search query")):
     """
     Search for companies by name or TIN.
@@ -27,205 +78,383 @@ async def search_companies(query: str = Query(..., min_length=2, description="Co
         List of matching companies with win rate data
     """
     logger.info(f"Searching for companies with query: {query}")
-    conn = None
     try:
-        # Connect to database
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
+        # Answer from the in-memory index when it is loaded and complete enough
+        index = get_search_index()
+        if index is not None:
+            companies = index.search(query, limit=20)
+            if companies is not None:
+                logger.info(f"Search index returned {len(companies)} results")
+                return companies
+
         # Create search pattern
         search_pattern = f"%{query}%"
         logger.info(f"Using search pattern: {search_pattern}")
-        
-        # Query to search companies
-        query_sql = """
-            WITH bid_data AS (
-                SELECT 
-                    b.project_id,
-                    b.company,
-                    b.tin,
-                    b.bid,
-                    p.winner,
-                    p.winner_tin,
-                    CASE WHEN b.tin = p.winner_tin THEN 1 ELSE 0 END AS won_bid,
-                    b.bid / NULLIF(p.sum_price_agree, 0) AS bid_ratio
-                FROM public_data.thai_project_bid_info b
-                LEFT JOIN public_data.thai_govt_project p ON b.project_id = p.project_id
-                WHERE b.tin IS NOT NULL AND b.bid > 0
-            )
-            SELECT 
-                tin,
-                company,
-                COUNT(project_id) AS total_bids,
-                SUM(won_bid) AS wins,
-                (SUM(won_bid) * 100.0 / COUNT(project_id))::numeric(10,2) AS win_rate,
-                SUM(bid) AS total_bid_value,
-                AVG(bid) AS avg_bid,
-                AVG(bid_ratio) AS avg_bid_ratio
-            FROM bid_data
-            WHERE (company ILIKE %s OR tin ILIKE %s)
-            GROUP BY tin, company
-            HAVING COUNT(project_id) >= 1
-            ORDER BY total_bids DESC
-            LIMIT 20
-        """
-        
-        logger.info(f"Executing SQL query...")
-        
-        # Execute query
-        cursor.execute(query_sql, (search_pattern, search_pattern))
-        results = cursor.fetchall()
-        
+
+        results = await run_db(_search_companies, search_pattern)
+
         logger.info(f"Query returned {len(results)} results")
-        
+
         # Convert to list of dictionaries
         companies = [dict(row) for row in results]
-        
-        # Close connection
-        cursor.close()
-        
+
         return companies
-    
+
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error searching companies: {str(e)}")
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Error searching companies: {str(e)}")
+
+# Sort key of the company projects listing; project_id makes it a total order
+COMPANY_PROJECTS_SORT_DATE = "COALESCE(p.contract_date, p.transaction_date)"
+
+def _company_projects_sql(match_column, after=None, limit=None, match="%s"):
+    """
+    Build the company projects query.
+
+    Args:
+        match_column: Project column compared with the company ("winner_tin" or "winner")
+        after: Sort key (date, sum_price_agree, project_id) of the last row already returned
+        limit: Maximum number of rows
+        match: SQL the column is compared with; its parameters come first
+
+    Returns:
+        (query, extra params after the company parameter)
+    """
+    matched_by = "tin" if match_column == "winner_tin" else "name"
+    query = f"""
+        SELECT 
+            p.winner,
+            p.project_name,
+            p.sum_price_agree,
+            TO_CHAR(p.transaction_date, 'YYYY-MM-DD') as transaction_date,
+            TO_CHAR(p.contract_date, 'YYYY-MM-DD') as contract_date,
+            {COMPANY_PROJECTS_SORT_DATE}::text AS sort_date,
+            p.sum_price_agree::text AS sort_price,
+            p.project_id::text AS sort_id,
+            '{matched_by}' AS matched_by
+        FROM public_data.thai_govt_project p
+        WHERE p.{match_column} = {match}
+          AND p.project_name IS NOT NULL
+          AND p.sum_price_agree > 0
+    """
+    params = []
+
+    # Keyset condition for DESC NULLS LAST ordering: rows with a NULL date come last
+    if after is not None:
+        sort_date, sort_price, sort_id = after
+        if sort_date is None:
+            query += f"""
+          AND {COMPANY_PROJECTS_SORT_DATE} IS NULL
+          AND (p.sum_price_agree, p.project_id) < (%s, %s)
+            """
+            params += [sort_price, sort_id]
+        else:
+            query += f"""
+          AND (({COMPANY_PROJECTS_SORT_DATE}, p.sum_price_agree, p.project_id) < (%s, %s, %s)
+               OR {COMPANY_PROJECTS_SORT_DATE} IS NULL)
+            """
+            params += [sort_date, sort_price, sort_id]
+
+    query += f"""
+        ORDER BY 
+            {COMPANY_PROJECTS_SORT_DATE} DESC NULLS LAST,
+            p.sum_price_agree DESC,
+            p.project_id DESC
+    """
+    if limit is not None:
+        query += " LIMIT %s"
+        params.append(limit)
+
+    return query, params
+
+def _company_projects_first_page_sql(company_tin, company_name=None, limit=None):
+    """
+    Build one query for the first page of a company's projects.
+
+    Projects are matched on winner_tin; only when there are none are they
+    matched on the company name. The name branch sits behind an uncorrelated
+    NOT EXISTS, which PostgreSQL evaluates once as a filter, so it is never
+    run for a company that has projects by TIN. Without a known name, the
+    canonical one is looked up inside the same statement.
+
+    Returns:
+        (query, params)
+    """
+    by_tin, tin_params = _company_projects_sql("winner_tin", limit=limit)
+    if company_name is not None:
+        by_name, name_params = _company_projects_sql("winner", limit=limit)
+        name_values = [company_name]
+    else:
+        by_name, name_params = _company_projects_sql("winner", limit=limit, match=COMPANY_NAME_EXPR)
+        name_values = [company_tin, company_tin]
+
+    query = f"""
+        WITH by_tin AS ({by_tin})
+        SELECT * FROM by_tin
+        UNION ALL
+        SELECT * FROM ({by_name}) by_name
+        WHERE NOT EXISTS (SELECT 1 FROM by_tin)
+    """
+    return query, [company_tin] + tin_params + name_values + name_params
+
+def _split_sort_key(row):
+    """Return the row without its sort key columns, and the sort key"""
+    project = dict(row)
+    project.pop("matched_by", None)
+    sort_key = [project.pop("sort_date"), project.pop("sort_price"), project.pop("sort_id")]
+    return project, sort_key
+
+def _company_projects_query(cursor, company_tin, by, after=None, limit=None, company_name=None):
+    """
+    Build the query of one page of a company's projects.
+
+    Returns:
+        (query, params), or None when projects are matched by name and the
+        company is unknown
+    """
+    if by == "tin" and after is None:
+        if company_name is None:
+            directory = get_company_directory()
+            company_name = directory.name(company_tin) if directory is not None else None
+        return _company_projects_first_page_sql(company_tin, company_name, limit)
+
+    if by == "tin":
+        query, params = _company_projects_sql("winner_tin", after, limit)
+        return query, [company_tin] + params
+
+    # Later pages of a company whose projects matched by name
+    if company_name is None:
+        company_name = company_name_for_tin(cursor, company_tin)
+    if company_name is None:
+        logger.warning(f"No company found with TIN: {company_tin}")
+        return None
+    query, params = _company_projects_sql("winner", after, limit)
+    return query, [company_name] + params
+
+def _load_company_projects(conn, company_tin, by="tin", after=None, limit=None, company_name=None):
+    """
+    Load a company's won projects, newest first.
+
+    Projects are matched on winner_tin; when a company has none on the first
+    page, they are matched on the company name instead.
+
+    Returns:
+        (rows with sort keys, "tin" or "name" depending on how they matched)
+    """
+    cursor = conn.cursor()
+
+    rows = []
+    statement = _company_projects_query(cursor, company_tin, by, after, limit, company_name)
+    if statement is not None:
+        cursor.execute(*statement)
+        rows = cursor.fetchall()
+        if rows:
+            by = rows[0]["matched_by"]
+
+    # Close cursor
+    cursor.close()
+
+    if by == "name":
+        logger.info(f"Found {len(rows)} projects by company name")
+    return rows, by
+
+def _stream_company_projects(conn, company_tin, by, after, batch_size=1000):
+    """Yield a company's projects as NDJSON chunks from a server-side cursor"""
+    cursor = conn.cursor()
+    statement = _company_projects_query(cursor, company_tin, by, after)
+    cursor.close()
+    if statement is None:
+        return
+
+    cursor = conn.cursor(name="company_projects_stream")
+    cursor.itersize = batch_size
+    cursor.execute(*statement)
+    written = 0
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            lines = []
+            for row in rows:
+                project, _ = _split_sort_key(row)
+                project["sum_price_agree"] = float(project["sum_price_agree"])
+                lines.append(json.dumps(project, ensure_ascii=False, separators=(",", ":")))
+            written += len(rows)
+            yield ("\n".join(lines) + "\n").encode("utf-8")
     finally:
-        if conn:
-            conn.close()
-            logger.info("Database connection closed")
+        cursor.close()
+    logger.info(f"Streamed {written} projects for company")
 
 @router.get("/company-projects/{company_tin}", response_model=List[CompanyProject])
-async def get_company_projects(company_tin: str):
+@replica_reads
+@cached("company_projects", List[CompanyProject], fast=True)
+async def get_company_projects(
+    company_tin: str,
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; enables keyset pagination"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    stream: bool = Query(False, description="Stream every project as newline-delimited JSON"),
+):
     """
     Get projects for a specific company by TIN.
     
+    Without `limit` or `cursor` every project is returned in one list. With
+    them, one page is returned and the next page's cursor is sent in the
+    X-Next-Cursor and Link headers (absent on the last page). With `stream`,
+    projects are written as NDJSON straight from a server-side cursor.
+
     Args:
         company_tin: Company TIN
+        limit: Page size
+        cursor: Opaque cursor of the next page
+        stream: Stream NDJSON instead of returning a JSON list
         
     Returns:
         List of company projects
     """
-    logger.info(f"Getting projects for company with TIN: {company_tin}")
-    conn = None
+    logger.info(f"Getting projects for company with TIN: {company_tin} (limit={limit}, cursor={cursor is not None}, stream={stream})")
     try:
-        # Connect to database
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Query to get company projects
-        query = """
-            SELECT 
-                p.winner,
-                p.project_name,
-                p.sum_price_agree,
-                TO_CHAR(p.transaction_date, 'YYYY-MM-DD') as transaction_date,
-                TO_CHAR(p.contract_date, 'YYYY-MM-DD') as contract_date
-            FROM public_data.thai_govt_project p
-            WHERE p.winner_tin = %s
-              AND p.project_name IS NOT NULL
-              AND p.sum_price_agree > 0
-            ORDER BY 
-                COALESCE(p.contract_date, p.transaction_date) DESC NULLS LAST,
-                p.sum_price_agree DESC
-        """
-        
-        # Execute query
-        cursor.execute(query, (company_tin,))
-        results = cursor.fetchall()
-        
-        # Convert to list of dictionaries
-        projects = [dict(row) for row in results]
-        
-        # Close connection
-        cursor.close()
-        
-        if not projects:
-            # Try to find projects by alternative method if none found by TIN
-            logger.info(f"No projects found by TIN, trying by company name")
-            return await get_company_projects_by_name(company_tin)
-        
-        logger.info(f"Found {len(projects)} projects for company")
-        return projects
-    
+        by, after = "tin", None
+        if cursor is not None:
+            state = decode_cursor(cursor)
+            by, after = state.get("by"), state.get("after")
+            if by not in ("tin", "name") or not isinstance(after, list) or len(after) != 3:
+                raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+        if stream:
+            chunks = await stream_db(_stream_company_projects, company_tin, by, after)
+            return StreamingResponse(chunks, media_type="application/x-ndjson")
+
+        if limit is None and cursor is None:
+            rows, by = await run_db(_load_company_projects, company_tin)
+            projects = [_split_sort_key(row)[0] for row in rows]
+            logger.info(f"Found {len(projects)} projects for company")
+            return projects
+
+        # Fetch one extra row to learn whether there is a next page
+        page_size = limit or DEFAULT_COMPANY_PROJECTS_PAGE
+        rows, by = await run_db(_load_company_projects, company_tin, by, after, page_size + 1)
+        page = [_split_sort_key(row) for row in rows[:page_size]]
+
+        if len(rows) > page_size:
+            next_cursor = encode_cursor({"by": by, "after": page[-1][1]})
+            response.headers.update(next_page_headers(request, next_cursor))
+
+        logger.info(f"Returning {len(page)} projects for company (more={len(rows) > page_size})")
+        return [project for project, _ in page]
+
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting company projects: {str(e)}")
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Error getting company projects: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
 
-async def get_company_projects_by_name(company_tin: str):
+# Most competitors one batched competitor-projects request may compare
+MAX_COMPETITORS = 100
+
+# One scan of the company's bids, joined to the competitors' bids on the same projects
+COMPETITOR_PROJECTS_SQL = """
+    WITH company_bids AS (
+        SELECT project_id, company, bid
+        FROM public_data.thai_project_bid_info
+        WHERE tin = %(company_tin)s
+    ),
+    shared AS (
+        SELECT
+            c.project_id,
+            c.company AS company_name,
+            c.bid AS company_bid,
+            b.tin AS competitor_tin,
+            b.company AS competitor_name,
+            b.bid AS competitor_bid
+        FROM company_bids c
+        JOIN public_data.thai_project_bid_info b
+          ON b.project_id = c.project_id AND b.tin = ANY(%(competitor_tins)s)
+    )
+    SELECT 
+        s.competitor_tin,
+        p.project_id,
+        p.project_name,
+        p.sum_price_agree AS winning_bid,
+        p.winner,
+        p.winner_tin,
+        TO_CHAR(p.transaction_date, 'YYYY-MM-DD') as transaction_date,
+        TO_CHAR(p.contract_date, 'YYYY-MM-DD') as contract_date,
+        s.company_name,
+        s.company_bid,
+        s.competitor_name,
+        s.competitor_bid,
+        CASE WHEN p.winner_tin = %(company_tin)s THEN TRUE 
+             WHEN p.winner_tin = s.competitor_tin THEN FALSE 
+             ELSE NULL 
+        END AS company_won
+    FROM shared s
+    JOIN public_data.thai_govt_project p ON p.project_id = s.project_id
+    ORDER BY s.competitor_tin, p.contract_date DESC NULLS LAST, p.project_id
+"""
+
+def _competitor_summary():
+    return {"shared_projects": 0, "company_wins": 0, "competitor_wins": 0, "company_lower_bids": 0}
+
+def _load_competitor_projects(conn, company_tin, competitor_tins, include_summary=False, include_projects=True):
     """
-    Fallback method to get projects by company name if TIN lookup fails.
-    
-    Args:
-        company_tin: Company TIN
-        
+    Render the projects company_tin shares with each competitor.
+
+    Rows are fetched in batches from one statement and written to JSON by
+    column position, grouped by competitor.
+
     Returns:
-        List of company projects
+        Dict of competitor TIN -> (rendered JSON array of projects or None, summary or None)
     """
-    logger.info(f"Looking up company name from TIN: {company_tin}")
-    conn = None
-    try:
-        # Connect to database
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # First, get company name from TIN
-        cursor.execute(
-            "SELECT DISTINCT company FROM public_data.thai_project_bid_info WHERE tin = %s LIMIT 1", 
-            (company_tin,)
+    projects = {tin: [] for tin in competitor_tins}
+    summaries = {tin: _competitor_summary() for tin in competitor_tins} if include_summary else None
+    seen = set()
+
+    encoding = 0.0
+    batches = iter_row_batches(conn, COMPETITOR_PROJECTS_SQL, {"company_tin": company_tin, "competitor_tins": list(competitor_tins)})
+    for columns, rows in batches:
+        started = time.perf_counter()
+        # The leading competitor_tin column only groups the rows
+        encode = compile_row_encoder(columns[1:])
+        positions = {name: position for position, name in enumerate(columns)}
+        for row in rows:
+            competitor_tin = row[0]
+            if include_projects:
+                projects[competitor_tin].append(encode(row[1:]))
+            if summaries is None:
+                continue
+            summary = summaries[competitor_tin]
+            # A company bidding twice on a project yields several rows for it
+            if (competitor_tin, row[positions["project_id"]]) not in seen:
+                seen.add((competitor_tin, row[positions["project_id"]]))
+                summary["shared_projects"] += 1
+                won = row[positions["company_won"]]
+                if won is True:
+                    summary["company_wins"] += 1
+                elif won is False:
+                    summary["competitor_wins"] += 1
+            company_bid, competitor_bid = row[positions["company_bid"]], row[positions["competitor_bid"]]
+            if company_bid is not None and competitor_bid is not None and company_bid < competitor_bid:
+                summary["company_lower_bids"] += 1
+        encoding += time.perf_counter() - started
+    record_serialize("competitor_projects", encoding)
+
+    return {
+        tin: (
+            ("[" + ",".join(rendered) + "]").encode("utf-8") if include_projects else None,
+            summaries[tin] if summaries is not None else None,
         )
-        company_result = cursor.fetchone()
-        
-        if not company_result:
-            logger.warning(f"No company found with TIN: {company_tin}")
-            return []
-        
-        company_name = company_result["company"]
-        logger.info(f"Found company name: {company_name}")
-        
-        # Query to get company projects by name
-        query = """
-            SELECT 
-                p.winner,
-                p.project_name,
-                p.sum_price_agree,
-                TO_CHAR(p.transaction_date, 'YYYY-MM-DD') as transaction_date,
-                TO_CHAR(p.contract_date, 'YYYY-MM-DD') as contract_date
-            FROM public_data.thai_govt_project p
-            WHERE p.winner = %s
-              AND p.project_name IS NOT NULL
-              AND p.sum_price_agree > 0
-            ORDER BY 
-                COALESCE(p.contract_date, p.transaction_date) DESC NULLS LAST,
-                p.sum_price_agree DESC
-        """
-        
-        # Execute query
-        cursor.execute(query, (company_name,))
-        results = cursor.fetchall()
-        
-        # Convert to list of dictionaries
-        projects = [dict(row) for row in results]
-        
-        # Close connection
-        cursor.close()
-        
-        logger.info(f"Found {len(projects)} projects by company name")
-        return projects
-    
-    except Exception as e:
-        logger.error(f"Error getting company projects by name: {str(e)}")
-        logger.error(traceback.format_exc())
-        raise HTTPException(status_code=500, detail=f"Error getting company projects by name: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
+        for tin, rendered in projects.items()
+    }
 
 @router.get("/competitor-projects")
+@replica_reads
 async def get_competitor_projects(
     company_tin: str = Query(..., description="Company TIN"),
     competitor_tin: str = Query(..., description="Competitor TIN")
@@ -241,68 +470,216 @@ async def get_competitor_projects(
         List of projects with bid details for both companies
     """
     logger.info(f"Getting competitor projects: company={company_tin}, competitor={competitor_tin}")
-    conn = None
     try:
-        # Connect to database
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Query to find projects where both companies participated
-        query = """
-            WITH common_projects AS (
-                SELECT DISTINCT a.project_id
-                FROM public_data.thai_project_bid_info a
-                JOIN public_data.thai_project_bid_info b 
-                  ON a.project_id = b.project_id
-                WHERE a.tin = %s AND b.tin = %s
-            )
-            SELECT 
-                p.project_id,
-                p.project_name,
-                p.sum_price_agree AS winning_bid,
-                p.winner,
-                p.winner_tin,
-                TO_CHAR(p.transaction_date, 'YYYY-MM-DD') as transaction_date,
-                TO_CHAR(p.contract_date, 'YYYY-MM-DD') as contract_date,
-                c1.company AS company_name,
-                c1.bid AS company_bid,
-                c2.company AS competitor_name,
-                c2.bid AS competitor_bid,
-                CASE WHEN p.winner_tin = %s THEN TRUE 
-                     WHEN p.winner_tin = %s THEN FALSE 
-                     ELSE NULL 
-                END AS company_won
-            FROM public_data.thai_govt_project p
-            JOIN common_projects cp ON p.project_id = cp.project_id
-            JOIN public_data.thai_project_bid_info c1 ON p.project_id = c1.project_id AND c1.tin = %s
-            JOIN public_data.thai_project_bid_info c2 ON p.project_id = c2.project_id AND c2.tin = %s
-            ORDER BY p.contract_date DESC NULLS LAST
-        """
-        
-        # Execute query
-        cursor.execute(query, (company_tin, competitor_tin, company_tin, competitor_tin, company_tin, competitor_tin))
-        results = cursor.fetchall()
-        
-        # Convert to list of dictionaries
-        projects = [dict(row) for row in results]
-        
-        # Close connection
-        cursor.close()
-        
-        logger.info(f"Found {len(projects)} common projects between companies")
-        return {"company_tin": company_tin, "competitor_tin": competitor_tin, "projects": projects}
-    
+        pairs = await run_db(_load_competitor_projects, company_tin, [competitor_tin])
+        projects, _ = pairs[competitor_tin]
+
+        logger.info(f"Rendered {len(projects)} bytes of common projects between companies")
+        body = (
+            f'{{"company_tin":{encode_basestring(company_tin)},'
+            f'"competitor_tin":{encode_basestring(competitor_tin)},"projects":'
+        ).encode("utf-8") + projects + b"}"
+        return Response(content=body, media_type="application/json")
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting competitor projects: {str(e)}")
+        logger.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Error getting competitor projects: {str(e)}")
+
+class CompetitorProjectsRequest(BaseModel):
+    company_tin: str
+    competitor_tins: List[str]
+    include_summary: bool = False
+    include_projects: bool = True
+
+@router.post("/competitor-projects")
+@replica_reads
+async def get_competitor_projects_batch(request: CompetitorProjectsRequest):
+    """
+    Get the projects a company shared with each of several competitors.
+
+    The company's bids are scanned once for all competitors, so comparing
+    twenty competitors costs one query instead of twenty.
+
+    Args:
+        request: Company TIN, competitor TINs, whether to add a per-pair
+            summary (shared projects, wins of each side, bids where the
+            company bid lower) and whether to list the projects
+
+    Returns:
+        {"company_tin", "competitors": [{"competitor_tin", "projects"?, "summary"?}]}
+        in the order the competitors were given
+    """
+    # Keep the order of first appearance
+    competitor_tins = list(dict.fromkeys(request.competitor_tins))
+    logger.info(f"Getting competitor projects: company={request.company_tin}, competitors={len(competitor_tins)}")
+
+    if not competitor_tins:
+        raise HTTPException(status_code=400, detail="No competitor TINs provided")
+    if not request.include_projects and not request.include_summary:
+        raise HTTPException(status_code=400, detail="Nothing requested: set include_projects or include_summary")
+    if len(competitor_tins) > MAX_COMPETITORS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_COMPETITORS} competitors can be compared at once")
+
+    try:
+        pairs = await run_db(
+            _load_competitor_projects, request.company_tin, competitor_tins,
+            request.include_summary, request.include_projects
+        )
+
+        competitors = []
+        for tin in competitor_tins:
+            projects, summary = pairs[tin]
+            entry = f'{{"competitor_tin":{encode_basestring(tin)}'.encode("utf-8")
+            if projects is not None:
+                entry += b',"projects":' + projects
+            if summary is not None:
+                entry += b',"summary":' + json.dumps(summary, separators=(",", ":")).encode("utf-8")
+            competitors.append(entry + b"}")
+
+        body = (
+            f'{{"company_tin":{encode_basestring(request.company_tin)},"competitors":['.encode("utf-8")
+            + b",".join(competitors) + b"]}"
+        )
+        logger.info(f"Rendered {len(body)} bytes of common projects with {len(competitor_tins)} competitors")
+        return Response(content=body, media_type="application/json")
+
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting competitor projects: {str(e)}")
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Error getting competitor projects: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
 
 # Add this to search.py router
 
+def _adjacent_companies_from_graph(cursor, graph, company_tin):
+    """Answer adjacent-companies from the in-memory co-bidding graph"""
+    neighbors = graph.neighbors(company_tin, limit=20)
+    if not neighbors:
+        return []
+
+    # Overall totals come from the summary so they match search-companies
+    cursor.execute(
+        """
+        SELECT
+            tin,
+            SUM(total_bids) AS total_bids,
+            SUM(wins) AS wins,
+            (SUM(wins) * 100.0 / NULLIF(SUM(total_bids), 0))::numeric(10,1) AS win_rate
+        FROM public_data.company_bid_summary
+        WHERE tin = ANY(%s)
+        GROUP BY tin
+        """,
+        ([neighbor["tin"] for neighbor in neighbors],)
+    )
+    win_data = {row["tin"]: row for row in cursor.fetchall()}
+
+    adjacent_companies = []
+    for neighbor in neighbors:
+        totals = win_data.get(neighbor["tin"])
+        adjacent_companies.append({
+            "tin": neighbor["tin"],
+            "company": neighbor["company"],
+            "common_bids": neighbor["encounters"],
+            "total_bids": totals["total_bids"] if totals else 0,
+            "wins": totals["wins"] if totals else 0,
+            "win_rate": totals["win_rate"] if totals and totals["win_rate"] is not None else 0,
+        })
+
+    return adjacent_companies
+
+def _load_adjacent_companies(conn, company_tin, project_ids=None):
+    """
+    Find companies sharing bids with company_tin, with their win rates.
+
+    Shared projects are counted per competitor TIN and name, over projects
+    present in thai_govt_project; the co-bidding graph returns the same rows.
+
+    project_ids may be passed in by callers that already loaded the
+    company's projects (the dashboard bundle).
+    """
+    cursor = conn.cursor()
+    require_company_summary(cursor)
+
+    graph = get_cobid_graph()
+    if graph is not None:
+        adjacent_companies = _adjacent_companies_from_graph(cursor, graph, company_tin)
+        cursor.close()
+        logger.info(f"Found {len(adjacent_companies)} adjacent companies (co-bidding graph)")
+        return adjacent_companies
+
+    # First, get all project IDs where the company has bid
+    if project_ids is None:
+        projects_query = """
+            SELECT DISTINCT project_id
+            FROM public_data.thai_project_bid_info
+            WHERE tin = %s
+        """
+        cursor.execute(projects_query, (company_tin,))
+        project_ids = [row["project_id"] for row in cursor.fetchall()]
+
+    if not project_ids:
+        cursor.close()
+        return []
+
+    # Query to find all companies that bid on these projects
+    query = """
+        WITH company_bids AS (
+            SELECT
+                b.tin,
+                b.company,
+                COUNT(DISTINCT b.project_id) AS bid_count
+            FROM public_data.thai_project_bid_info b
+            JOIN public_data.thai_govt_project p ON b.project_id = p.project_id
+            WHERE b.project_id = ANY(%s)
+            AND b.tin != %s  -- Exclude the original company
+            GROUP BY b.tin, b.company
+        ),
+        win_data AS (
+            SELECT
+                s.tin,
+                SUM(s.total_bids) AS total_bids,
+                SUM(s.wins) AS wins
+            FROM public_data.company_bid_summary s
+            WHERE s.tin IN (SELECT tin FROM company_bids)
+            GROUP BY s.tin
+        )
+        SELECT
+            cb.tin,
+            cb.company,
+            cb.bid_count AS common_bids,
+            COALESCE(wd.total_bids, 0) AS total_bids,
+            COALESCE(wd.wins, 0) AS wins,
+            CASE 
+                WHEN COALESCE(wd.total_bids, 0) > 0 
+                THEN (COALESCE(wd.wins, 0) * 100.0 / COALESCE(wd.total_bids, 0))::numeric(10,1)
+                ELSE 0 
+            END AS win_rate
+        FROM company_bids cb
+        LEFT JOIN win_data wd ON cb.tin = wd.tin
+        ORDER BY cb.bid_count DESC, cb.tin COLLATE "C", cb.company COLLATE "C"
+        LIMIT 20
+    """
+
+    # Execute query with project IDs and the original company TIN
+    params = [list(project_ids), company_tin]
+    cursor.execute(query, params)
+    results = cursor.fetchall()
+
+    # Convert to list of dictionaries
+    adjacent_companies = [dict(row) for row in results]
+
+    # Close cursor
+    cursor.close()
+
+    logger.info(f"Found {len(adjacent_companies)} adjacent companies")
+    return adjacent_companies
+
 @router.get("/adjacent-companies/{company_tin}")
+@replica_reads
 async def get_adjacent_companies(company_tin: str):
     """
     Get companies that have participated in the same bids as the specified company.
@@ -314,88 +691,12 @@ async def get_adjacent_companies(company_tin: str):
         List of adjacent companies with their win rate data
     """
     logger.info(f"Finding adjacent companies for company with TIN: {company_tin}")
-    conn = None
     try:
-        # Connect to database
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # First, get all project IDs where the company has bid
-        projects_query = """
-            SELECT DISTINCT project_id
-            FROM public_data.thai_project_bid_info
-            WHERE tin = %s
-        """
-        cursor.execute(projects_query, (company_tin,))
-        project_results = cursor.fetchall()
-        
-        if not project_results:
-            return []
-        
-        # Extract project IDs
-        project_ids = [row["project_id"] for row in project_results]
-        
-        # Create placeholders for the IN clause
-        placeholders = ', '.join(['%s'] * len(project_ids))
-        
-        # Query to find all companies that bid on these projects
-        query = f"""
-            WITH company_bids AS (
-                SELECT
-                    tin,
-                    company,
-                    COUNT(DISTINCT project_id) AS bid_count
-                FROM public_data.thai_project_bid_info
-                WHERE project_id IN ({placeholders})
-                AND tin != %s  -- Exclude the original company
-                GROUP BY tin, company
-                ORDER BY bid_count DESC
-            ),
-            win_data AS (
-                SELECT
-                    b.tin,
-                    COUNT(DISTINCT b.project_id) AS total_bids,
-                    SUM(CASE WHEN b.tin = p.winner_tin THEN 1 ELSE 0 END) AS wins
-                FROM public_data.thai_project_bid_info b
-                JOIN public_data.thai_govt_project p ON b.project_id = p.project_id
-                WHERE b.tin IN (SELECT tin FROM company_bids)
-                GROUP BY b.tin
-            )
-            SELECT
-                cb.tin,
-                cb.company,
-                cb.bid_count AS common_bids,
-                COALESCE(wd.total_bids, 0) AS total_bids,
-                COALESCE(wd.wins, 0) AS wins,
-                CASE 
-                    WHEN COALESCE(wd.total_bids, 0) > 0 
-                    THEN (COALESCE(wd.wins, 0) * 100.0 / COALESCE(wd.total_bids, 0))::numeric(10,1)
-                    ELSE 0 
-                END AS win_rate
-            FROM company_bids cb
-            LEFT JOIN win_data wd ON cb.tin = wd.tin
-            ORDER BY cb.bid_count DESC
-            LIMIT 20
-        """
-        
-        # Execute query with project IDs and the original company TIN
-        params = project_ids + [company_tin]
-        cursor.execute(query, params)
-        results = cursor.fetchall()
-        
-        # Convert to list of dictionaries
-        adjacent_companies = [dict(row) for row in results]
-        
-        # Close connection
-        cursor.close()
-        
-        logger.info(f"Found {len(adjacent_companies)} adjacent companies")
-        return adjacent_companies
-    
+        return await run_db(_load_adjacent_companies, company_tin)
+
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error finding adjacent companies: {str(e)}")
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Error finding adjacent companies: {str(e)}")
-    finally:
-        if conn:
-            conn.close()
\ No newline at end of file
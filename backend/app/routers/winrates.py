@@ -1,10 +1,23 @@
 # app/routers/winrates.py
-from fastapi import APIRouter, HTTPException, Query, Body
+from fastapi import APIRouter, HTTPException, Query, Body, Depends, Request, Response
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from decimal import Decimal
 import logging
-from ..database import get_db_connection
-from ..models import CompanyWinRate, HeadToHeadResponse, BidStrategyResponse
+import numpy as np
+from ..database import fetch_all, fetch_columns, run_db, iter_row_batches, replica_reads
+from ..models import CompanyWinRate, HeadToHeadResponse, BidStrategyResponse, BidRatioDistributionResponse, BidRatioQuantilesResponse, AnalysisSeriesResponse
+from ..services.company_summary import require_company_summary
+from ..services.cobid_graph import get_cobid_graph
+from ..services.company_directory import company_name_for_tin, get_company_directory
+from ..services.h2h import load_project_bidders, compute_head_to_head, head_to_head_from_graph
+from ..services.cache import cached
+from ..services.bid_ratio_distribution import MIN_BIDS, get_bid_ratio_distribution
+from ..services.bid_ratio_sketch import RELATIVE_ACCURACY, load_bid_ratio_sketches
+from ..services.downsample import downsample
+from ..utils.columnar import COLUMNAR_RESPONSES, negotiate_format, columnar_response
+from ..utils.pagination import encode_cursor, decode_cursor, next_page_headers
+from ..utils.serialization import render_json, render_rows_json
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -15,7 +28,38 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+def _load_head_to_head(conn, company_tin, top_n, company_name=None, project_ids=None):
+    """
+    Compute head-to-head records between company_tin and its top_n competitors.
+
+    company_name and project_ids may be passed in by callers that already
+    loaded them (the dashboard bundle) to skip the lookups.
+    """
+    cursor = conn.cursor()
+
+    # Resolve the company name (unless the caller already knows it)
+    if company_name is None:
+        company_name = company_name_for_tin(cursor, company_tin)
+
+        if company_name is None:
+            raise HTTPException(status_code=404, detail=f"Company with TIN {company_tin} not found")
+
+    # Close cursor
+    cursor.close()
+
+    graph = get_cobid_graph()
+    if graph is not None:
+        return {"company": company_name, "competitors": head_to_head_from_graph(graph, company_tin, top_n)}
+
+    # Tally the records from one scan of the bids on the company's projects
+    rows = load_project_bidders(conn, company_tin, project_ids)
+    competitors = compute_head_to_head(rows, company_tin, top_n)
+
+    return {"company": company_name, "competitors": competitors}
+
 @router.get("/head-to-head", response_model=HeadToHeadResponse)
+@replica_reads
+@cached("head_to_head", HeadToHeadResponse)
 async def get_head_to_head(
     company_tin: str = Query(..., description="Company TIN to analyze"),
     top_n: int = Query(5, ge=1, le=20, description="Number of top competitors to include")
@@ -31,116 +75,133 @@ async def get_head_to_head(
         Head-to-head competition analysis
     """
     try:
-        # Connect to database
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Query to find company name first
-        cursor.execute("SELECT DISTINCT company FROM public_data.thai_project_bid_info WHERE tin = %s LIMIT 1", (company_tin,))
-        company_result = cursor.fetchone()
-        
-        if not company_result:
-            raise HTTPException(status_code=404, detail=f"Company with TIN {company_tin} not found")
-        
-        company_name = company_result["company"]
-        
-        # Query to get projects where the company participated
-        query_projects = """
-            SELECT project_id 
-            FROM public_data.thai_project_bid_info 
-            WHERE tin = %s
-        """
-        cursor.execute(query_projects, (company_tin,))
-        project_results = cursor.fetchall()
-        
-        if not project_results:
-            return {"company": company_name, "competitors": []}
-        
-        company_projects = [row["project_id"] for row in project_results]
-        
-        # Format project IDs for IN clause
-        projects_placeholders = ', '.join(['%s'] * len(company_projects))
-        
-        # Query to get head-to-head data
-        query_h2h = f"""
-            WITH company_projects AS (
-                SELECT DISTINCT project_id
-                FROM public_data.thai_project_bid_info
-                WHERE tin = %s
-            ),
-            project_bidders AS (
-                SELECT 
-                    b.project_id,
-                    b.tin,
-                    b.company,
-                    p.winner_tin,
-                    CASE WHEN b.tin = p.winner_tin THEN 1 ELSE 0 END AS won_bid
-                FROM public_data.thai_project_bid_info b
-                JOIN public_data.thai_govt_project p ON b.project_id = p.project_id
-                WHERE b.project_id IN ({projects_placeholders})
-            ),
-            competitor_encounters AS (
-                SELECT 
-                    pb.tin AS competitor_tin,
-                    pb.company AS competitor,
-                    COUNT(DISTINCT pb.project_id) AS encounters
-                FROM project_bidders pb
-                WHERE pb.tin != %s
-                GROUP BY pb.tin, pb.company
-                HAVING COUNT(DISTINCT pb.project_id) > 1
-                ORDER BY encounters DESC
-                LIMIT %s
-            )
-            SELECT 
-                ce.competitor_tin,
-                ce.competitor,
-                ce.encounters,
-                SUM(CASE WHEN pb.tin = %s AND pb.won_bid = 1 THEN 1 ELSE 0 END) AS company_wins,
-                SUM(CASE WHEN pb.tin = ce.competitor_tin AND pb.won_bid = 1 THEN 1 ELSE 0 END) AS competitor_wins
-            FROM competitor_encounters ce
-            JOIN project_bidders pb ON (pb.tin = ce.competitor_tin OR pb.tin = %s)
-                AND pb.project_id IN (
-                    SELECT project_id FROM project_bidders 
-                    WHERE tin = ce.competitor_tin
-                    INTERSECT
-                    SELECT project_id FROM project_bidders 
-                    WHERE tin = %s
-                )
-            GROUP BY ce.competitor_tin, ce.competitor, ce.encounters
-            ORDER BY ce.encounters DESC
-        """
-        
-        # Prepare parameters - company_tin appears multiple times
-        params = [company_tin] + company_projects + [company_tin, top_n, company_tin, company_tin, company_tin]
-        
-        # Execute query
-        cursor.execute(query_h2h, params)
-        h2h_results = cursor.fetchall()
-        
-        # Process results
-        competitors = []
-        for row in h2h_results:
-            row_dict = dict(row)
-            # Calculate win rate
-            encounters = row_dict.get("encounters", 0)
-            company_wins = row_dict.get("company_wins", 0)
-            
-            win_rate = (company_wins / encounters * 100) if encounters > 0 else 0
-            row_dict["win_rate_vs_competitor"] = round(win_rate, 2)
-            
-            competitors.append(row_dict)
-        
-        # Close connection
-        cursor.close()
-        conn.close()
-        
-        return {"company": company_name, "competitors": competitors}
-    
+        return await run_db(_load_head_to_head, company_tin, top_n)
+
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing head-to-head data: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing data: {str(e)}")
 
+def _percentile_from_summary(cursor, company_tin):
+    """Rank the company's average bid ratio with SQL, until the distribution is loaded"""
+    require_company_summary(cursor)
+    query_percentile = """
+        WITH company_avg_ratios AS (
+            SELECT 
+                tin,
+                SUM(bid_ratio_sum) / NULLIF(SUM(bid_ratio_count), 0) AS avg_ratio
+            FROM public_data.company_bid_summary
+            GROUP BY tin
+            HAVING SUM(total_bids) >= %s
+        ),
+        target_avg AS (
+            SELECT avg_ratio 
+            FROM company_avg_ratios 
+            WHERE tin = %s
+        ),
+        ranked AS (
+            SELECT 
+                COUNT(*) AS total_count,
+                SUM(CASE WHEN avg_ratio <= (SELECT avg_ratio FROM target_avg) THEN 1 ELSE 0 END) AS below_count
+            FROM company_avg_ratios
+        )
+        SELECT 
+            100.0 * below_count / NULLIF(total_count, 0) AS percentile
+        FROM ranked
+    """
+
+    # Execute query
+    cursor.execute(query_percentile, (MIN_BIDS, company_tin))
+    percentile_result = cursor.fetchone()
+
+    return percentile_result["percentile"] if percentile_result else None
+
+def _load_bid_strategy(conn, company_tin, company_name=None):
+    """Collect bid ratio statistics and department breakdown for company_tin"""
+    cursor = conn.cursor()
+
+    # Resolve the company name (unless the caller already knows it)
+    if company_name is None:
+        company_name = company_name_for_tin(cursor, company_tin)
+
+        if company_name is None:
+            raise HTTPException(status_code=404, detail=f"Company with TIN {company_tin} not found")
+
+    # Bid ratio statistics from the maintained won/lost sketches
+    sketches = load_bid_ratio_sketches(cursor, [company_tin])
+    won, lost = sketches[True], sketches[False]
+    overall = won.merge(lost)
+
+    if not overall.count:
+        raise HTTPException(status_code=404, detail=f"No bid data found for company with TIN {company_tin}")
+
+    bid_ratio_stats = {
+        "avg_bid_ratio": overall.mean,
+        "median_bid_ratio": overall.quantile(0.5),
+        "min_bid_ratio": overall.min,
+        "max_bid_ratio": overall.max,
+        "std_bid_ratio": overall.std,
+        "avg_winning_bid_ratio": won.mean if won.count else None,
+        "avg_losing_bid_ratio": lost.mean if lost.count else None,
+    }
+
+    # Percentile ranking among other companies
+    distribution = get_bid_ratio_distribution()
+    if distribution is not None:
+        bid_ratio_stats["percentile"] = distribution.percentile(company_tin)
+    else:
+        bid_ratio_stats["percentile"] = _percentile_from_summary(cursor, company_tin)
+
+    # Query to get department analysis
+    query_dept = """
+        WITH bid_data AS (
+            SELECT 
+                b.project_id,
+                b.company,
+                b.tin,
+                b.bid,
+                p.winner,
+                p.winner_tin,
+                p.sum_price_agree,
+                p.dept_name,
+                CASE WHEN b.tin = p.winner_tin THEN 1 ELSE 0 END AS won_bid,
+                b.bid / NULLIF(p.sum_price_agree, 0) AS bid_ratio
+            FROM public_data.thai_project_bid_info b
+            LEFT JOIN public_data.thai_govt_project p ON b.project_id = p.project_id
+            WHERE b.tin IS NOT NULL AND b.bid > 0
+        )
+        SELECT 
+            dept_name,
+            COUNT(project_id) AS bids,
+            SUM(won_bid) AS wins,
+            (SUM(won_bid) * 100.0 / COUNT(project_id))::numeric(10,2) AS win_rate,
+            AVG(bid_ratio) AS avg_bid_ratio
+        FROM bid_data
+        WHERE tin = %s AND dept_name IS NOT NULL
+        GROUP BY dept_name
+        ORDER BY bids DESC
+    """
+
+    # Execute query
+    cursor.execute(query_dept, (company_tin,))
+    dept_results = cursor.fetchall()
+
+    # Convert to list of dictionaries
+    department_analysis = [dict(row) for row in dept_results]
+
+    # Close cursor
+    cursor.close()
+
+    return {
+        "company": company_name,
+        "bid_ratio_stats": bid_ratio_stats,
+        "department_analysis": department_analysis
+    }
+
 @router.get("/bid-strategy", response_model=BidStrategyResponse)
+@replica_reads
+@cached("bid_strategy", BidStrategyResponse)
 async def get_bid_strategy(
     company_tin: str = Query(..., description="Company TIN to analyze")
 ):
@@ -154,234 +215,477 @@ async def get_bid_strategy(
         Bid strategy analysis
     """
     try:
-        # Connect to database
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Query to find company name first
-        cursor.execute("SELECT DISTINCT company FROM public_data.thai_project_bid_info WHERE tin = %s LIMIT 1", (company_tin,))
-        company_result = cursor.fetchone()
-        
-        if not company_result:
-            raise HTTPException(status_code=404, detail=f"Company with TIN {company_tin} not found")
-        
-        company_name = company_result["company"]
-        
-        # Query to get bid ratio statistics
-        query_stats = """
-            WITH bid_data AS (
-                SELECT 
-                    b.project_id,
-                    b.company,
-                    b.tin,
-                    b.bid,
-                    p.winner,
-                    p.winner_tin,
-                    p.sum_price_agree,
-                    p.dept_name,
-                    CASE WHEN b.tin = p.winner_tin THEN 1 ELSE 0 END AS won_bid,
-                    b.bid / NULLIF(p.sum_price_agree, 0) AS bid_ratio
-                FROM public_data.thai_project_bid_info b
-                LEFT JOIN public_data.thai_govt_project p ON b.project_id = p.project_id
-                WHERE b.tin IS NOT NULL AND b.bid > 0
-            )
-            SELECT 
-                AVG(bid_ratio) AS avg_bid_ratio,
-                PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY bid_ratio) AS median_bid_ratio,
-                MIN(bid_ratio) AS min_bid_ratio,
-                MAX(bid_ratio) AS max_bid_ratio,
-                STDDEV(bid_ratio) AS std_bid_ratio,
-                AVG(CASE WHEN won_bid = 1 THEN bid_ratio ELSE NULL END) AS avg_winning_bid_ratio,
-                AVG(CASE WHEN won_bid = 0 THEN bid_ratio ELSE NULL END) AS avg_losing_bid_ratio
-            FROM bid_data
-            WHERE tin = %s
-        """
-        
-        # Execute query
-        cursor.execute(query_stats, (company_tin,))
-        stats_result = cursor.fetchone()
-        
-        if not stats_result:
-            raise HTTPException(status_code=404, detail=f"No bid data found for company with TIN {company_tin}")
-        
-        bid_ratio_stats = dict(stats_result)
-        
-        # Query to get percentile ranking among other companies
-        query_percentile = """
-            WITH company_avg_ratios AS (
-                SELECT 
-                    tin,
-                    AVG(b.bid / NULLIF(p.sum_price_agree, 0)) AS avg_ratio
-                FROM public_data.thai_project_bid_info b
-                LEFT JOIN public_data.thai_govt_project p ON b.project_id = p.project_id
-                WHERE b.bid > 0
-                GROUP BY tin
-                HAVING COUNT(*) >= 3
-            ),
-            target_avg AS (
-                SELECT avg_ratio 
-                FROM company_avg_ratios 
-                WHERE tin = %s
-            ),
-            ranked AS (
-                SELECT 
-                    COUNT(*) AS total_count,
-                    SUM(CASE WHEN avg_ratio <= (SELECT avg_ratio FROM target_avg) THEN 1 ELSE 0 END) AS below_count
-                FROM company_avg_ratios
-            )
-            SELECT 
-                100.0 * below_count / total_count AS percentile
-            FROM ranked
-        """
-        
-        # Execute query
-        cursor.execute(query_percentile, (company_tin,))
-        percentile_result = cursor.fetchone()
-        
-        if percentile_result:
-            bid_ratio_stats["percentile"] = percentile_result["percentile"]
-        
-        # Query to get department analysis
-        query_dept = """
-            WITH bid_data AS (
-                SELECT 
-                    b.project_id,
-                    b.company,
-                    b.tin,
-                    b.bid,
-                    p.winner,
-                    p.winner_tin,
-                    p.sum_price_agree,
-                    p.dept_name,
-                    CASE WHEN b.tin = p.winner_tin THEN 1 ELSE 0 END AS won_bid,
-                    b.bid / NULLIF(p.sum_price_agree, 0) AS bid_ratio
-                FROM public_data.thai_project_bid_info b
-                LEFT JOIN public_data.thai_govt_project p ON b.project_id = p.project_id
-                WHERE b.tin IS NOT NULL AND b.bid > 0
-            )
-            SELECT 
-                dept_name,
-                COUNT(project_id) AS bids,
-                SUM(won_bid) AS wins,
-                (SUM(won_bid) * 100.0 / COUNT(project_id))::numeric(10,2) AS win_rate,
-                AVG(bid_ratio) AS avg_bid_ratio
-            FROM bid_data
-            WHERE tin = %s AND dept_name IS NOT NULL
-            GROUP BY dept_name
-            ORDER BY bids DESC
-        """
-        
-        # Execute query
-        cursor.execute(query_dept, (company_tin,))
-        dept_results = cursor.fetchall()
-        
-        # Convert to list of dictionaries
-        department_analysis = [dict(row) for row in dept_results]
-        
-        # Close connection
-        cursor.close()
-        conn.close()
-        
+        return await run_db(_load_bid_strategy, company_tin)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing bid strategy data: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error processing data: {str(e)}")
+
+@router.get("/bid-ratio-distribution", response_model=BidRatioDistributionResponse)
+@replica_reads
+async def get_bid_ratio_distribution_histogram(
+    bins: int = Query(20, ge=1, le=200, description="Number of histogram bins"),
+    min_ratio: Optional[float] = Query(None, description="Lower edge of the histogram (defaults to the smallest average)"),
+    max_ratio: Optional[float] = Query(None, description="Upper edge of the histogram (defaults to the largest average)"),
+    company_tin: Optional[str] = Query(None, description="Also report where this company falls")
+):
+    """
+    Get the distribution of per-company average bid ratios that bid-strategy
+    percentiles are ranked against (companies with at least 3 bids).
+
+    Args:
+        bins: Number of equal-width histogram bins
+        min_ratio: Lower edge of the histogram
+        max_ratio: Upper edge of the histogram
+        company_tin: Optional company to locate in the distribution
+
+    Returns:
+        Histogram, quartiles and the company's position
+    """
+    distribution = get_bid_ratio_distribution()
+    if distribution is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Bid ratio distribution is still being built; try again shortly"
+        )
+    if min_ratio is not None and max_ratio is not None and max_ratio <= min_ratio:
+        raise HTTPException(status_code=400, detail="max_ratio must be greater than min_ratio")
+
+    values = distribution.values
+    quantiles = distribution.quantiles((0.25, 0.5, 0.75))
+    result = {
+        "companies": distribution.total_count,
+        "undefined": distribution.undefined_count,
+        "min_bid_ratio": float(values[0]) if len(values) else None,
+        "max_bid_ratio": float(values[-1]) if len(values) else None,
+        "quantiles": {"p25": quantiles[0.25], "median": quantiles[0.5], "p75": quantiles[0.75]},
+        "bins": distribution.histogram(bins, min_ratio, max_ratio),
+    }
+    if company_tin is not None:
+        result["company"] = {
+            "tin": company_tin,
+            "avg_bid_ratio": distribution.averages.get(company_tin),
+            "percentile": distribution.percentile(company_tin),
+        }
+    return result
+
+def _load_sketches(conn, company_tins):
+    cursor = conn.cursor()
+    sketches = load_bid_ratio_sketches(cursor, company_tins)
+    cursor.close()
+    return sketches
+
+@router.get("/bid-ratio-quantiles", response_model=BidRatioQuantilesResponse)
+@replica_reads
+async def get_bid_ratio_quantiles(
+    company_tin: List[str] = Query(..., description="Company TIN; repeat to pool several companies"),
+    q: List[float] = Query([0.1, 0.25, 0.5, 0.75, 0.9], description="Quantiles to estimate, each between 0 and 1"),
+    outcome: str = Query("all", pattern="^(all|won|lost)$", description="Use all bids, only won bids or only lost bids")
+):
+    """
+    Estimate arbitrary quantiles of bid ratios from the per-company sketches.
+
+    Each estimate is within `relative_accuracy` (relative error) of the exact
+    PERCENTILE_CONT value. Several companies can be pooled in one request.
+
+    Args:
+        company_tin: One or more company TINs
+        q: Quantiles to estimate
+        outcome: "all", "won" or "lost"
+
+    Returns:
+        Quantile estimates with the count, mean, spread and range of the ratios
+    """
+    if len(company_tin) > 50:
+        raise HTTPException(status_code=400, detail="At most 50 companies can be pooled")
+    if len(q) > 50 or any(not 0 <= value <= 1 for value in q):
+        raise HTTPException(status_code=400, detail="q must be up to 50 values between 0 and 1")
+
+    try:
+        sketches = await run_db(_load_sketches, company_tin)
+        if outcome == "won":
+            sketch = sketches[True]
+        elif outcome == "lost":
+            sketch = sketches[False]
+        else:
+            sketch = sketches[True].merge(sketches[False])
+
+        if not sketch.count:
+            raise HTTPException(status_code=404, detail="No bid ratios found for the requested companies")
+
         return {
-            "company": company_name,
-            "bid_ratio_stats": bid_ratio_stats,
-            "department_analysis": department_analysis
+            "company_tins": company_tin,
+            "outcome": outcome,
+            "count": sketch.count,
+            "mean": sketch.mean,
+            "std": sketch.std,
+            "min": sketch.min,
+            "max": sketch.max,
+            "relative_accuracy": RELATIVE_ACCURACY,
+            "quantiles": [{"q": value, "value": sketch.quantile(value)} for value in q],
         }
-    
+
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error processing bid strategy data: {str(e)}")
+        logger.error(f"Error estimating bid ratio quantiles: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing data: {str(e)}")
 
-# New model for company analysis request
+# Raw bid rows per company-bids-analysis response, by default and at most
+DEFAULT_ANALYSIS_PAGE = 10000
+MAX_ANALYSIS_PAGE = 50000
+
+# Every bid of the requested companies on a named project
+ANALYSIS_ROWS_SQL = """
+    WITH company_bids AS (
+        SELECT 
+            b.project_id,
+            b.tin AS company_tin,
+            b.company AS company_name,
+            b.bid
+        FROM public_data.thai_project_bid_info b
+        WHERE b.tin = ANY(%(company_tins)s)
+    )
+    SELECT 
+        p.project_id,
+        p.project_name,
+        p.winner,
+        p.winner_tin,
+        p.sum_price_agree,
+        p.price_build,
+        TO_CHAR(p.transaction_date, 'YYYY-MM-DD') as transaction_date,
+        TO_CHAR(p.contract_date, 'YYYY-MM-DD') as contract_date,
+        cb.company_tin,
+        cb.company_name,
+        cb.bid,
+        -- Missing price cuts default to a typical 5 percent discount
+        COALESCE(
+            CASE 
+                WHEN p.price_build > 0 THEN 
+                    (p.sum_price_agree / p.price_build - 1)
+                ELSE NULL
+            END,
+            -0.05
+        ) AS price_cut,
+        COALESCE(p.winner_tin = cb.company_tin, FALSE) AS is_winner{extra_columns}
+    FROM public_data.thai_govt_project p
+    JOIN company_bids cb ON p.project_id = cb.project_id
+    WHERE p.project_name IS NOT NULL
+"""
+
+ANALYSIS_SORT_DATE = "COALESCE(p.contract_date, p.transaction_date)"
+
+# Group key of each aggregation mode, computed over ANALYSIS_ROWS_SQL
+ANALYSIS_GROUPS = {
+    "company": "company_tin",
+    "month": "TO_CHAR(bid_date, 'YYYY-MM')",
+    "quarter": """TO_CHAR(bid_date, 'YYYY-"Q"Q')""",
+    "department": "dept_name",
+    "price_cut": "ROUND(FLOOR(price_cut / %(bucket_width)s::numeric) * %(bucket_width)s::numeric, 4)",
+}
+
 class CompanyAnalysisRequest(BaseModel):
     company_tins: List[str]
+    group_by: Optional[str] = Field(
+        None, pattern="^(company|month|quarter|department|price_cut)$",
+        description="Aggregate in the database instead of returning raw bid rows",
+    )
+    price_cut_bucket: float = Field(0.05, gt=0, le=1, description="Bucket width for group_by=price_cut")
+
+# Last column of the raw rows query with exact_bid: the bid as exact text for cursors
+ANALYSIS_BID_KEY = "bid_key"
+
+def _analysis_rows_sql(after=None, limit=None, exact_bid=False):
+    """
+    Build the raw rows query, newest first, one keyset page at a time.
+
+    Rows are ordered by (date, project_id, company_tin, bid), so a page
+    resumes after the last row's key; identical bids of one company on one
+    project are indistinguishable and may be merged at a page boundary.
+
+    Args:
+        after: Sort key of the previous page's last row
+        limit: Maximum rows
+        exact_bid: Append the bid as text (ANALYSIS_BID_KEY), for fetches
+            that read NUMERIC as float and still need an exact cursor
+
+    Returns:
+        (query, extra named params)
+    """
+    extra_columns = f",\n        cb.bid::text AS {ANALYSIS_BID_KEY}" if exact_bid else ""
+    query = ANALYSIS_ROWS_SQL.format(extra_columns=extra_columns)
+    params = {}
+    if after is not None:
+        sort_date, project_id, company_tin, bid = after
+        params.update(after_date=sort_date, after_project=project_id, after_tin=company_tin, after_bid=bid)
+        if sort_date is None:
+            query += f"""
+        AND {ANALYSIS_SORT_DATE} IS NULL
+        AND (p.project_id, cb.company_tin, COALESCE(cb.bid, -1))
+            < (%(after_project)s, %(after_tin)s, %(after_bid)s)
+            """
+        else:
+            query += f"""
+        AND (({ANALYSIS_SORT_DATE}, p.project_id, cb.company_tin, COALESCE(cb.bid, -1))
+             < (%(after_date)s, %(after_project)s, %(after_tin)s, %(after_bid)s)
+             OR {ANALYSIS_SORT_DATE} IS NULL)
+            """
+    query += f"""
+    ORDER BY 
+        {ANALYSIS_SORT_DATE} DESC NULLS LAST,
+        p.project_id DESC,
+        cb.company_tin DESC,
+        COALESCE(cb.bid, -1) DESC
+    """
+    if limit is not None:
+        query += " LIMIT %(limit)s"
+        params["limit"] = limit
+    return query, params
 
-@router.post("/company-bids-analysis")
-async def get_company_bids_analysis(request: CompanyAnalysisRequest):
+def _analysis_sort_key(row):
+    # row: dict of one raw analysis row
+    bid = row["bid"]
+    return [
+        row["contract_date"] or row["transaction_date"], row["project_id"], row["company_tin"],
+        str(bid) if bid is not None else "-1",
+    ]
+
+def _analysis_group_sql(group_by):
+    """Build the query aggregating the raw rows per company and group key"""
+    rows = ANALYSIS_ROWS_SQL.format(extra_columns=f""",
+        p.dept_name,
+        {ANALYSIS_SORT_DATE} AS bid_date""")
+    return f"""
+        WITH analysis AS ({rows})
+        SELECT
+            company_tin,
+            MIN(company_name) AS company_name,
+            {ANALYSIS_GROUPS[group_by]} AS key,
+            COUNT(*) AS bids,
+            COUNT(*) FILTER (WHERE is_winner) AS wins,
+            SUM(sum_price_agree) AS total_value,
+            SUM(bid) AS total_bid,
+            AVG(price_cut) AS avg_price_cut
+        FROM analysis
+        GROUP BY company_tin, 3
+        ORDER BY company_tin, 3 NULLS LAST
+    """
+
+ANALYSIS_SERIES_FIELDS = ("key", "bids", "wins", "total_value", "total_bid", "avg_price_cut")
+
+def _analysis_series(rows, company_tins):
+    """
+    Turn grouped rows into one series per company, in request order.
+
+    Each series holds the group keys and one array per metric, ready to be
+    drawn as a chart series.
+    """
+    directory = get_company_directory()
+    series = {}
+    for row in rows:
+        entry = series.get(row["company_tin"])
+        if entry is None:
+            name = directory.name(row["company_tin"]) if directory is not None else None
+            entry = series[row["company_tin"]] = {
+                "company_tin": row["company_tin"],
+                "company_name": name or row["company_name"],
+                **{field: [] for field in ANALYSIS_SERIES_FIELDS},
+            }
+        for field in ANALYSIS_SERIES_FIELDS:
+            value = row[field]
+            entry[field].append(float(value) if isinstance(value, Decimal) else value)
+    return [series[tin] for tin in dict.fromkeys(company_tins) if tin in series]
+
+@router.post("/company-bids-analysis", responses=COLUMNAR_RESPONSES)
+@replica_reads
+async def get_company_bids_analysis(
+    request: CompanyAnalysisRequest,
+    http_request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_ANALYSIS_PAGE, ge=1, le=MAX_ANALYSIS_PAGE, description="Raw rows per page"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    max_points: Optional[int] = Query(None, ge=3, le=MAX_ANALYSIS_PAGE, description="Downsample each company's bids to about this many points"),
+    downsample_value: str = Query("bid", pattern="^(bid|price_cut)$", description="Value whose shape over time the downsampling preserves"),
+    output_format: str = Depends(negotiate_format)
+):
     """
     Get comprehensive bidding data for multiple companies.
+
+    Without `group_by`, returns the raw bid rows newest first, at most
+    `limit` per request; the next page's cursor is sent in the X-Next-Cursor
+    and Link headers (absent on the last page). With `group_by` (company,
+    month, quarter, department or price_cut), the rows are aggregated in the
+    database into bids, wins, total project value, total bid and average
+    price cut per company and group, returned as one series per company.
+
+    With `max_points`, every raw row is considered and each company's bids
+    are downsampled to about that many points with Largest-Triangle-Three-
+    Buckets over (bid date, `downsample_value`); winning bids, outliers and
+    undated bids are always kept. The result is not paginated.
+
+    Sends Arrow IPC or msgpack columns instead of JSON when the Accept
+    header asks for them (grouped results as flat rows).
     
     Args:
-        request: List of company TINs to analyze
+        request: Company TINs to analyze and the aggregation mode
+        limit: Raw rows per page
+        cursor: Opaque cursor of the next raw page
+        max_points: Points per company after downsampling
+        downsample_value: "bid" or "price_cut"
+        output_format: Encoding negotiated from the Accept header
         
     Returns:
         Combined project bidding data with additional metrics
     """
-    logger.info(f"Analyzing bids for companies: {request.company_tins}")
+    logger.info(f"Analyzing bids for companies: {request.company_tins} (group_by={request.group_by})")
     
     if not request.company_tins:
         raise HTTPException(status_code=400, detail="No company TINs provided")
         
     try:
-        # Connect to database
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Create placeholders for SQL IN clause
-        placeholders = ', '.join(['%s'] * len(request.company_tins))
-        
-        # Query to get all projects for these companies with additional metrics
-        query = f"""
-            WITH company_bids AS (
-                SELECT 
-                    b.project_id,
-                    b.tin AS company_tin,
-                    b.company AS company_name,
-                    b.bid
-                FROM public_data.thai_project_bid_info b
-                WHERE b.tin IN ({placeholders})
+        params = {"company_tins": request.company_tins}
+
+        if request.group_by is not None:
+            if cursor is not None or max_points is not None:
+                raise HTTPException(status_code=400, detail="Pagination and downsampling only apply to raw rows")
+            query = _analysis_group_sql(request.group_by)
+            params["bucket_width"] = request.price_cut_bucket
+
+            if output_format != "json":
+                description, columns = await fetch_columns(query, params)
+                return columnar_response(output_format, description, columns)
+
+            rows = await fetch_all(query, params)
+            series = _analysis_series(rows, request.company_tins)
+            logger.info(f"Aggregated {len(rows)} groups for the selected companies")
+            return Response(
+                content=render_json({"group_by": request.group_by, "series": series}, AnalysisSeriesResponse),
+                media_type="application/json",
+                headers={"Vary": "Accept"},
             )
-            SELECT 
-                p.project_id,
-                p.project_name,
-                p.winner,
-                p.winner_tin,
-                p.sum_price_agree,
-                p.price_build,
-                TO_CHAR(p.transaction_date, 'YYYY-MM-DD') as transaction_date,
-                TO_CHAR(p.contract_date, 'YYYY-MM-DD') as contract_date,
-                cb.company_tin,
-                cb.company_name,
-                cb.bid,
-                CASE 
-                    WHEN p.price_build > 0 THEN 
-                        (p.sum_price_agree / p.price_build - 1)
-                    ELSE NULL
-                END AS price_cut
-            FROM public_data.thai_govt_project p
-            JOIN company_bids cb ON p.project_id = cb.project_id
-            WHERE p.project_name IS NOT NULL
-            ORDER BY 
-                COALESCE(p.contract_date, p.transaction_date) DESC NULLS LAST
-        """
-        
-        # Execute query
-        cursor.execute(query, request.company_tins)
-        results = cursor.fetchall()
-        
-        # Convert to list of dictionaries
-        projects = [dict(row) for row in results]
-        
-        # Calculate additional metrics
-        for project in projects:
-            # Ensure price_cut is a number (may be NULL in the database)
-            if project["price_cut"] is None:
-                # Estimate a price cut based on typical industry patterns
-                # This is a fallback when data is missing
-                project["price_cut"] = -0.05  # Default to 5% discount
-            
-            # Add a field to indicate if this company won the bid
-            project["is_winner"] = (project["winner_tin"] == project["company_tin"])
-        
-        logger.info(f"Found {len(projects)} projects for the selected companies")
-        
-        # Close connection
-        cursor.close()
-        conn.close()
-        
-        return projects
-        
+
+        if max_points is not None:
+            if cursor is not None:
+                raise HTTPException(status_code=400, detail="Downsampled results are not paginated")
+            query, _ = _analysis_rows_sql()
+
+            if output_format != "json":
+                description, columns = await fetch_columns(query, params)
+                names = [column.name for column in description]
+                kept = _downsample_analysis(names, columns, max_points, downsample_value)
+                logger.info(f"Downsampled {len(columns[0]) if columns else 0} bids to {len(kept)}")
+                return columnar_response(output_format, description, [[column[i] for i in kept] for column in columns])
+
+            body = await run_db(_render_downsampled_analysis, query, params, max_points, downsample_value)
+            return Response(content=body, media_type="application/json", headers={"Vary": "Accept"})
+
+        after = None
+        if cursor is not None:
+            after = decode_cursor(cursor).get("after")
+            if not isinstance(after, list) or len(after) != 4:
+                raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+        if output_format != "json":
+            # Fetch one extra row to learn whether there is a next page
+            query, page_params = _analysis_rows_sql(after, limit + 1, exact_bid=True)
+            params.update(page_params)
+            description, columns = await fetch_columns(query, params)
+            more = bool(columns) and len(columns[0]) > limit
+            columns = [column[:limit] for column in columns]
+            headers = {"Vary": "Accept"}
+            if more:
+                names = [column.name for column in description]
+                last = {name: column[-1] for name, column in zip(names, columns)}
+                # The bid column arrives as float; the cursor needs the exact NUMERIC
+                last["bid"] = last[ANALYSIS_BID_KEY]
+                headers.update(next_page_headers(http_request, encode_cursor({"after": _analysis_sort_key(last)})))
+            description, columns = description[:-1], columns[:-1]
+            logger.info(f"Found {len(columns[0]) if columns else 0} projects for the selected companies (more={more})")
+            encoded = columnar_response(output_format, description, columns)
+            encoded.headers.update(headers)
+            return encoded
+
+        query, page_params = _analysis_rows_sql(after, limit + 1)
+        params.update(page_params)
+
+        # Rows are fetched in batches of tuples and written straight to JSON
+        body, last, more = await run_db(_render_analysis_page, query, params, limit)
+        headers = {"Vary": "Accept"}
+        if more:
+            headers.update(next_page_headers(http_request, encode_cursor({"after": _analysis_sort_key(last)})))
+
+        logger.info(f"Rendered {len(body)} bytes of projects for the selected companies (more={more})")
+
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error analyzing company bids: {str(e)}")
         logger.error(f"Exception details: {e}")
-        raise HTTPException(status_code=500, detail=f"Error analyzing company bids: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error analyzing company bids: {str(e)}")
+
+def _render_analysis_page(conn, query, params, limit):
+    """
+    Render the first limit rows of a query that fetches limit + 1.
+
+    Returns:
+        (JSON body, last rendered row as a dict or None, whether more rows exist)
+    """
+    state = {"fetched": 0, "last": None}
+
+    def batches():
+        for columns, rows in iter_row_batches(conn, query, params):
+            kept = rows[:max(limit - state["fetched"], 0)]
+            state["fetched"] += len(rows)
+            if kept:
+                state["last"] = dict(zip(columns, kept[-1]))
+                yield columns, kept
+            # The extra row has been seen: the page is complete
+            if state["fetched"] > limit:
+                return
+
+    body = render_rows_json(batches())
+    return body, state["last"], state["fetched"] > limit
+
+def _downsample_analysis(names, columns, max_points, value):
+    """
+    Pick the raw analysis rows to keep when each company's series is downsampled.
+
+    Args:
+        names: Column names
+        columns: One sequence of values per column
+        max_points: Points per company
+        value: Column plotted against the bid date ("bid" or "price_cut")
+
+    Returns:
+        Sorted row positions
+    """
+    column = dict(zip(names, columns))
+    if not columns or not len(columns[0]):
+        return np.arange(0)
+
+    dates = np.array(
+        [contract or transaction for contract, transaction in zip(column["contract_date"], column["transaction_date"])],
+        dtype="datetime64[D]",
+    )
+    x = np.where(np.isnat(dates), np.nan, dates.astype(np.int64).astype(np.float64))
+    y = np.array([np.nan if item is None else float(item) for item in column[value]])
+    wins = np.array(column["is_winner"], dtype=bool)
+
+    _, company = np.unique(np.array(column["company_tin"], dtype=object), return_inverse=True)
+    order = np.argsort(company, kind="stable")
+    groups = np.split(order, np.flatnonzero(np.diff(company[order])) + 1)
+    kept = [rows[downsample(x[rows], y[rows], max_points, wins[rows])] for rows in groups]
+    return np.sort(np.concatenate(kept))
+
+def _render_downsampled_analysis(conn, query, params, max_points, value):
+    """Fetch every raw analysis row and render the downsampled ones"""
+    names, rows = (), []
+    for names, batch in iter_row_batches(conn, query, params):
+        rows.extend(batch)
+    kept = _downsample_analysis(names, list(zip(*rows)), max_points, value)
+    logger.info(f"Downsampled {len(rows)} bids to {len(kept)}")
+    return render_rows_json([(names, [rows[i] for i in kept])])
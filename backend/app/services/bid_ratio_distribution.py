@@ -0,0 +1,228 @@
+# app/services/bid_ratio_distribution.py
+"""
+In-process distribution of per-company average bid ratios.
+
+Bid strategy ranks a company's average bid ratio against every company
+with at least `MIN_BIDS` bids in `company_bid_summary`. The averages are
+kept as one sorted NumPy array, so a percentile is a binary search instead
+of an aggregate over the whole summary table. Companies whose average is
+undefined (no project price to compare against) are counted in the total
+but never rank below anyone, exactly like the SQL the lookup replaces.
+
+After an incremental summary refresh only the recomputed TINs are removed
+from and re-inserted into the array; a full rebuild reads one row per
+company. Each rebuild produces a new object that is swapped in, so readers
+never see a half-updated distribution.
+"""
+import time
+import logging
+import numpy as np
+from .company_summary import CONSUMER as SUMMARY_CONSUMER, get_last_summary_changes
+from .change_log import get_consumer_state
+
+logger = logging.getLogger(__name__)
+
+MIN_BIDS = 3
+
+_AVERAGES_SQL = """
+    SELECT
+        tin,
+        SUM(bid_ratio_sum) / NULLIF(SUM(bid_ratio_count), 0) AS avg_ratio
+    FROM public_data.company_bid_summary
+"""
+
+_AVERAGES_GROUP = """
+    GROUP BY tin
+    HAVING SUM(total_bids) >= %s
+"""
+
+# Marks a TIN that no longer qualifies in BidRatioDistribution.with_changes
+_REMOVED = object()
+
+def _as_float(value):
+    return float(value) if value is not None else None
+
+class BidRatioDistribution:
+    """
+    Immutable sorted distribution of average bid ratios.
+
+    Args:
+        averages: Dict of TIN -> average bid ratio (None when undefined)
+        version: Summary change id the averages reflect
+    """
+
+    def __init__(self, averages, version):
+        self.averages = averages
+        self.version = version
+        defined = [value for value in averages.values() if value is not None]
+        self.values = np.sort(np.asarray(defined, dtype=np.float64))
+        self.undefined_count = len(averages) - len(defined)
+        self.built_at = time.time()
+
+    @property
+    def total_count(self):
+        return len(self.averages)
+
+    def with_changes(self, changed, version):
+        """
+        Return a new distribution with the averages of some TINs replaced.
+
+        Args:
+            changed: Dict of TIN -> new average, or `_REMOVED` for a TIN
+                that no longer qualifies
+            version: Summary change id the result reflects
+
+        Returns:
+            New BidRatioDistribution
+        """
+        averages = dict(self.averages)
+        removed = []
+        added = []
+        for tin, value in changed.items():
+            old = averages.pop(tin, _REMOVED)
+            if old is not _REMOVED and old is not None:
+                removed.append(old)
+            if value is not _REMOVED:
+                averages[tin] = value
+                if value is not None:
+                    added.append(value)
+
+        values = self.values
+        if removed:
+            removed = np.sort(np.asarray(removed, dtype=np.float64))
+            # Equal values occupy consecutive slots; offset duplicates so each
+            # removal takes a different one
+            positions = np.searchsorted(values, removed, side="left")
+            positions += np.arange(len(removed)) - np.searchsorted(removed, removed, side="left")
+            values = np.delete(values, positions)
+        if added:
+            added = np.sort(np.asarray(added, dtype=np.float64))
+            values = np.insert(values, np.searchsorted(values, added, side="left"), added)
+
+        distribution = BidRatioDistribution.__new__(BidRatioDistribution)
+        distribution.averages = averages
+        distribution.version = version
+        distribution.values = values
+        distribution.undefined_count = len(averages) - len(values)
+        distribution.built_at = time.time()
+        return distribution
+
+    def percentile(self, tin):
+        """
+        Percentage of ranked companies whose average is <= the company's.
+
+        Returns:
+            Percentile (0 when the company is not ranked or has no average),
+            or None when no company is ranked at all
+        """
+        if not self.averages:
+            return None
+        target = self.averages.get(tin)
+        if target is None:
+            return 0.0
+        below = int(np.searchsorted(self.values, target, side="right"))
+        return 100.0 * below / self.total_count
+
+    def histogram(self, bins, low=None, high=None):
+        """
+        Bucket the defined averages into equal-width bins.
+
+        Args:
+            bins: Number of bins
+            low: Lower edge (defaults to the smallest average)
+            high: Upper edge (defaults to the largest average)
+
+        Returns:
+            List of {"start", "end", "count"} dictionaries
+        """
+        if not len(self.values):
+            return []
+        low = float(self.values[0]) if low is None else low
+        high = float(self.values[-1]) if high is None else high
+        if high <= low:
+            high = low + 1e-9
+        edges = np.linspace(low, high, bins + 1)
+        # Counting through searchsorted keeps this O(bins log n); the last
+        # bin is closed on the right like numpy.histogram
+        cumulative = np.searchsorted(self.values, edges, side="left")
+        cumulative[-1] = np.searchsorted(self.values, edges[-1], side="right")
+        counts = np.diff(cumulative)
+        return [
+            {"start": float(edges[i]), "end": float(edges[i + 1]), "count": int(counts[i])}
+            for i in range(bins)
+        ]
+
+    def quantiles(self, probabilities):
+        """Return the averages at the given probabilities (linear interpolation)"""
+        if not len(self.values):
+            return {p: None for p in probabilities}
+        return {p: float(np.quantile(self.values, p)) for p in probabilities}
+
+    def stats(self):
+        """Return size and freshness information"""
+        return {
+            "companies": self.total_count,
+            "undefined": self.undefined_count,
+            "size_bytes": int(self.values.nbytes),
+            "version": self.version,
+            "built_at": self.built_at,
+        }
+
+_distribution = None
+
+def get_bid_ratio_distribution():
+    """Return the current distribution, or None if it has not been loaded"""
+    return _distribution
+
+def _load_averages(cursor, tins=None):
+    if tins is None:
+        cursor.execute(_AVERAGES_SQL + _AVERAGES_GROUP, (MIN_BIDS,))
+    else:
+        cursor.execute(_AVERAGES_SQL + " WHERE tin = ANY(%s)" + _AVERAGES_GROUP, (list(tins), MIN_BIDS))
+    return {row["tin"]: _as_float(row["avg_ratio"]) for row in cursor.fetchall()}
+
+def refresh_bid_ratio_distribution(conn, full=False):
+    """
+    Bring the distribution up to date with company_bid_summary.
+
+    When the last summary refresh in this process started from the
+    distribution's version, only the TINs it recomputed are reloaded;
+    otherwise (first load, another process refreshed the summary, `full`)
+    the distribution is rebuilt from every summary row.
+
+    Returns:
+        Dictionary describing what was done
+    """
+    global _distribution
+    started = time.monotonic()
+    cursor = conn.cursor()
+    state = get_consumer_state(cursor, SUMMARY_CONSUMER)
+    version = state["last_change_id"] if state else None
+
+    distribution = _distribution
+    changes = get_last_summary_changes()
+    if not full and distribution is not None and distribution.version == version:
+        conn.rollback()
+        cursor.close()
+        return {"mode": "unchanged", **distribution.stats()}
+
+    if (
+        not full and distribution is not None and changes is not None
+        and changes["tins"] is not None
+        and changes["from"] == distribution.version and changes["to"] == version
+    ):
+        averages = _load_averages(cursor, changes["tins"])
+        changed = {tin: averages.get(tin, _REMOVED) for tin in changes["tins"]}
+        distribution = distribution.with_changes(changed, version)
+        mode = "incremental"
+    else:
+        distribution = BidRatioDistribution(_load_averages(cursor), version)
+        mode = "full"
+
+    conn.rollback()
+    cursor.close()
+    _distribution = distribution
+
+    result = {"mode": mode, "duration_ms": round((time.monotonic() - started) * 1000, 1), **distribution.stats()}
+    logger.info(f"Bid ratio distribution refreshed: {result}")
+    return result
@@ -0,0 +1,332 @@
+# app/services/bid_ratio_sketch.py
+"""
+Per-company bid ratio sketches.
+
+For every (tin, won) pair two small tables keep what bid-strategy used to
+compute from the raw joined bid rows on each request:
+
+- `company_bid_ratio_moments`: count, mean, M2 (sum of squared deviations),
+  min and max of bid / sum_price_agree
+- `company_bid_ratio_buckets`: a logarithmically bucketed quantile sketch
+  (DDSketch). Bucket i counts the ratios in (gamma^(i-1), gamma^i] with
+  gamma = (1 + a) / (1 - a), so any quantile read back from it is within a
+  relative error of `a` (RELATIVE_ACCURACY) of the exact value.
+
+Both are mergeable: the won and lost halves of a company, or several
+companies, combine by adding bucket counts and merging moments, so the
+overall figures and any number of quantiles come from a few dozen rows
+instead of a sort over every bid. The tables are maintained from the change
+log like `company_bid_summary`: a refresh recomputes only the affected TINs.
+"""
+import math
+import time
+import logging
+from fastapi import HTTPException
+from .change_log import (
+    read_watermark,
+    get_consumer_state,
+    mark_consumed,
+    prune_change_log,
+    get_refresh_status,
+    collect_affected_tins,
+)
+
+logger = logging.getLogger(__name__)
+
+CONSUMER = "company_bid_ratio_sketch"
+
+# Quantiles are accurate to 1% of their value
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+
+# Ratios at or below this (zero or negative prices) share the lowest bucket
+MIN_RATIO = 1e-9
+
+# Set once a refresh has completed, so readers skip the state lookup afterwards
+_sketch_ready = False
+
+SKETCH_DDL = """
+    CREATE TABLE IF NOT EXISTS public_data.company_bid_ratio_moments (
+        tin TEXT NOT NULL,
+        won BOOLEAN NOT NULL,
+        ratio_count BIGINT NOT NULL,
+        ratio_mean NUMERIC NOT NULL,
+        ratio_m2 NUMERIC NOT NULL,
+        ratio_min NUMERIC NOT NULL,
+        ratio_max NUMERIC NOT NULL,
+        refreshed_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        PRIMARY KEY (tin, won)
+    );
+    CREATE TABLE IF NOT EXISTS public_data.company_bid_ratio_buckets (
+        tin TEXT NOT NULL,
+        won BOOLEAN NOT NULL,
+        bucket INTEGER NOT NULL,
+        bucket_count BIGINT NOT NULL,
+        PRIMARY KEY (tin, won, bucket)
+    );
+"""
+
+# Same rows, ratio and won/lost split the bid-strategy statistics used
+BID_RATIOS_SELECT = """
+    SELECT
+        b.tin,
+        (b.tin = p.winner_tin) IS TRUE AS won,
+        b.bid / NULLIF(p.sum_price_agree, 0) AS bid_ratio
+    FROM public_data.thai_project_bid_info b
+    LEFT JOIN public_data.thai_govt_project p ON b.project_id = p.project_id
+    WHERE b.tin IS NOT NULL AND b.bid > 0
+"""
+
+MOMENTS_INSERT = """
+    INSERT INTO public_data.company_bid_ratio_moments
+        (tin, won, ratio_count, ratio_mean, ratio_m2, ratio_min, ratio_max)
+    SELECT
+        tin,
+        won,
+        COUNT(bid_ratio),
+        AVG(bid_ratio),
+        VAR_POP(bid_ratio) * COUNT(bid_ratio),
+        MIN(bid_ratio),
+        MAX(bid_ratio)
+    FROM ({select}) r
+    WHERE bid_ratio IS NOT NULL
+    GROUP BY tin, won
+"""
+
+BUCKETS_INSERT = """
+    INSERT INTO public_data.company_bid_ratio_buckets (tin, won, bucket, bucket_count)
+    SELECT tin, won, bucket, COUNT(*)
+    FROM (
+        SELECT
+            tin,
+            won,
+            CEIL(LN(GREATEST(bid_ratio, %(min_ratio)s)::float8) / LN(%(gamma)s::float8))::int AS bucket
+        FROM ({select}) r
+        WHERE bid_ratio IS NOT NULL
+    ) bucketed
+    GROUP BY tin, won, bucket
+"""
+
+class BidRatioSketch:
+    """
+    Moments plus a DDSketch of bid ratios.
+
+    Args:
+        count: Number of ratios
+        mean: Mean ratio
+        m2: Sum of squared deviations from the mean
+        minimum: Smallest ratio
+        maximum: Largest ratio
+        buckets: Dict of bucket index -> count
+    """
+
+    def __init__(self, count=0, mean=0.0, m2=0.0, minimum=None, maximum=None, buckets=None):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.min = minimum
+        self.max = maximum
+        self.buckets = buckets if buckets is not None else {}
+
+    def merge(self, other):
+        """Return a new sketch covering the ratios of both sketches"""
+        if not other.count:
+            return BidRatioSketch(self.count, self.mean, self.m2, self.min, self.max, dict(self.buckets))
+        if not self.count:
+            return BidRatioSketch(other.count, other.mean, other.m2, other.min, other.max, dict(other.buckets))
+
+        # Chan et al. pairwise update
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        mean = self.mean + delta * other.count / count
+        m2 = self.m2 + other.m2 + delta * delta * self.count * other.count / count
+        buckets = dict(self.buckets)
+        for bucket, bucket_count in other.buckets.items():
+            buckets[bucket] = buckets.get(bucket, 0) + bucket_count
+        return BidRatioSketch(count, mean, m2, min(self.min, other.min), max(self.max, other.max), buckets)
+
+    @property
+    def std(self):
+        """Sample standard deviation (like STDDEV), None below two ratios"""
+        if self.count < 2:
+            return None
+        return math.sqrt(max(self.m2, 0.0) / (self.count - 1))
+
+    def _value_at_rank(self, rank):
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen > rank:
+                value = 2 * GAMMA ** bucket / (GAMMA + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def quantile(self, q):
+        """
+        Estimate the q-quantile (0 <= q <= 1), interpolating between ranks
+        like PERCENTILE_CONT.
+
+        Returns:
+            A value within RELATIVE_ACCURACY of the exact quantile, or None
+            for an empty sketch
+        """
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        lower_rank = math.floor(rank)
+        lower = self._value_at_rank(lower_rank)
+        if rank == lower_rank:
+            return lower
+        upper = self._value_at_rank(lower_rank + 1)
+        return lower + (upper - lower) * (rank - lower_rank)
+
+def ensure_bid_ratio_sketch(conn):
+    """Create the sketch tables (change capture is installed by manage.py migrate)"""
+    cursor = conn.cursor()
+    cursor.execute(SKETCH_DDL)
+    cursor.close()
+    conn.commit()
+
+def _insert_sketches(cursor, select):
+    params = {"min_ratio": MIN_RATIO, "gamma": GAMMA}
+    cursor.execute(MOMENTS_INSERT.format(select=select), params)
+    rows_written = cursor.rowcount
+    cursor.execute(BUCKETS_INSERT.format(select=select), params)
+    return rows_written, cursor.rowcount
+
+def refresh_bid_ratio_sketch(conn, full=False):
+    """
+    Bring the moments and bucket tables up to date.
+
+    Args:
+        conn: Database connection (the refresh commits on it)
+        full: Rebuild every company instead of only the TINs with logged changes
+
+    Returns:
+        Dictionary describing the refresh (mode, rows written, duration)
+    """
+    started = time.monotonic()
+    high = read_watermark(conn)
+    cursor = conn.cursor()
+
+    # Serialize concurrent refreshes (background loop, admin endpoint, CLI)
+    cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (CONSUMER,))
+    state = get_consumer_state(cursor, CONSUMER)
+    if state is None:
+        full = True
+
+    if full:
+        logger.info("Rebuilding bid ratio sketches from scratch")
+        cursor.execute("DELETE FROM public_data.company_bid_ratio_moments")
+        cursor.execute("DELETE FROM public_data.company_bid_ratio_buckets")
+        moments_written, buckets_written = _insert_sketches(cursor, BID_RATIOS_SELECT)
+        affected = None
+    else:
+        low = state["last_change_id"]
+        if high <= low:
+            conn.rollback()
+            cursor.close()
+            return {"mode": "incremental", "affected_tins": 0, "rows_written": 0, "changes_applied": False,
+                    "duration_ms": round((time.monotonic() - started) * 1000, 1)}
+
+        affected = collect_affected_tins(cursor, "sketch_affected_tins", low, high)
+        for table in ("company_bid_ratio_moments", "company_bid_ratio_buckets"):
+            cursor.execute(
+                f"DELETE FROM public_data.{table} "
+                "WHERE tin IN (SELECT tin FROM sketch_affected_tins)"
+            )
+        moments_written, buckets_written = _insert_sketches(
+            cursor,
+            BID_RATIOS_SELECT + " AND b.tin IN (SELECT tin FROM sketch_affected_tins)"
+        )
+
+    mark_consumed(cursor, CONSUMER, high)
+    prune_change_log(cursor)
+    conn.commit()
+    cursor.close()
+
+    global _sketch_ready
+    _sketch_ready = True
+
+    result = {
+        "mode": "full" if full else "incremental",
+        "affected_tins": affected,
+        "rows_written": moments_written + buckets_written,
+        "changes_applied": True,
+        "duration_ms": round((time.monotonic() - started) * 1000, 1),
+    }
+    logger.info(f"Bid ratio sketches refreshed: {result}")
+    return result
+
+def get_bid_ratio_sketch_status(conn):
+    """Return refresh time and staleness of the bid ratio sketches"""
+    cursor = conn.cursor()
+    status = get_refresh_status(cursor, CONSUMER)
+    cursor.close()
+    return status
+
+def require_bid_ratio_sketch(cursor):
+    """Raise 503 until the sketches have been built at least once"""
+    global _sketch_ready
+    if _sketch_ready:
+        return
+    cursor.execute("SELECT to_regclass('public_data.analytics_refresh_state') IS NOT NULL AS present")
+    if cursor.fetchone()["present"] and get_consumer_state(cursor, CONSUMER) is not None:
+        _sketch_ready = True
+        return
+    raise HTTPException(
+        status_code=503,
+        detail="Bid ratio statistics are still being built; try again shortly"
+    )
+
+def load_bid_ratio_sketches(cursor, company_tins):
+    """
+    Read the won and lost sketches of one or more companies.
+
+    Args:
+        cursor: Database cursor
+        company_tins: TINs to load
+
+    Returns:
+        Dict of won (bool) -> BidRatioSketch, merged over the TINs; a side
+        with no ratios is an empty sketch
+    """
+    require_bid_ratio_sketch(cursor)
+    sketches = {True: BidRatioSketch(), False: BidRatioSketch()}
+
+    cursor.execute(
+        """
+        SELECT won, ratio_count, ratio_mean, ratio_m2, ratio_min, ratio_max
+        FROM public_data.company_bid_ratio_moments
+        WHERE tin = ANY(%s)
+        """,
+        (list(company_tins),)
+    )
+    moments = cursor.fetchall()
+
+    cursor.execute(
+        """
+        SELECT won, bucket, bucket_count
+        FROM public_data.company_bid_ratio_buckets
+        WHERE tin = ANY(%s)
+        """,
+        (list(company_tins),)
+    )
+    buckets = {True: {}, False: {}}
+    for row in cursor.fetchall():
+        side = buckets[row["won"]]
+        side[row["bucket"]] = side.get(row["bucket"], 0) + row["bucket_count"]
+
+    for row in moments:
+        sketch = BidRatioSketch(
+            row["ratio_count"],
+            float(row["ratio_mean"]),
+            float(row["ratio_m2"]),
+            float(row["ratio_min"]),
+            float(row["ratio_max"]),
+        )
+        sketches[row["won"]] = sketches[row["won"]].merge(sketch)
+
+    for won, sketch in sketches.items():
+        sketch.buckets = buckets[won]
+    return sketches
@@ -0,0 +1,218 @@
+# app/services/cache.py
+"""
+Response cache for the read-heavy analytics endpoints.
+
+Entries hold the rendered JSON body, so a hit skips both the SQL and the
+pydantic validation and serialization. Keys are the endpoint name plus its
+normalized parameters. Each endpoint has its own TTL, and the least
+recently used entries are evicted once the cache exceeds its byte budget.
+
+The cache records the version of the data its entries were rendered from:
+the change ids the derived stores have consumed, as stored in the database.
+Every refresh in every worker compares that with the current consumer
+state and clears the cache once it has moved, so workers that did not run
+the refresh themselves stop serving old bodies too. A response rendered
+while the version changed is not stored.
+"""
+import json
+import time
+import logging
+import functools
+import threading
+from collections import OrderedDict
+from fastapi import Request, Response
+from ..utils.env import get_cache_config
+from ..utils.serialization import render_json, render_json_fast, merged_response_headers
+
+logger = logging.getLogger(__name__)
+
+class ResponseCache:
+    """
+    Byte-budgeted LRU cache of rendered responses.
+
+    Args:
+        max_bytes: Upper bound on the total size of cached bodies
+        ttls: Endpoint name -> TTL in seconds (0 disables caching for it)
+    """
+
+    def __init__(self, max_bytes, ttls):
+        self.max_bytes = max_bytes
+        self.ttls = dict(ttls)
+        self._entries = OrderedDict()   # key -> (endpoint, body, headers, expires_at)
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._counters = {}
+        self.version = None
+
+    def ttl(self, endpoint):
+        return self.ttls.get(endpoint, 0)
+
+    def _count(self, endpoint, counter):
+        counters = self._counters.setdefault(
+            endpoint, {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+        )
+        counters[counter] += 1
+
+    def _drop(self, key):
+        endpoint, body, _, _ = self._entries.pop(key)
+        self._bytes -= len(body)
+        return endpoint
+
+    def get(self, endpoint, key):
+        """Return the cached (body, headers), or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[3] <= time.monotonic():
+                self._drop(key)
+                self._count(endpoint, "expirations")
+                entry = None
+            if entry is None:
+                self._count(endpoint, "misses")
+                return None
+            self._entries.move_to_end(key)
+            self._count(endpoint, "hits")
+            return entry[1], entry[2]
+
+    def put(self, endpoint, key, body, headers=None, version=None):
+        """
+        Store a body, evicting least recently used entries to stay in budget.
+
+        Args:
+            version: Cache version read before the body was rendered; the body
+                is dropped if the version has changed since
+        """
+        ttl = self.ttl(endpoint)
+        if ttl <= 0 or len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if version != self.version:
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (endpoint, body, headers or {}, time.monotonic() + ttl)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._count(self._drop(oldest), "evictions")
+
+    def invalidate(self, endpoint=None):
+        """
+        Drop cached entries.
+
+        Args:
+            endpoint: Only drop this endpoint's entries (default: everything)
+
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if endpoint is None or entry[0] == endpoint]
+            for key in keys:
+                self._count(self._drop(key), "invalidations")
+        if keys:
+            logger.info(f"Response cache invalidated: endpoint={endpoint or 'all'}, entries={len(keys)}")
+        return len(keys)
+
+    def sync(self, version):
+        """
+        Move the cache to a new data version, dropping every entry if it changed.
+
+        Args:
+            version: Change ids of the stores the cached responses read
+
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            if version == self.version:
+                return 0
+            self.version = version
+        return self.invalidate()
+
+    def stats(self):
+        """Return size, budget and per-endpoint counters"""
+        with self._lock:
+            endpoints = {
+                name: {"ttl_seconds": ttl, **self._counters.get(name, {})}
+                for name, ttl in self.ttls.items()
+            }
+            totals = {}
+            for counters in self._counters.values():
+                for counter, value in counters.items():
+                    totals[counter] = totals.get(counter, 0) + value
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "version": self.version,
+                **totals,
+                "endpoints": endpoints,
+            }
+
+_cache = None
+
+def get_response_cache():
+    """Return the process-wide response cache, creating it on first use"""
+    global _cache
+    if _cache is None:
+        config = get_cache_config()
+        _cache = ResponseCache(config["max_bytes"], config["ttls"])
+    return _cache
+
+def _cache_key(endpoint, params):
+    # Parameter order and surrounding whitespace do not change the key;
+    # injected Request/Response objects are not part of it
+    normalized = {
+        name: value.strip() if isinstance(value, str) else value
+        for name, value in params.items()
+        if not isinstance(value, (Request, Response))
+    }
+    return endpoint + ":" + json.dumps(normalized, sort_keys=True, default=str, ensure_ascii=False)
+
+def cached(endpoint, response_model, fast=False):
+    """
+    Cache a route handler's rendered response.
+
+    Apply below the router decorator; the handler must take its parameters
+    as keyword arguments, which is how FastAPI calls it. Headers the handler
+    sets on an injected `Response` are cached with the body. Responses
+    returned by the handler itself (e.g. streaming) are passed through.
+
+    Args:
+        endpoint: Cache policy name (see CACHE_TTL_* settings)
+        response_model: Model used to validate and render the result
+        fast: Render with the compiled JSON encoder (see app/utils/serialization.py)
+    """
+    render = render_json_fast if fast else render_json
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(**kwargs):
+            cache = get_response_cache()
+            if cache.ttl(endpoint) <= 0:
+                result = await func(**kwargs)
+                if not fast or isinstance(result, Response):
+                    return result
+                return Response(content=render(result, response_model), media_type="application/json",
+                                headers=merged_response_headers(kwargs))
+
+            key = _cache_key(endpoint, kwargs)
+            version = cache.version
+            entry = cache.get(endpoint, key)
+            if entry is not None:
+                body, headers = entry
+                return Response(content=body, media_type="application/json", headers={**headers, "X-Cache": "HIT"})
+
+            result = await func(**kwargs)
+            if isinstance(result, Response):
+                return result
+
+            # FastAPI does not merge the injected response's headers into a returned Response
+            headers = merged_response_headers(kwargs)
+
+            body = render(result, response_model)
+            cache.put(endpoint, key, body, headers, version)
+            return Response(content=body, media_type="application/json", headers={**headers, "X-Cache": "MISS"})
+
+        return wrapper
+    return decorator
@@ -0,0 +1,290 @@
+# app/services/change_log.py
+"""
+Change capture for the derived analytics stores.
+
+Statement-level triggers on `thai_project_bid_info` and `thai_govt_project`
+append the touched (project_id, tin) pairs to `analytics_change_log`;
+project changes also record the old and new contract day. Each derived
+store (a "consumer") remembers the last change_id it has applied in
+`analytics_refresh_state`, so a refresh only has to look at the log rows
+written since then instead of recomputing from the full tables.
+
+The triggers sit on tables the scraper owns, so they are installed by
+`python manage.py migrate` and never by the app itself; at startup the
+refresh loop only checks that they are in place.
+"""
+import logging
+from ..utils.env import get_refresh_config
+
+logger = logging.getLogger(__name__)
+
+CHANGE_LOG_DDL = """
+    CREATE TABLE IF NOT EXISTS public_data.analytics_refresh_state (
+        consumer TEXT PRIMARY KEY,
+        last_change_id BIGINT NOT NULL DEFAULT 0,
+        refreshed_at TIMESTAMPTZ
+    );
+
+    -- project_id takes whatever type the source table uses so joins stay sargable
+    DO $$
+    BEGIN
+        IF to_regclass('public_data.analytics_change_log') IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE public_data.analytics_change_log (
+                    change_id BIGSERIAL PRIMARY KEY,
+                    project_id %s,
+                    tin TEXT,
+                    changed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                )',
+                (SELECT format_type(atttypid, atttypmod)
+                   FROM pg_attribute
+                  WHERE attrelid = 'public_data.thai_govt_project'::regclass
+                    AND attname = 'project_id')
+            );
+        END IF;
+    END $$;
+
+    -- Contract day of the old and new project rows, for the daily rollup
+    ALTER TABLE public_data.analytics_change_log ADD COLUMN IF NOT EXISTS contract_day DATE;
+
+    CREATE OR REPLACE FUNCTION public_data.log_bid_changes() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            INSERT INTO public_data.analytics_change_log (project_id, tin)
+            SELECT DISTINCT project_id, tin FROM old_rows;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO public_data.analytics_change_log (project_id, tin)
+            SELECT DISTINCT project_id, tin FROM new_rows;
+        END IF;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql;
+
+    -- Project rows carry no TIN; consumers resolve the bidders through project_id
+    CREATE OR REPLACE FUNCTION public_data.log_project_changes() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            INSERT INTO public_data.analytics_change_log (project_id, contract_day)
+            SELECT DISTINCT project_id, contract_date::date FROM old_rows;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO public_data.analytics_change_log (project_id, contract_day)
+            SELECT DISTINCT project_id, contract_date::date FROM new_rows;
+        END IF;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER IF EXISTS bid_info_log_insert ON public_data.thai_project_bid_info;
+    DROP TRIGGER IF EXISTS bid_info_log_update ON public_data.thai_project_bid_info;
+    DROP TRIGGER IF EXISTS bid_info_log_delete ON public_data.thai_project_bid_info;
+    CREATE TRIGGER bid_info_log_insert AFTER INSERT ON public_data.thai_project_bid_info
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION public_data.log_bid_changes();
+    CREATE TRIGGER bid_info_log_update AFTER UPDATE ON public_data.thai_project_bid_info
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION public_data.log_bid_changes();
+    CREATE TRIGGER bid_info_log_delete AFTER DELETE ON public_data.thai_project_bid_info
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION public_data.log_bid_changes();
+
+    DROP TRIGGER IF EXISTS project_log_insert ON public_data.thai_govt_project;
+    DROP TRIGGER IF EXISTS project_log_update ON public_data.thai_govt_project;
+    DROP TRIGGER IF EXISTS project_log_delete ON public_data.thai_govt_project;
+    CREATE TRIGGER project_log_insert AFTER INSERT ON public_data.thai_govt_project
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION public_data.log_project_changes();
+    CREATE TRIGGER project_log_update AFTER UPDATE ON public_data.thai_govt_project
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION public_data.log_project_changes();
+    CREATE TRIGGER project_log_delete AFTER DELETE ON public_data.thai_govt_project
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION public_data.log_project_changes();
+"""
+
+CAPTURE_TABLES = ("analytics_change_log", "analytics_refresh_state")
+
+CAPTURE_TRIGGERS = (
+    ("thai_project_bid_info", "bid_info_log_insert"),
+    ("thai_project_bid_info", "bid_info_log_update"),
+    ("thai_project_bid_info", "bid_info_log_delete"),
+    ("thai_govt_project", "project_log_insert"),
+    ("thai_govt_project", "project_log_update"),
+    ("thai_govt_project", "project_log_delete"),
+)
+
+def install_change_log(cursor):
+    """Create the change log, refresh state table and capture triggers (run by manage.py migrate)"""
+    cursor.execute(CHANGE_LOG_DDL)
+
+def missing_change_capture(cursor):
+    """
+    List the change capture objects that are not installed.
+
+    Returns:
+        Missing tables and triggers as qualified names, e.g.
+        "public_data.analytics_change_log" or
+        "public_data.thai_govt_project.project_log_insert"; empty when
+        everything is in place
+    """
+    cursor.execute(
+        """
+        SELECT c.relname AS table_name, t.tgname AS trigger_name
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        LEFT JOIN pg_trigger t ON t.tgrelid = c.oid AND NOT t.tgisinternal AND t.tgenabled <> 'D'
+        WHERE n.nspname = 'public_data' AND c.relname = ANY(%s)
+        """,
+        (list(CAPTURE_TABLES) + sorted({table for table, _ in CAPTURE_TRIGGERS}),)
+    )
+    rows = cursor.fetchall()
+    tables = {row["table_name"] for row in rows}
+    triggers = {(row["table_name"], row["trigger_name"]) for row in rows}
+
+    missing = [f"public_data.{table}" for table in CAPTURE_TABLES if table not in tables]
+    missing += [
+        f"public_data.{table}.{trigger}"
+        for table, trigger in CAPTURE_TRIGGERS
+        if (table, trigger) not in triggers
+    ]
+    return missing
+
+def read_watermark(conn):
+    """
+    Return the highest change_id that is safe to consume.
+
+    Briefly locking the log against writers waits out every transaction that
+    is still inserting into it, so no change_id at or below the returned value
+    can show up later. The lock is released before any refresh work starts.
+    """
+    cursor = conn.cursor()
+    cursor.execute("LOCK TABLE public_data.analytics_change_log IN SHARE ROW EXCLUSIVE MODE")
+    cursor.execute("SELECT COALESCE(MAX(change_id), 0) AS change_id FROM public_data.analytics_change_log")
+    watermark = cursor.fetchone()["change_id"]
+    cursor.close()
+    conn.commit()
+    return watermark
+
+def get_consumer_state(cursor, consumer):
+    """Return the refresh state row for a consumer, or None if it never refreshed"""
+    cursor.execute(
+        """
+        SELECT consumer, last_change_id, refreshed_at
+        FROM public_data.analytics_refresh_state
+        WHERE consumer = %s
+        """,
+        (consumer,)
+    )
+    return cursor.fetchone()
+
+def mark_consumed(cursor, consumer, change_id):
+    """Record that a consumer has applied every change up to change_id"""
+    cursor.execute(
+        """
+        INSERT INTO public_data.analytics_refresh_state (consumer, last_change_id, refreshed_at)
+        VALUES (%s, %s, now())
+        ON CONFLICT (consumer) DO UPDATE
+            SET last_change_id = EXCLUDED.last_change_id,
+                refreshed_at = EXCLUDED.refreshed_at
+        """,
+        (consumer, change_id)
+    )
+
+def forget_consumer(cursor, consumer):
+    """Drop a consumer's refresh state so it no longer holds back pruning"""
+    cursor.execute("DELETE FROM public_data.analytics_refresh_state WHERE consumer = %s", (consumer,))
+    return cursor.rowcount
+
+def prune_change_log(cursor):
+    """
+    Delete log rows that every active consumer has already applied.
+
+    A consumer that has not refreshed for ANALYTICS_STALE_CONSUMER_HOURS
+    (a disabled store, or a worker that is gone) is forgotten instead of
+    holding the log forever; if it comes back it finds no state and
+    rebuilds from scratch. A consumer whose refresh is running right now
+    holds its advisory lock and is never forgotten.
+    """
+    stale_after = get_refresh_config()["stale_consumer_seconds"]
+    cursor.execute(
+        """
+        SELECT consumer
+        FROM public_data.analytics_refresh_state
+        WHERE refreshed_at IS NULL OR refreshed_at < now() - make_interval(secs => %s)
+        """,
+        (stale_after,)
+    )
+    for row in cursor.fetchall():
+        cursor.execute("SELECT pg_try_advisory_xact_lock(hashtext(%s)) AS locked", (row["consumer"],))
+        if cursor.fetchone()["locked"]:
+            forget_consumer(cursor, row["consumer"])
+            logger.warning(f"Forgot stale change log consumer {row['consumer']}; it will rebuild on its next refresh")
+
+    cursor.execute(
+        """
+        DELETE FROM public_data.analytics_change_log
+        WHERE change_id <= (SELECT MIN(last_change_id) FROM public_data.analytics_refresh_state)
+        """
+    )
+    return cursor.rowcount
+
+def collect_affected_tins(cursor, table, low, high):
+    """
+    Create a temp table (dropped at commit) of the TINs whose derived rows
+    the changes in (low, high] invalidate: TINs touched directly by bid
+    changes, plus every bidder on changed projects.
+    """
+    cursor.execute(
+        f"""
+        CREATE TEMP TABLE {table} ON COMMIT DROP AS
+        SELECT l.tin
+        FROM public_data.analytics_change_log l
+        WHERE l.change_id > %(low)s AND l.change_id <= %(high)s
+          AND l.tin IS NOT NULL
+        UNION
+        SELECT b.tin
+        FROM public_data.analytics_change_log l
+        JOIN public_data.thai_project_bid_info b ON b.project_id = l.project_id
+        WHERE l.change_id > %(low)s AND l.change_id <= %(high)s
+          AND l.tin IS NULL
+          AND b.tin IS NOT NULL
+        """,
+        {"low": low, "high": high}
+    )
+    return cursor.rowcount
+
+def get_refresh_status(cursor, consumer):
+    """
+    Describe how far behind a consumer is.
+
+    Returns:
+        Dictionary with the last refresh time, the number of unapplied changes
+        and the age in seconds of the oldest unapplied change
+    """
+    cursor.execute(
+        """
+        SELECT
+            s.refreshed_at,
+            s.last_change_id,
+            EXTRACT(EPOCH FROM now() - s.refreshed_at) AS seconds_since_refresh,
+            (SELECT COUNT(*) FROM public_data.analytics_change_log l
+              WHERE l.change_id > s.last_change_id) AS pending_changes,
+            (SELECT EXTRACT(EPOCH FROM now() - MIN(l.changed_at)) FROM public_data.analytics_change_log l
+              WHERE l.change_id > s.last_change_id) AS staleness_seconds
+        FROM public_data.analytics_refresh_state s
+        WHERE s.consumer = %s
+        """,
+        (consumer,)
+    )
+    row = cursor.fetchone()
+    if not row:
+        return {"consumer": consumer, "built": False}
+
+    return {
+        "consumer": consumer,
+        "built": True,
+        "refreshed_at": row["refreshed_at"].isoformat() if row["refreshed_at"] else None,
+        "last_change_id": row["last_change_id"],
+        "seconds_since_refresh": float(row["seconds_since_refresh"] or 0),
+        "pending_changes": row["pending_changes"],
+        "staleness_seconds": float(row["staleness_seconds"] or 0),
+    }
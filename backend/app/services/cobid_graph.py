@@ -0,0 +1,543 @@
+# app/services/cobid_graph.py
+"""
+Co-bidding graph used by adjacent-companies and head-to-head.
+
+The graph answers both endpoints from memory with the same numbers as
+their SQL paths (app/services/h2h.py and the adjacent-companies query),
+which define the rules:
+
+- a shared project is one both sides bid on that exists in
+  thai_govt_project (bids are inner-joined to their project)
+- encounters are counted per competitor TIN *and name*, as distinct
+  shared projects; the company itself is matched by TIN under any name
+- company_wins and competitor_wins count winning bid rows (a bid whose
+  TIN is the project's winner_tin) on the projects shared with the
+  competitor's TIN, so duplicate winning rows count each time
+- ties in encounters are ordered by TIN, then name (code point order,
+  nulls last)
+
+Nodes are company TINs and name variants are (TIN, name) pairs. Two edge
+sets live in flat NumPy arrays sorted by a packed (source << 32 | target)
+key, which makes each a CSR sparse adjacency where a company's neighbours
+are one contiguous slice:
+
+- node edges (TIN -> TIN): shared projects and each side's winning rows
+- name edges (TIN -> name variant): shared projects per competitor name
+
+The graph also keeps the project -> name variant membership, each
+project's winner and its number of winning rows, so it can apply
+incremental updates: for every project named in the change log the old
+contribution is subtracted and the current one added. The whole structure
+persists to a single .npz file for fast restarts.
+"""
+import os
+import time
+import logging
+import numpy as np
+import psycopg2.extensions
+from .change_log import read_watermark, get_consumer_state, mark_consumed
+
+logger = logging.getLogger(__name__)
+
+CONSUMER = "cobid_graph"
+
+# Bumped whenever the saved arrays change meaning; older files are rebuilt
+FORMAT_VERSION = 2
+
+_EMPTY_NODE_EDGES = (
+    np.empty(0, dtype=np.int64),
+    np.empty(0, dtype=np.int64),
+    np.empty(0, dtype=np.int64),
+    np.empty(0, dtype=np.int64),
+)
+_EMPTY_NAME_EDGES = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+
+# Same rows as h2h.PROJECT_BIDDERS_SQL, for every project
+BID_ROWS_SQL = """
+    SELECT b.project_id, b.tin, b.company, p.winner_tin
+    FROM public_data.thai_project_bid_info b
+    JOIN public_data.thai_govt_project p ON b.project_id = p.project_id
+    WHERE b.tin IS NOT NULL
+"""
+
+def _project_pairs(left_project, right_project):
+    """
+    Pair every left row with every right row of the same project.
+
+    Both arrays must be sorted ascending.
+
+    Returns:
+        (left positions, right positions)
+    """
+    starts = np.searchsorted(right_project, left_project, side="left")
+    sizes = np.searchsorted(right_project, left_project, side="right") - starts
+    total = int(sizes.sum())
+    left = np.repeat(np.arange(len(left_project)), sizes)
+    offsets = np.arange(total) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    right = np.repeat(starts, sizes) + offsets
+    return left, right
+
+def _edge_stats(member_project, member_variant, variant_node, project_winner, project_win_rows):
+    """
+    Count co-bidding pairs for a set of project memberships.
+
+    Args:
+        member_project: Project index per membership row, sorted ascending
+        member_variant: Name variant per membership row (unique within a project)
+        variant_node: Node of each name variant
+        project_winner: Winning node per project (-1 if unknown)
+        project_win_rows: Winning bid rows per project
+
+    Returns:
+        (node edges, name edges): (keys, encounters, source_wins, target_wins)
+        and (keys, encounters), each sorted by key
+    """
+    if len(member_project) == 0:
+        return _EMPTY_NODE_EDGES, _EMPTY_NAME_EDGES
+
+    # A company bidding under several names is one member of the project
+    packed = np.unique((member_project << 32) | variant_node[member_variant])
+    node_project, node = packed >> 32, packed & 0xFFFFFFFF
+
+    a, b = _project_pairs(node_project, node_project)
+    keep = node[a] != node[b]
+    a, b = a[keep], b[keep]
+    source, target = node[a], node[b]
+    project = node_project[a]
+    winner, win_rows = project_winner[project], project_win_rows[project]
+    keys, inverse = np.unique((source << 32) | target, return_inverse=True)
+    node_edges = (
+        keys,
+        np.bincount(inverse, minlength=len(keys)).astype(np.int64),
+        np.bincount(inverse, weights=(winner == source) * win_rows, minlength=len(keys)).astype(np.int64),
+        np.bincount(inverse, weights=(winner == target) * win_rows, minlength=len(keys)).astype(np.int64),
+    )
+
+    a, b = _project_pairs(node_project, member_project)
+    variant = member_variant[b]
+    keep = node[a] != variant_node[variant]
+    keys, inverse = np.unique((node[a][keep] << 32) | variant[keep], return_inverse=True)
+    name_edges = (keys, np.bincount(inverse, minlength=len(keys)).astype(np.int64))
+    return node_edges, name_edges
+
+def _merge_edges(base, delta, sign=1):
+    """Add (or subtract, sign=-1) edge counts; edges whose encounters drop to zero are removed"""
+    keys = np.concatenate((base[0], delta[0]))
+    if len(keys) == 0:
+        return base
+    merged, inverse = np.unique(keys, return_inverse=True)
+    sums = []
+    for base_values, delta_values in zip(base[1:], delta[1:]):
+        values = np.concatenate((base_values, sign * delta_values))
+        sums.append(np.bincount(inverse, weights=values, minlength=len(merged)).astype(np.int64))
+    keep = sums[0] > 0
+    return (merged[keep],) + tuple(column[keep] for column in sums)
+
+def _name_order_key(name):
+    # Code point order with nulls last, like ORDER BY company COLLATE "C"
+    return (name is None, name or "")
+
+class CoBidGraph:
+    """Array-backed co-bidding graph with incremental updates"""
+
+    def __init__(self):
+        self.node_tins = []           # node index -> TIN
+        self.node_index = {}          # TIN -> node index
+
+        self.variant_names = []       # name variant -> company name (may be None)
+        self.variant_node = np.empty(0, dtype=np.int64)
+        self.variant_index = {}       # (TIN, name) -> name variant
+
+        self.project_ids = []         # project index -> project_id
+        self.project_index = {}       # project_id -> project index
+        self.project_winner = np.empty(0, dtype=np.int64)
+        self.project_win_rows = np.empty(0, dtype=np.int64)
+
+        self.member_project = np.empty(0, dtype=np.int64)  # sorted by project
+        self.member_variant = np.empty(0, dtype=np.int64)
+
+        self.edge_keys, self.edge_encounters, self.edge_source_wins, self.edge_target_wins = _EMPTY_NODE_EDGES
+        self.name_edge_keys, self.name_edge_encounters = _EMPTY_NAME_EDGES
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.name_indptr = np.zeros(1, dtype=np.int64)
+        self.last_change_id = 0
+        self.built_at = None
+
+    # -- construction -------------------------------------------------------
+
+    def _variant(self, tin, name, new_nodes):
+        variant = self.variant_index.get((tin, name))
+        if variant is None:
+            node = self.node_index.get(tin)
+            if node is None:
+                node = self.node_index[tin] = len(self.node_tins)
+                self.node_tins.append(tin)
+            variant = self.variant_index[(tin, name)] = len(self.variant_names)
+            self.variant_names.append(name)
+            new_nodes.append(node)
+        return variant
+
+    def _project(self, project_id):
+        index = self.project_index.get(project_id)
+        if index is None:
+            index = self.project_index[project_id] = len(self.project_ids)
+            self.project_ids.append(project_id)
+        return index
+
+    def _encode_rows(self, rows):
+        """
+        Turn (project_id, tin, company, winner_tin) rows into index arrays.
+
+        Returns:
+            (member_project, member_variant, {project: (winner node, winning rows)})
+        """
+        projects, variants, new_nodes = [], [], []
+        winners, win_rows = {}, {}
+        for project_id, tin, company, winner_tin in rows:
+            project = self._project(project_id)
+            projects.append(project)
+            variants.append(self._variant(tin, company, new_nodes))
+            if project not in winners:
+                winners[project] = winner_tin
+                win_rows[project] = 0
+            if tin == winner_tin:
+                win_rows[project] += 1
+        self.variant_node = np.r_[self.variant_node, np.asarray(new_nodes, dtype=np.int64)]
+
+        member_project = np.asarray(projects, dtype=np.int64)
+        member_variant = np.asarray(variants, dtype=np.int64)
+
+        # One membership per (project, name variant); duplicate bid rows count once
+        if len(member_project):
+            packed = np.unique((member_project << 32) | member_variant)
+            member_project, member_variant = packed >> 32, packed & 0xFFFFFFFF
+
+        project_updates = {
+            project: (self.node_index.get(winner_tin, -1) if winner_tin is not None else -1, win_rows[project])
+            for project, winner_tin in winners.items()
+        }
+        return member_project, member_variant, project_updates
+
+    def _grow(self):
+        projects = len(self.project_ids)
+        if len(self.project_winner) < projects:
+            pad = projects - len(self.project_winner)
+            self.project_winner = np.r_[self.project_winner, np.full(pad, -1, dtype=np.int64)]
+            self.project_win_rows = np.r_[self.project_win_rows, np.zeros(pad, dtype=np.int64)]
+
+    def _set_projects(self, project_updates):
+        for project, (winner, win_rows) in project_updates.items():
+            self.project_winner[project] = winner
+            self.project_win_rows[project] = win_rows
+
+    def _edge_stats(self, member_project, member_variant):
+        return _edge_stats(
+            member_project, member_variant, self.variant_node, self.project_winner, self.project_win_rows
+        )
+
+    def _rebuild_indptr(self):
+        nodes = np.arange(len(self.node_tins) + 1)
+        self.indptr = np.searchsorted(self.edge_keys >> 32, nodes).astype(np.int64)
+        self.name_indptr = np.searchsorted(self.name_edge_keys >> 32, nodes).astype(np.int64)
+
+    def _set_edges(self, node_edges, name_edges):
+        self.edge_keys, self.edge_encounters, self.edge_source_wins, self.edge_target_wins = node_edges
+        self.name_edge_keys, self.name_edge_encounters = name_edges
+        self._rebuild_indptr()
+
+    def build(self, rows, batch_projects=50000):
+        """Build the graph from scratch from an iterable of bid rows"""
+        started = time.monotonic()
+        member_project, member_variant, project_updates = self._encode_rows(rows)
+        self._grow()
+        self._set_projects(project_updates)
+
+        order = np.argsort(member_project, kind="stable")
+        self.member_project, self.member_variant = member_project[order], member_variant[order]
+
+        # Pair generation is quadratic per project; do it in project batches
+        node_edges, name_edges = _EMPTY_NODE_EDGES, _EMPTY_NAME_EDGES
+        boundaries = np.searchsorted(
+            self.member_project, np.arange(0, len(self.project_ids) + batch_projects, batch_projects)
+        )
+        for start, stop in zip(boundaries[:-1], boundaries[1:]):
+            if start == stop:
+                continue
+            batch_nodes, batch_names = self._edge_stats(self.member_project[start:stop], self.member_variant[start:stop])
+            node_edges = _merge_edges(node_edges, batch_nodes)
+            name_edges = _merge_edges(name_edges, batch_names)
+
+        self._set_edges(node_edges, name_edges)
+        self.built_at = time.time()
+        logger.info(
+            f"Co-bidding graph built: {len(self.node_tins)} companies, {len(self.edge_keys)} edges "
+            f"in {round((time.monotonic() - started) * 1000)}ms"
+        )
+
+    def apply_project_changes(self, project_ids, rows):
+        """
+        Replace the memberships of the given projects with their current rows.
+
+        Args:
+            project_ids: Projects named in the change log
+            rows: Current (project_id, tin, company, winner_tin) rows for them
+        """
+        touched = np.asarray(
+            sorted({self.project_index[p] for p in project_ids if p in self.project_index}),
+            dtype=np.int64,
+        )
+        old_mask = np.isin(self.member_project, touched)
+        old_nodes, old_names = self._edge_stats(self.member_project[old_mask], self.member_variant[old_mask])
+
+        new_project, new_variant, project_updates = self._encode_rows(rows)
+        self._grow()
+        self.project_winner[touched] = -1
+        self.project_win_rows[touched] = 0
+        self._set_projects(project_updates)
+        order = np.argsort(new_project, kind="stable")
+        new_project, new_variant = new_project[order], new_variant[order]
+        new_nodes, new_names = self._edge_stats(new_project, new_variant)
+
+        node_edges = (self.edge_keys, self.edge_encounters, self.edge_source_wins, self.edge_target_wins)
+        name_edges = (self.name_edge_keys, self.name_edge_encounters)
+        self._set_edges(
+            _merge_edges(_merge_edges(node_edges, old_nodes, sign=-1), new_nodes),
+            _merge_edges(_merge_edges(name_edges, old_names, sign=-1), new_names),
+        )
+
+        member_project = np.r_[self.member_project[~old_mask], new_project]
+        member_variant = np.r_[self.member_variant[~old_mask], new_variant]
+        order = np.argsort(member_project, kind="stable")
+        self.member_project, self.member_variant = member_project[order], member_variant[order]
+
+    # -- queries ------------------------------------------------------------
+
+    def has_company(self, tin):
+        return tin in self.node_index
+
+    def neighbors(self, tin, limit=None, min_encounters=1):
+        """
+        Return co-bidders of a company per competitor name, most shared projects first.
+
+        Each entry has the neighbour's TIN and name, the projects shared
+        with that name, and the winning bid rows of both sides on the
+        projects shared with the neighbour's TIN.
+        """
+        index = self.node_index.get(tin)
+        if index is None:
+            return []
+
+        start, stop = self.name_indptr[index], self.name_indptr[index + 1]
+        variants = (self.name_edge_keys[start:stop] & 0xFFFFFFFF).astype(np.int64)
+        encounters = self.name_edge_encounters[start:stop]
+        keep = encounters >= min_encounters
+        variants, encounters = variants[keep], encounters[keep]
+
+        entries = sorted(
+            (
+                (-int(count), self.node_tins[self.variant_node[variant]], _name_order_key(self.variant_names[variant]), int(variant))
+                for variant, count in zip(variants.tolist(), encounters.tolist())
+            )
+        )
+        if limit is not None:
+            entries = entries[:limit]
+
+        node_start, node_stop = self.indptr[index], self.indptr[index + 1]
+        node_keys = self.edge_keys[node_start:node_stop]
+        neighbors = []
+        for count, neighbor_tin, _, variant in entries:
+            edge = node_start + np.searchsorted(node_keys, (index << 32) | int(self.variant_node[variant]))
+            neighbors.append({
+                "tin": neighbor_tin,
+                "company": self.variant_names[variant],
+                "encounters": -count,
+                "company_wins": int(self.edge_source_wins[edge]),
+                "competitor_wins": int(self.edge_target_wins[edge]),
+            })
+        return neighbors
+
+    def stats(self):
+        return {
+            "companies": len(self.node_tins),
+            "name_variants": len(self.variant_names),
+            "projects": len(self.project_ids),
+            "edges": int(len(self.edge_keys)),
+            "name_edges": int(len(self.name_edge_keys)),
+            "memberships": int(len(self.member_project)),
+            "last_change_id": self.last_change_id,
+            "built_at": self.built_at,
+        }
+
+    # -- persistence --------------------------------------------------------
+
+    def save(self, path):
+        """Write the graph atomically to an .npz file"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            node_tins=np.asarray(self.node_tins, dtype=str),
+            variant_names=np.asarray([name or "" for name in self.variant_names], dtype=str),
+            variant_name_null=np.asarray([name is None for name in self.variant_names], dtype=bool),
+            variant_node=self.variant_node,
+            project_ids=np.asarray([str(p) for p in self.project_ids], dtype=str),
+            project_winner=self.project_winner,
+            project_win_rows=self.project_win_rows,
+            member_project=self.member_project,
+            member_variant=self.member_variant,
+            edge_keys=self.edge_keys,
+            edge_encounters=self.edge_encounters,
+            edge_source_wins=self.edge_source_wins,
+            edge_target_wins=self.edge_target_wins,
+            name_edge_keys=self.name_edge_keys,
+            name_edge_encounters=self.name_edge_encounters,
+            meta=np.asarray([self.last_change_id, self.built_at or 0, FORMAT_VERSION], dtype=np.float64),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, project_id_type=str):
+        """
+        Read a graph written by save().
+
+        Raises:
+            ValueError: The file was written in another format version
+        """
+        graph = cls()
+        with np.load(path, allow_pickle=False) as data:
+            meta = data["meta"].tolist()
+            if len(meta) < 3 or int(meta[2]) != FORMAT_VERSION:
+                raise ValueError(f"{path} is not a version {FORMAT_VERSION} co-bidding graph")
+            graph.node_tins = data["node_tins"].tolist()
+            graph.node_index = {tin: i for i, tin in enumerate(graph.node_tins)}
+            graph.variant_names = [
+                None if null else name
+                for name, null in zip(data["variant_names"].tolist(), data["variant_name_null"].tolist())
+            ]
+            graph.variant_node = data["variant_node"]
+            graph.variant_index = {
+                (graph.node_tins[node], name): i
+                for i, (node, name) in enumerate(zip(graph.variant_node.tolist(), graph.variant_names))
+            }
+            graph.project_ids = [project_id_type(p) for p in data["project_ids"].tolist()]
+            graph.project_index = {p: i for i, p in enumerate(graph.project_ids)}
+            graph.project_winner = data["project_winner"]
+            graph.project_win_rows = data["project_win_rows"]
+            graph.member_project = data["member_project"]
+            graph.member_variant = data["member_variant"]
+            graph.edge_keys = data["edge_keys"]
+            graph.edge_encounters = data["edge_encounters"]
+            graph.edge_source_wins = data["edge_source_wins"]
+            graph.edge_target_wins = data["edge_target_wins"]
+            graph.name_edge_keys = data["name_edge_keys"]
+            graph.name_edge_encounters = data["name_edge_encounters"]
+        graph.last_change_id = int(meta[0])
+        graph.built_at = meta[1] or None
+        graph._rebuild_indptr()
+        return graph
+
+_graph = None
+
+def get_cobid_graph():
+    """Return the loaded graph, or None if it is not available yet"""
+    return _graph
+
+def _stream_rows(conn, sql, params=None, batch_size=20000):
+    # Plain tuple cursor on the server side: memory stays flat while streaming
+    cursor = conn.cursor(name="cobid_graph_rows", cursor_factory=psycopg2.extensions.cursor)
+    cursor.itersize = batch_size
+    cursor.execute(sql, params)
+    try:
+        for row in cursor:
+            yield row
+    finally:
+        cursor.close()
+
+def _project_id_type(conn):
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        SELECT format_type(atttypid, atttypmod) AS type_name
+        FROM pg_attribute
+        WHERE attrelid = 'public_data.thai_govt_project'::regclass AND attname = 'project_id'
+        """
+    )
+    type_name = cursor.fetchone()["type_name"]
+    cursor.close()
+    return int if type_name in ("integer", "bigint", "smallint") else str
+
+def refresh_cobid_graph(conn, path, full=False):
+    """
+    Load, build or incrementally update the co-bidding graph.
+
+    On first use the graph is loaded from `path` when the file matches the
+    recorded state, otherwise built from the bid table. Later calls apply the
+    projects named in the change log since the graph's watermark and save the
+    result back to `path`.
+
+    Returns:
+        Dictionary describing what was done
+    """
+    global _graph
+    started = time.monotonic()
+    high = read_watermark(conn)
+    cursor = conn.cursor()
+    cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (CONSUMER,))
+    state = get_consumer_state(cursor, CONSUMER)
+    recorded = state["last_change_id"] if state else None
+
+    graph = _graph
+    mode = "incremental"
+    if not full and recorded is not None and (graph is None or graph.last_change_id < recorded):
+        # Another process (or an earlier run) has moved ahead: pick up its file
+        if os.path.exists(path):
+            try:
+                loaded = CoBidGraph.load(path, _project_id_type(conn))
+            except (ValueError, KeyError) as e:
+                logger.warning(f"Rebuilding the co-bidding graph: {str(e)}")
+                loaded = None
+            if loaded is not None and loaded.last_change_id == recorded:
+                graph, mode = loaded, "loaded"
+        if mode != "loaded":
+            graph = None
+
+    if full or graph is None or recorded is None:
+        graph = CoBidGraph()
+        graph.build(_stream_rows(conn, BID_ROWS_SQL))
+        graph.last_change_id = high
+        mode = "full"
+    elif graph.last_change_id < high:
+        cursor.execute(
+            """
+            SELECT DISTINCT project_id
+            FROM public_data.analytics_change_log
+            WHERE change_id > %s AND change_id <= %s AND project_id IS NOT NULL
+            """,
+            (graph.last_change_id, high)
+        )
+        changed = [row["project_id"] for row in cursor.fetchall()]
+        rows = list(_stream_rows(
+            conn,
+            BID_ROWS_SQL + " AND b.project_id = ANY(%s)",
+            (changed,)
+        ))
+        graph.apply_project_changes(changed, rows)
+        graph.last_change_id = high
+        mode = "incremental" if mode != "loaded" else "loaded+incremental"
+    else:
+        conn.rollback()
+        cursor.close()
+        _graph = graph
+        return {"mode": "loaded" if mode == "loaded" else "unchanged", **graph.stats()}
+
+    graph.save(path)
+    mark_consumed(cursor, CONSUMER, graph.last_change_id)
+    conn.commit()
+    cursor.close()
+    _graph = graph
+
+    result = {"mode": mode, "duration_ms": round((time.monotonic() - started) * 1000, 1), **graph.stats()}
+    logger.info(f"Co-bidding graph refreshed: {result}")
+    return result
@@ -0,0 +1,188 @@
+# app/services/company_directory.py
+"""
+In-process directory of company TINs and names.
+
+Bid rows carry a company name per bid, and one TIN can appear under several
+spellings. The directory keeps, for every TIN in `company_bid_summary`, its
+canonical name: the spelling used on the most bids the summary counts
+(positive bids; ties go to the first in code point order). The lookup is a
+dict lookup, so the routes that only need a company's name no longer query
+the bid table for it.
+
+The directory follows the summary the same way the bid ratio distribution
+does: after an incremental summary refresh only the recomputed TINs are
+reloaded, and each refresh swaps in a new object. Until it is loaded, or
+for a TIN it does not know yet (added since the last refresh), the name is
+read from the bid table with the same canonical rule.
+"""
+import sys
+import time
+import logging
+from .company_summary import CONSUMER as SUMMARY_CONSUMER, SUMMARY_BIDS_FILTER, get_last_summary_changes
+from .change_log import get_consumer_state
+
+logger = logging.getLogger(__name__)
+
+_VARIANTS_SQL = """
+    SELECT tin, company, total_bids
+    FROM public_data.company_bid_summary
+    WHERE company IS NOT NULL
+"""
+
+# Same rule as the directory, over the rows company_bid_summary counts
+CANONICAL_NAME_SQL = f"""
+    SELECT b.company
+    FROM public_data.thai_project_bid_info b
+    WHERE b.tin = %s AND b.company IS NOT NULL AND {SUMMARY_BIDS_FILTER}
+    GROUP BY b.company
+    ORDER BY COUNT(b.project_id) DESC, b.company COLLATE "C"
+    LIMIT 1
+"""
+
+# A TIN with no positive bid still exists: name it by the spelling on most of its bids
+ANY_BID_NAME_SQL = """
+    SELECT b.company
+    FROM public_data.thai_project_bid_info b
+    WHERE b.tin = %s AND b.company IS NOT NULL
+    GROUP BY b.company
+    ORDER BY COUNT(*) DESC, b.company COLLATE "C"
+    LIMIT 1
+"""
+
+# Both rules in one expression, for use inside a statement; takes the TIN twice
+COMPANY_NAME_EXPR = f"COALESCE(({CANONICAL_NAME_SQL}), ({ANY_BID_NAME_SQL}))"
+
+def _canonical(variants):
+    # variants: list of (company, total_bids)
+    return min(variants, key=lambda variant: (-variant[1], variant[0]))[0]
+
+class CompanyDirectory:
+    """
+    Immutable TIN -> canonical name directory.
+
+    Args:
+        variants: Dict of TIN -> list of (company name, bids under that name)
+        version: Summary change id the directory reflects
+    """
+
+    def __init__(self, variants, version):
+        self.version = version
+        self._names = {tin: _canonical(names) for tin, names in variants.items()}
+        self.built_at = time.time()
+
+    def name(self, tin):
+        """Canonical name of a TIN, or None if the directory does not know it"""
+        return self._names.get(tin)
+
+    def __contains__(self, tin):
+        return tin in self._names
+
+    def with_changes(self, changed, version):
+        """
+        Return a new directory with the name variants of some TINs replaced.
+
+        Args:
+            changed: Dict of TIN -> list of (company, bids); an empty list
+                removes the TIN
+            version: Summary change id the result reflects
+        """
+        directory = CompanyDirectory({}, version)
+        directory._names = dict(self._names)
+        for tin, names in changed.items():
+            if names:
+                directory._names[tin] = _canonical(names)
+            else:
+                directory._names.pop(tin, None)
+        return directory
+
+    def stats(self):
+        """Return size and freshness information"""
+        return {
+            "companies": len(self._names),
+            "size_bytes": sys.getsizeof(self._names),
+            "version": self.version,
+            "built_at": self.built_at,
+        }
+
+_directory = None
+
+def get_company_directory():
+    """Return the current directory, or None if it has not been loaded"""
+    return _directory
+
+def _load_variants(cursor, tins=None):
+    if tins is None:
+        cursor.execute(_VARIANTS_SQL)
+    else:
+        cursor.execute(_VARIANTS_SQL + " AND tin = ANY(%s)", (list(tins),))
+    variants = {}
+    for row in cursor.fetchall():
+        variants.setdefault(row["tin"], []).append((row["company"], row["total_bids"]))
+    return variants
+
+def refresh_company_directory(conn, full=False):
+    """
+    Bring the directory up to date with company_bid_summary.
+
+    When the last summary refresh in this process started from the
+    directory's version, only the TINs it recomputed are reloaded;
+    otherwise the directory is rebuilt from every summary row.
+
+    Returns:
+        Dictionary describing what was done
+    """
+    global _directory
+    started = time.monotonic()
+    cursor = conn.cursor()
+    state = get_consumer_state(cursor, SUMMARY_CONSUMER)
+    version = state["last_change_id"] if state else None
+
+    directory = _directory
+    changes = get_last_summary_changes()
+    if not full and directory is not None and directory.version == version:
+        conn.rollback()
+        cursor.close()
+        return {"mode": "unchanged", **directory.stats()}
+
+    if (
+        not full and directory is not None and changes is not None
+        and changes["tins"] is not None
+        and changes["from"] == directory.version and changes["to"] == version
+    ):
+        variants = _load_variants(cursor, changes["tins"])
+        directory = directory.with_changes({tin: variants.get(tin, []) for tin in changes["tins"]}, version)
+        mode = "incremental"
+    else:
+        directory = CompanyDirectory(_load_variants(cursor), version)
+        mode = "full"
+
+    conn.rollback()
+    cursor.close()
+    _directory = directory
+
+    result = {"mode": mode, "duration_ms": round((time.monotonic() - started) * 1000, 1), **directory.stats()}
+    logger.info(f"Company directory refreshed: {result}")
+    return result
+
+def company_name_for_tin(cursor, company_tin):
+    """
+    Canonical company name of a TIN.
+
+    Answered from the directory when it knows the TIN; otherwise read from
+    the bid table with `cursor`. TINs whose bids are all zero or NULL are
+    not in the summary and fall back to their most used name.
+
+    Returns:
+        The name, or None if the TIN has no named bids
+    """
+    directory = _directory
+    if directory is not None:
+        name = directory.name(company_tin)
+        if name is not None:
+            return name
+    for query in (CANONICAL_NAME_SQL, ANY_BID_NAME_SQL):
+        cursor.execute(query, (company_tin,))
+        row = cursor.fetchone()
+        if row:
+            return row["company"]
+    return None
@@ -0,0 +1,195 @@
+# app/services/company_summary.py
+"""
+Maintained per-company bidding summary.
+
+`company_bid_summary` holds one row per (tin, company) with the totals that
+search, bid-strategy and adjacent-companies used to rebuild from the full bid
+table on every request. A refresh only recomputes the TINs named in the
+change log since the previous refresh; `full=True` rebuilds everything.
+"""
+import time
+import logging
+from fastapi import HTTPException
+from .change_log import (
+    read_watermark,
+    get_consumer_state,
+    mark_consumed,
+    prune_change_log,
+    get_refresh_status,
+    collect_affected_tins,
+)
+
+logger = logging.getLogger(__name__)
+
+CONSUMER = "company_bid_summary"
+
+# Set once a refresh has completed, so readers skip the state lookup afterwards
+_summary_ready = False
+
+# Change range and TINs the last refresh in this process applied
+_last_changes = None
+
+SUMMARY_DDL = """
+    CREATE TABLE IF NOT EXISTS public_data.company_bid_summary (
+        tin TEXT NOT NULL,
+        company TEXT,
+        total_bids BIGINT NOT NULL,
+        wins BIGINT NOT NULL,
+        win_rate NUMERIC(10,2) NOT NULL,
+        total_bid_value NUMERIC,
+        avg_bid NUMERIC,
+        avg_bid_ratio NUMERIC,
+        bid_ratio_sum NUMERIC,
+        bid_ratio_count BIGINT NOT NULL,
+        refreshed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+    CREATE INDEX IF NOT EXISTS company_bid_summary_tin_idx
+        ON public_data.company_bid_summary (tin);
+    CREATE INDEX IF NOT EXISTS company_bid_summary_total_bids_idx
+        ON public_data.company_bid_summary (total_bids DESC);
+"""
+
+# Bids a company is credited with in the summary; the company directory's
+# canonical names count the same rows
+SUMMARY_BIDS_FILTER = "b.tin IS NOT NULL AND b.bid > 0"
+
+# Same definitions search_companies used to compute inline
+SUMMARY_SELECT = f"""
+    SELECT
+        b.tin,
+        b.company,
+        COUNT(b.project_id) AS total_bids,
+        SUM(CASE WHEN b.tin = p.winner_tin THEN 1 ELSE 0 END) AS wins,
+        (SUM(CASE WHEN b.tin = p.winner_tin THEN 1 ELSE 0 END) * 100.0 / COUNT(b.project_id))::numeric(10,2) AS win_rate,
+        SUM(b.bid) AS total_bid_value,
+        AVG(b.bid) AS avg_bid,
+        AVG(b.bid / NULLIF(p.sum_price_agree, 0)) AS avg_bid_ratio,
+        SUM(b.bid / NULLIF(p.sum_price_agree, 0)) AS bid_ratio_sum,
+        COUNT(b.bid / NULLIF(p.sum_price_agree, 0)) AS bid_ratio_count
+    FROM public_data.thai_project_bid_info b
+    LEFT JOIN public_data.thai_govt_project p ON b.project_id = p.project_id
+    WHERE {SUMMARY_BIDS_FILTER}
+"""
+
+SUMMARY_COLUMNS = """
+    tin, company, total_bids, wins, win_rate, total_bid_value,
+    avg_bid, avg_bid_ratio, bid_ratio_sum, bid_ratio_count
+"""
+
+def ensure_company_summary(conn):
+    """Create the summary table (change capture is installed by manage.py migrate)"""
+    cursor = conn.cursor()
+    cursor.execute(SUMMARY_DDL)
+    cursor.close()
+    conn.commit()
+
+def refresh_company_summary(conn, full=False):
+    """
+    Bring company_bid_summary up to date.
+
+    Args:
+        conn: Database connection (the refresh commits on it)
+        full: Rebuild every row instead of only the TINs with logged changes
+
+    Returns:
+        Dictionary describing the refresh (mode, rows written, duration)
+    """
+    started = time.monotonic()
+    high = read_watermark(conn)
+    cursor = conn.cursor()
+
+    # Serialize concurrent refreshes (background loop, admin endpoint, CLI)
+    cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (CONSUMER,))
+    state = get_consumer_state(cursor, CONSUMER)
+    if state is None:
+        full = True
+
+    if full:
+        logger.info("Rebuilding company summary from scratch")
+        cursor.execute("DELETE FROM public_data.company_bid_summary")
+        cursor.execute(
+            f"INSERT INTO public_data.company_bid_summary ({SUMMARY_COLUMNS}) "
+            + SUMMARY_SELECT
+            + " GROUP BY b.tin, b.company"
+        )
+        rows_written = cursor.rowcount
+        affected = None
+        low = None
+    else:
+        low = state["last_change_id"]
+        if high <= low:
+            conn.rollback()
+            cursor.close()
+            return {"mode": "incremental", "affected_tins": 0, "rows_written": 0, "changes_applied": False,
+                    "duration_ms": round((time.monotonic() - started) * 1000, 1)}
+
+        collect_affected_tins(cursor, "summary_affected_tins", low, high)
+        cursor.execute("SELECT tin FROM summary_affected_tins")
+        affected = [row["tin"] for row in cursor.fetchall()]
+
+        cursor.execute(
+            "DELETE FROM public_data.company_bid_summary "
+            "WHERE tin IN (SELECT tin FROM summary_affected_tins)"
+        )
+        cursor.execute(
+            f"INSERT INTO public_data.company_bid_summary ({SUMMARY_COLUMNS}) "
+            + SUMMARY_SELECT
+            + " AND b.tin IN (SELECT tin FROM summary_affected_tins)"
+            + " GROUP BY b.tin, b.company"
+        )
+        rows_written = cursor.rowcount
+
+    mark_consumed(cursor, CONSUMER, high)
+    prune_change_log(cursor)
+    conn.commit()
+    cursor.close()
+
+    global _summary_ready, _last_changes
+    _summary_ready = True
+    _last_changes = {"from": low, "to": high, "tins": affected}
+
+    result = {
+        "mode": "full" if full else "incremental",
+        "affected_tins": len(affected) if affected is not None else None,
+        "rows_written": rows_written,
+        "changes_applied": True,
+        "duration_ms": round((time.monotonic() - started) * 1000, 1),
+    }
+    logger.info(f"Company summary refreshed: {result}")
+    return result
+
+def get_last_summary_changes():
+    """
+    Return what the last refresh in this process applied.
+
+    Returns:
+        {"from", "to", "tins"} with the change-id range and the recomputed
+        TINs ("from" and "tins" are None after a full rebuild), or None
+    """
+    return _last_changes
+
+def get_company_summary_status(conn):
+    """Return refresh time and staleness of the company summary"""
+    cursor = conn.cursor()
+    status = get_refresh_status(cursor, CONSUMER)
+    cursor.close()
+    return status
+
+def require_company_summary(cursor):
+    """
+    Raise 503 until the summary has been built at least once.
+
+    Readers call this before querying company_bid_summary so an empty table
+    is never mistaken for "no matching companies".
+    """
+    global _summary_ready
+    if _summary_ready:
+        return
+    cursor.execute("SELECT to_regclass('public_data.analytics_refresh_state') IS NOT NULL AS present")
+    if cursor.fetchone()["present"] and get_consumer_state(cursor, CONSUMER) is not None:
+        _summary_ready = True
+        return
+    raise HTTPException(
+        status_code=503,
+        detail="Company summary is still being built; try again shortly"
+    )
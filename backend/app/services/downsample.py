@@ -0,0 +1,123 @@
+# app/services/downsample.py
+"""
+Shape-preserving downsampling of chart series.
+
+Largest-Triangle-Three-Buckets (Steinarsson, 2013) keeps the first and last
+points and splits the rest into equal buckets. From each bucket it keeps the
+point forming the largest triangle with the point kept from the previous
+bucket and the average of the next bucket. Peaks and dips survive, which
+plain striding or averaging loses.
+
+The triangle area against an anchor (ax, ay) is linear in the anchor:
+
+    |ax * (y - cy) + ay * (cx - x) + (x * cy - cx * y)|
+
+where (cx, cy) is the next bucket's average. The three terms are computed
+for every point at once with NumPy, so picking a bucket's point is a single
+vectorized expression over that bucket. Only the dependency on the
+previously kept point remains a loop, one step per output point.
+
+Points flagged by the caller (winning bids) and outliers beyond
+OUTLIER_IQR interquartile ranges from the quartiles are always kept on top
+of the LTTB selection.
+"""
+import numpy as np
+
+# Tukey's "far out" fence
+OUTLIER_IQR = 3.0
+
+def outlier_mask(y, k=OUTLIER_IQR):
+    """Mark values more than k interquartile ranges outside the quartiles"""
+    if len(y) < 4:
+        return np.zeros(len(y), dtype=bool)
+    q1, q3 = np.percentile(y, [25, 75])
+    spread = q3 - q1
+    return (y < q1 - k * spread) | (y > q3 + k * spread)
+
+def lttb(x, y, n_out):
+    """
+    Select n_out points with Largest-Triangle-Three-Buckets.
+
+    Args:
+        x: Ascending x values (float array)
+        y: y values (float array)
+        n_out: Number of points to keep (at least 3)
+
+    Returns:
+        Sorted indices of the kept points
+    """
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        raise ValueError("LTTB needs at least 3 output points")
+
+    # Inner points split into n_out - 2 buckets; the last bucket is the final point
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+    counts = ends - starts
+
+    # Average of the bucket after each one (the final point after the last)
+    sum_x = np.add.reduceat(x[1:n - 1], starts - 1)
+    sum_y = np.add.reduceat(y[1:n - 1], starts - 1)
+    next_x = np.append(sum_x[1:] / counts[1:], x[n - 1])
+    next_y = np.append(sum_y[1:] / counts[1:], y[n - 1])
+
+    # Per-point terms of the area against the next average, per bucket
+    bucket = np.repeat(np.arange(len(starts)), counts)
+    cx, cy = next_x[bucket], next_y[bucket]
+    inner_x, inner_y = x[1:n - 1], y[1:n - 1]
+    p = inner_y - cy
+    q = cx - inner_x
+    r = inner_x * cy - cx * inner_y
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    anchor = 0
+    for i, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+        ax, ay = x[anchor], y[anchor]
+        # Offsets into the inner arrays are one less than point indices
+        area = np.abs(ax * p[start - 1:end - 1] + ay * q[start - 1:end - 1] + r[start - 1:end - 1])
+        anchor = start + int(area.argmax())
+        selected[i + 1] = anchor
+    return selected
+
+def downsample(x, y, max_points, keep=None):
+    """
+    Reduce a series to about max_points points, preserving its shape.
+
+    Points with a true `keep` flag and outliers in y are always kept; LTTB
+    fills the rest of the budget. When they alone exceed max_points the
+    result is larger than max_points.
+
+    Args:
+        x: x values in any order (NaN marks points that cannot be placed,
+            which are kept)
+        y: y values (NaN points are kept)
+        max_points: Target number of points
+        keep: Optional boolean array of points that must be kept
+
+    Returns:
+        Sorted indices of the kept points
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n <= max_points:
+        return np.arange(n)
+
+    placed = ~(np.isnan(x) | np.isnan(y))
+    forced = ~placed
+    if keep is not None:
+        forced |= np.asarray(keep, dtype=bool)
+    forced[placed] |= outlier_mask(y[placed])
+
+    # Run LTTB on the placed points in x order
+    order = np.flatnonzero(placed)
+    order = order[np.argsort(x[order], kind="stable")]
+    budget = max(max_points - int(np.count_nonzero(forced)), 3)
+    chosen = order[lttb(x[order], y[order], budget)] if len(order) > 3 else order
+
+    mask = forced.copy()
+    mask[chosen] = True
+    return np.flatnonzero(mask)
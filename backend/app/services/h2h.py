@@ -0,0 +1,147 @@
+# app/services/h2h.py
+"""
+Single-pass head-to-head computation.
+
+One query returns every bid on the projects a company took part in; the
+records against each competitor are then tallied in a single scan of those
+rows. The work is proportional to the number of bids on the company's
+projects and does not depend on `top_n`.
+
+The tallies follow the original INTERSECT query exactly, and these rules
+are the reference for head-to-head: the co-bidding graph
+(app/services/cobid_graph.py) reproduces them and is checked against
+compute_head_to_head in tests/test_cobid_graph.py.
+
+- only bids on projects present in thai_govt_project count
+- encounters are distinct shared projects per (competitor TIN, name)
+- company_wins counts the company's winning bid rows on projects the
+  competitor (under any name) also bid on
+- competitor_wins counts the competitor's winning bid rows (any name)
+- only competitors met on more than one project are reported
+- ties in encounters are ordered by TIN, then name (nulls last)
+"""
+import psycopg2.extensions
+
+_PROJECT_BIDDERS_SELECT = """
+    SELECT
+        b.project_id,
+        b.tin,
+        b.company,
+        CASE WHEN b.tin = p.winner_tin THEN 1 ELSE 0 END AS won_bid
+    FROM public_data.thai_project_bid_info b
+    JOIN public_data.thai_govt_project p ON b.project_id = p.project_id
+"""
+
+PROJECT_BIDDERS_SQL = _PROJECT_BIDDERS_SELECT + """
+    WHERE b.project_id IN (
+        SELECT project_id
+        FROM public_data.thai_project_bid_info
+        WHERE tin = %s
+    )
+"""
+
+PROJECT_BIDDERS_BY_ID_SQL = _PROJECT_BIDDERS_SELECT + """
+    WHERE b.project_id = ANY(%s)
+"""
+
+def load_project_bidders(conn, company_tin, project_ids=None):
+    """
+    Fetch every bid on the projects company_tin bid on.
+
+    Args:
+        conn: Database connection
+        company_tin: TIN of the company being analyzed
+        project_ids: The company's projects, if the caller already has them
+
+    Returns:
+        List of (project_id, tin, company, won_bid) tuples
+    """
+    # Tuple rows: this can be a lot of rows for large bidders
+    cursor = conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+    if project_ids is None:
+        cursor.execute(PROJECT_BIDDERS_SQL, (company_tin,))
+    else:
+        cursor.execute(PROJECT_BIDDERS_BY_ID_SQL, (list(project_ids),))
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+def compute_head_to_head(rows, company_tin, top_n):
+    """
+    Tally head-to-head records from project bidder rows.
+
+    Args:
+        rows: (project_id, tin, company, won_bid) tuples for the company's projects
+        company_tin: TIN of the company being analyzed
+        top_n: Number of competitors to return
+
+    Returns:
+        List of competitor dictionaries in HeadToHeadCompetitor shape,
+        most encounters first
+    """
+    company_wins_by_project = {}   # project -> winning rows of the company
+    projects_by_name = {}          # (tin, company) -> projects
+    projects_by_tin = {}           # tin -> projects
+    wins_by_tin = {}               # tin -> winning rows
+
+    for project_id, tin, company, won_bid in rows:
+        if tin == company_tin:
+            if won_bid:
+                company_wins_by_project[project_id] = company_wins_by_project.get(project_id, 0) + 1
+            else:
+                company_wins_by_project.setdefault(project_id, 0)
+            continue
+        if tin is None:
+            continue
+        projects_by_name.setdefault((tin, company), set()).add(project_id)
+        projects_by_tin.setdefault(tin, set()).add(project_id)
+        if won_bid:
+            wins_by_tin[tin] = wins_by_tin.get(tin, 0) + 1
+
+    ranked = sorted(
+        (
+            (len(projects), tin, company)
+            for (tin, company), projects in projects_by_name.items()
+            if len(projects) > 1
+        ),
+        key=lambda item: (-item[0], item[1], item[2] is None, item[2] or ""),
+    )[:top_n]
+
+    competitors = []
+    for encounters, tin, company in ranked:
+        company_wins = sum(
+            company_wins_by_project[project_id]
+            for project_id in projects_by_tin[tin]
+            if project_id in company_wins_by_project
+        )
+        competitors.append(_competitor(tin, company, encounters, company_wins, wins_by_tin.get(tin, 0)))
+
+    return competitors
+
+def head_to_head_from_graph(graph, company_tin, top_n):
+    """
+    Read head-to-head records from the co-bidding graph.
+
+    Returns the same list as compute_head_to_head for the same bids.
+    """
+    return [
+        _competitor(
+            neighbor["tin"],
+            neighbor["company"],
+            neighbor["encounters"],
+            neighbor["company_wins"],
+            neighbor["competitor_wins"],
+        )
+        for neighbor in graph.neighbors(company_tin, limit=top_n, min_encounters=2)
+    ]
+
+def _competitor(tin, company, encounters, company_wins, competitor_wins):
+    win_rate = (company_wins / encounters * 100) if encounters > 0 else 0
+    return {
+        "competitor_tin": tin,
+        "competitor": company,
+        "encounters": encounters,
+        "company_wins": company_wins,
+        "competitor_wins": competitor_wins,
+        "win_rate_vs_competitor": round(win_rate, 2),
+    }
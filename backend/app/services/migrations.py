@@ -0,0 +1,432 @@
+# app/services/migrations.py
+"""
+Schema migrations for the indexes the hot queries rely on, and the change
+capture the derived stores read.
+
+The source tables are loaded by the scraper, not by this app, and nothing
+else guarantees that the lookups the routers run are indexed. Each
+migration here creates one or more indexes with CREATE INDEX CONCURRENTLY
+(the tables stay writable), and is recorded in `public_data.schema_migrations`
+once applied. `python manage.py migrate` applies the pending ones in order;
+an index left invalid by an interrupted build is dropped and rebuilt.
+
+A migration that needs an extension (pg_trgm) or a table created by one of
+the derived stores is skipped while that is missing and retried on the next
+run. `/api/db-status` reports pending migrations and missing or invalid
+indexes.
+
+Before the indexes, every run (re)installs the change log and its triggers
+on the source tables (app/services/change_log.py). That DDL replaces
+functions and triggers on tables the scraper owns, so it runs here, as an
+explicit step, and not in every app worker at startup.
+
+Every migration names the queries it is meant to speed up. With
+`migrate --benchmark` those are timed before and after the migration on the
+current data, and the numbers are stored with the migration record.
+"""
+import json
+import time
+import logging
+import statistics
+from .change_log import install_change_log, missing_change_capture
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DDL = """
+    CREATE SCHEMA IF NOT EXISTS public_data;
+    CREATE TABLE IF NOT EXISTS public_data.schema_migrations (
+        id TEXT PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        duration_ms DOUBLE PRECISION,
+        benchmark JSONB
+    );
+"""
+
+class Index:
+    """An index a migration owns, created concurrently in public_data"""
+
+    def __init__(self, name, table, definition):
+        self.name = name
+        self.table = table
+        self.definition = definition
+
+    @property
+    def create_sql(self):
+        return f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {self.name} ON public_data.{self.table} {self.definition}"
+
+class Migration:
+    """
+    One schema change.
+
+    Args:
+        id: Sortable identifier, e.g. "0001_bid_info_tin_project"
+        description: What the migration adds and why
+        indexes: Index objects to create
+        requires_extension: Extension to create first; skipped when the server lacks it
+        requires_table: Table (in public_data) that must exist; skipped otherwise
+        benchmarks: (label, SQL) pairs timed by `migrate --benchmark`; the SQL
+            may use the parameters chosen by benchmark_params()
+    """
+
+    def __init__(self, id, description, indexes, requires_extension=None, requires_table=None, benchmarks=()):
+        self.id = id
+        self.description = description
+        self.indexes = indexes
+        self.requires_extension = requires_extension
+        self.requires_table = requires_table
+        self.benchmarks = benchmarks
+
+# Same ordering and filters as the company projects listing (routers/search.py)
+_COMPANY_PROJECTS_ORDER = (
+    "(COALESCE(contract_date, transaction_date)) DESC NULLS LAST, sum_price_agree DESC, project_id DESC"
+)
+_COMPANY_PROJECTS_FILTER = "WHERE project_name IS NOT NULL AND sum_price_agree > 0"
+
+def _company_projects_benchmark(column, param):
+    return f"""
+        SELECT p.winner, p.project_name, p.sum_price_agree, p.transaction_date, p.contract_date
+        FROM public_data.thai_govt_project p
+        WHERE p.{column} = %({param})s AND p.project_name IS NOT NULL AND p.sum_price_agree > 0
+        ORDER BY COALESCE(p.contract_date, p.transaction_date) DESC NULLS LAST,
+                 p.sum_price_agree DESC, p.project_id DESC
+        LIMIT 100
+    """
+
+MIGRATIONS = [
+    Migration(
+        "0001_bid_info_tin_project",
+        "Bids by company: (tin, project_id) covering company and bid, for every per-company lookup "
+        "(bid analysis, company name, competitor and head-to-head project lists)",
+        [Index("thai_project_bid_info_tin_project_idx", "thai_project_bid_info",
+               "(tin, project_id) INCLUDE (company, bid)")],
+        benchmarks=[
+            ("company name", "SELECT DISTINCT company FROM public_data.thai_project_bid_info WHERE tin = %(tin)s LIMIT 1"),
+            ("company bids", "SELECT project_id, company, bid FROM public_data.thai_project_bid_info WHERE tin = %(tin)s"),
+            ("competitor projects", """
+                SELECT DISTINCT a.project_id
+                FROM public_data.thai_project_bid_info a
+                JOIN public_data.thai_project_bid_info b ON a.project_id = b.project_id
+                WHERE a.tin = %(tin)s AND b.tin = %(competitor_tin)s
+            """),
+        ],
+    ),
+    Migration(
+        "0002_bid_info_project_tin",
+        "Bidders by project: (project_id, tin) covering company and bid, for joins from projects "
+        "to their bids (co-bidders, bid analysis, competitor bids)",
+        [Index("thai_project_bid_info_project_tin_idx", "thai_project_bid_info",
+               "(project_id, tin) INCLUDE (company, bid)")],
+        benchmarks=[
+            ("co-bidders", """
+                SELECT b.project_id, b.tin, b.company
+                FROM public_data.thai_project_bid_info b
+                WHERE b.project_id IN (
+                    SELECT project_id FROM public_data.thai_project_bid_info WHERE tin = %(tin)s
+                )
+            """),
+        ],
+    ),
+    Migration(
+        "0003_project_winner_tin",
+        "Won projects by winner TIN in listing order, so a page of company projects is an index range scan",
+        [Index("thai_govt_project_winner_tin_listing_idx", "thai_govt_project",
+               f"(winner_tin, {_COMPANY_PROJECTS_ORDER}) {_COMPANY_PROJECTS_FILTER}")],
+        benchmarks=[("company projects by TIN", _company_projects_benchmark("winner_tin", "tin"))],
+    ),
+    Migration(
+        "0004_project_winner",
+        "Won projects by winner name in listing order, for companies whose projects carry no winner TIN",
+        [Index("thai_govt_project_winner_listing_idx", "thai_govt_project",
+               f"(winner, {_COMPANY_PROJECTS_ORDER}) {_COMPANY_PROJECTS_FILTER}")],
+        benchmarks=[("company projects by name", _company_projects_benchmark("winner", "name"))],
+    ),
+    Migration(
+        "0005_project_contract_date",
+        "Projects by contract date, for the daily rollup refresh and date-bounded listings",
+        [Index("thai_govt_project_contract_date_idx", "thai_govt_project", "(contract_date)")],
+        benchmarks=[
+            ("one week of projects", """
+                SELECT contract_date, dept_name, COUNT(*), SUM(sum_price_agree)
+                FROM public_data.thai_govt_project
+                WHERE contract_date >= %(day)s AND contract_date < %(day)s + 7
+                GROUP BY contract_date, dept_name
+            """),
+        ],
+    ),
+    Migration(
+        "0006_company_summary_trigram",
+        "Trigram indexes on company names and TINs, for substring search in SQL when the "
+        "in-memory search index is disabled or still loading",
+        [
+            Index("company_bid_summary_company_trgm_idx", "company_bid_summary", "USING gin (company gin_trgm_ops)"),
+            Index("company_bid_summary_tin_trgm_idx", "company_bid_summary", "USING gin (tin gin_trgm_ops)"),
+        ],
+        requires_extension="pg_trgm",
+        requires_table="company_bid_summary",
+        benchmarks=[
+            ("company search", """
+                SELECT tin, company, total_bids
+                FROM public_data.company_bid_summary
+                WHERE company ILIKE %(pattern)s OR tin ILIKE %(pattern)s
+                ORDER BY total_bids DESC
+                LIMIT 20
+            """),
+        ],
+    ),
+]
+
+def ensure_migrations_table(cursor):
+    cursor.execute(MIGRATIONS_DDL)
+
+def _applied(cursor):
+    cursor.execute("SELECT to_regclass('public_data.schema_migrations') IS NOT NULL AS present")
+    if not cursor.fetchone()["present"]:
+        return {}
+    cursor.execute("SELECT id, applied_at, duration_ms, benchmark FROM public_data.schema_migrations")
+    return {row["id"]: row for row in cursor.fetchall()}
+
+def _index_states(cursor):
+    """Map index name -> whether it is valid, for the public_data indexes"""
+    cursor.execute(
+        """
+        SELECT c.relname AS name, i.indisvalid AND i.indisready AS valid
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'public_data'
+        """
+    )
+    return {row["name"]: row["valid"] for row in cursor.fetchall()}
+
+def _extension_state(cursor, name):
+    cursor.execute(
+        "SELECT installed_version IS NOT NULL AS installed FROM pg_available_extensions WHERE name = %s",
+        (name,)
+    )
+    row = cursor.fetchone()
+    if row is None:
+        return "unavailable"
+    return "installed" if row["installed"] else "available"
+
+def _table_exists(cursor, table):
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL AS present", (f"public_data.{table}",))
+    return cursor.fetchone()["present"]
+
+def _blocker(cursor, migration):
+    """Why a migration cannot run on this database yet, or None"""
+    if migration.requires_extension and _extension_state(cursor, migration.requires_extension) == "unavailable":
+        return f"extension {migration.requires_extension} is not available on this server"
+    if migration.requires_table and not _table_exists(cursor, migration.requires_table):
+        return f"table public_data.{migration.requires_table} does not exist yet (run manage.py refresh-summaries)"
+    return None
+
+def get_schema_status(conn):
+    """
+    Report applied and pending migrations and the state of their indexes.
+
+    Returns:
+        Dictionary with the applied, pending and blocked migrations, the
+        change capture objects that are not installed, and the indexes that
+        are missing or invalid (e.g. after a failed concurrent build)
+    """
+    cursor = conn.cursor()
+    applied = _applied(cursor)
+    states = _index_states(cursor)
+
+    change_capture = missing_change_capture(cursor)
+    pending, blocked, missing, invalid = [], [], [], []
+    for migration in MIGRATIONS:
+        reason = _blocker(cursor, migration)
+        if migration.id not in applied:
+            if reason:
+                blocked.append({"id": migration.id, "reason": reason})
+            else:
+                pending.append(migration.id)
+        if reason:
+            continue
+        for index in migration.indexes:
+            if index.name not in states:
+                missing.append({"index": index.name, "table": index.table, "migration": migration.id})
+            elif not states[index.name]:
+                invalid.append({"index": index.name, "table": index.table, "migration": migration.id})
+    cursor.close()
+    conn.rollback()
+
+    return {
+        "status": "ok" if not (pending or missing or invalid or change_capture) else "degraded",
+        "applied": sorted(applied),
+        "missing_change_capture": change_capture,
+        "pending": pending,
+        "blocked": blocked,
+        "missing_indexes": missing,
+        "invalid_indexes": invalid,
+    }
+
+def benchmark_params(conn):
+    """
+    Representative parameters for the migration benchmarks: a busy company
+    (at the top 1% mark by bids, because the very top companies are outliers
+    that return a large share of the table), its most frequent co-bidder and
+    a week of contract dates.
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        WITH ranked AS (
+            SELECT tin, MIN(company) AS company, COUNT(*) AS bids,
+                   ROW_NUMBER() OVER (ORDER BY COUNT(*) DESC, tin) AS position,
+                   COUNT(*) OVER () AS companies
+            FROM public_data.thai_project_bid_info
+            WHERE tin IS NOT NULL
+            GROUP BY tin
+        )
+        SELECT tin, company, bids FROM ranked
+        WHERE position = GREATEST(companies / 100, 1)
+        """
+    )
+    company = cursor.fetchone()
+    if company is None:
+        cursor.close()
+        raise ValueError("thai_project_bid_info is empty; nothing to benchmark")
+
+    cursor.execute(
+        """
+        SELECT b.tin
+        FROM public_data.thai_project_bid_info a
+        JOIN public_data.thai_project_bid_info b ON a.project_id = b.project_id
+        WHERE a.tin = %s AND b.tin <> a.tin
+        GROUP BY b.tin
+        ORDER BY COUNT(*) DESC, b.tin
+        LIMIT 1
+        """,
+        (company["tin"],)
+    )
+    competitor = cursor.fetchone()
+    cursor.execute(
+        "SELECT winner FROM public_data.thai_govt_project WHERE winner_tin = %s AND winner IS NOT NULL LIMIT 1",
+        (company["tin"],)
+    )
+    winner = cursor.fetchone()
+    cursor.execute("SELECT percentile_disc(0.5) WITHIN GROUP (ORDER BY contract_date) AS day FROM public_data.thai_govt_project")
+    day = cursor.fetchone()["day"]
+    cursor.close()
+    conn.rollback()
+
+    name = winner["winner"] if winner else company["company"]
+    return {
+        "tin": company["tin"],
+        "competitor_tin": competitor["tin"] if competitor else company["tin"],
+        "name": name,
+        # A word from the middle of a name, as typed into the search box
+        "pattern": f"%{(name or company['tin'])[2:8]}%",
+        "day": day,
+    }
+
+def time_benchmarks(conn, migration, params, repeat=5):
+    """Median milliseconds of each benchmark query of a migration (after one warm-up run)"""
+    cursor = conn.cursor()
+    results = {}
+    for label, sql in migration.benchmarks:
+        samples = []
+        for attempt in range(repeat + 1):
+            started = time.perf_counter()
+            cursor.execute(sql, params)
+            cursor.fetchall()
+            if attempt:
+                samples.append((time.perf_counter() - started) * 1000)
+        results[label] = round(statistics.median(samples), 2)
+    cursor.close()
+    return results
+
+def _create_index(cursor, index, valid):
+    if valid is False:
+        logger.warning(f"Index {index.name} is invalid (interrupted build); rebuilding it")
+        cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS public_data.{index.name}")
+    logger.info(f"Creating index {index.name} on {index.table}")
+    cursor.execute(index.create_sql)
+
+def migrate(conn, benchmark=False, repeat=5):
+    """
+    Install the change capture, then apply the pending migrations in order.
+
+    Indexes are built concurrently, so the connection runs in autocommit
+    mode for the duration; a session advisory lock keeps two runs apart.
+
+    Args:
+        conn: Database connection
+        benchmark: Time each migration's queries before and after applying it
+        repeat: Timed runs per benchmark query
+
+    Returns:
+        Dictionary with the applied and blocked migrations (and their timings)
+        and the change capture objects that were missing before this run
+    """
+    conn.rollback()
+    autocommit = conn.autocommit
+    conn.autocommit = True
+    cursor = conn.cursor()
+    cursor.execute("SELECT pg_advisory_lock(hashtext('schema_migrations'))")
+    try:
+        ensure_migrations_table(cursor)
+        change_capture = missing_change_capture(cursor)
+        install_change_log(cursor)
+        if change_capture:
+            logger.info(f"Installed change capture: {', '.join(change_capture)}")
+        applied = _applied(cursor)
+        params = benchmark_params(conn) if benchmark else None
+
+        results = {
+            "change_capture_installed": change_capture,
+            "applied": [],
+            "blocked": [],
+            "already_applied": sorted(applied),
+        }
+        for migration in MIGRATIONS:
+            states = _index_states(cursor)
+            # Applied migrations are rechecked: an index may have been dropped or left invalid
+            if migration.id in applied and all(states.get(index.name) for index in migration.indexes):
+                continue
+
+            reason = _blocker(cursor, migration)
+            if reason is None and migration.requires_extension \
+                    and _extension_state(cursor, migration.requires_extension) == "available":
+                try:
+                    cursor.execute(f"CREATE EXTENSION IF NOT EXISTS {migration.requires_extension}")
+                except Exception as e:
+                    reason = f"could not create extension {migration.requires_extension}: {str(e).strip()}"
+            if reason:
+                logger.warning(f"Skipping migration {migration.id}: {reason}")
+                results["blocked"].append({"id": migration.id, "reason": reason})
+                continue
+
+            before = time_benchmarks(conn, migration, params, repeat) if benchmark else None
+            started = time.monotonic()
+            for index in migration.indexes:
+                if not states.get(index.name):
+                    _create_index(cursor, index, states.get(index.name))
+            cursor.execute(f"ANALYZE public_data.{migration.indexes[0].table}")
+            duration_ms = round((time.monotonic() - started) * 1000, 1)
+            after = time_benchmarks(conn, migration, params, repeat) if benchmark else None
+
+            timings = (
+                {label: {"before_ms": before[label], "after_ms": after[label]} for label in before}
+                if benchmark else None
+            )
+            cursor.execute(
+                """
+                INSERT INTO public_data.schema_migrations (id, description, duration_ms, benchmark)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (id) DO UPDATE
+                SET applied_at = now(), duration_ms = EXCLUDED.duration_ms,
+                    benchmark = COALESCE(EXCLUDED.benchmark, schema_migrations.benchmark)
+                """,
+                (migration.id, migration.description, duration_ms, json.dumps(timings) if timings else None)
+            )
+            logger.info(f"Applied migration {migration.id} in {duration_ms} ms")
+            results["applied"].append({"id": migration.id, "duration_ms": duration_ms, "benchmark": timings})
+        return results
+    finally:
+        cursor.execute("SELECT pg_advisory_unlock(hashtext('schema_migrations'))")
+        cursor.close()
+        conn.autocommit = autocommit
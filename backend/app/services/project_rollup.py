@@ -0,0 +1,217 @@
+# app/services/project_rollup.py
+"""
+Maintained daily rollup of contracted projects.
+
+`project_daily_rollup` holds one row per (contract day, department) with
+the project count and total agreed price. /api/data aggregates it into
+weeks, months, quarters or years, so a request reads at most a few rows
+per day in the requested range, however large the project table grows. A
+refresh only recomputes the days named in the change log since the
+previous refresh; `full=True` rebuilds everything.
+"""
+import time
+import logging
+from fastapi import HTTPException
+from .change_log import (
+    read_watermark,
+    get_consumer_state,
+    mark_consumed,
+    prune_change_log,
+    get_refresh_status,
+)
+
+logger = logging.getLogger(__name__)
+
+CONSUMER = "project_daily_rollup"
+
+# Set once a refresh has completed, so readers skip the state lookup afterwards
+_rollup_ready = False
+
+ROLLUP_DDL = """
+    CREATE TABLE IF NOT EXISTS public_data.project_daily_rollup (
+        contract_day DATE NOT NULL,
+        dept_name TEXT,
+        total_sum_price_agree NUMERIC,
+        project_count BIGINT NOT NULL,
+        refreshed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+    CREATE INDEX IF NOT EXISTS project_daily_rollup_day_idx
+        ON public_data.project_daily_rollup (contract_day);
+    CREATE INDEX IF NOT EXISTS project_daily_rollup_dept_day_idx
+        ON public_data.project_daily_rollup (dept_name, contract_day);
+"""
+
+# Same totals get_monthly_data used to compute from the project table
+ROLLUP_SELECT = """
+    SELECT
+        p.contract_date::date AS contract_day,
+        p.dept_name,
+        SUM(p.sum_price_agree) AS total_sum_price_agree,
+        COUNT(p.project_id) AS project_count
+    FROM public_data.thai_govt_project p
+"""
+
+ROLLUP_COLUMNS = "contract_day, dept_name, total_sum_price_agree, project_count"
+
+# date_trunc unit, period label format and year expression per granularity
+GRANULARITIES = {
+    "week": ("week", 'IYYY-"W"IW', "ISOYEAR"),
+    "month": ("month", "YYYY-MM", "YEAR"),
+    "quarter": ("quarter", 'YYYY-"Q"Q', "YEAR"),
+    "year": ("year", "YYYY", "YEAR"),
+}
+
+def ensure_project_rollup(conn):
+    """Create the rollup table (change capture is installed by manage.py migrate)"""
+    cursor = conn.cursor()
+    cursor.execute(ROLLUP_DDL)
+    cursor.close()
+    conn.commit()
+
+def refresh_project_rollup(conn, full=False):
+    """
+    Bring project_daily_rollup up to date.
+
+    Args:
+        conn: Database connection (the refresh commits on it)
+        full: Rebuild every day instead of only the days with logged changes
+
+    Returns:
+        Dictionary describing the refresh (mode, days and rows written, duration)
+    """
+    started = time.monotonic()
+    high = read_watermark(conn)
+    cursor = conn.cursor()
+
+    # Serialize concurrent refreshes (background loop, admin endpoint, CLI)
+    cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (CONSUMER,))
+    state = get_consumer_state(cursor, CONSUMER)
+    if state is None:
+        full = True
+
+    if full:
+        logger.info("Rebuilding project rollup from scratch")
+        cursor.execute("DELETE FROM public_data.project_daily_rollup")
+        cursor.execute(
+            f"INSERT INTO public_data.project_daily_rollup ({ROLLUP_COLUMNS}) "
+            + ROLLUP_SELECT
+            + " WHERE p.contract_date IS NOT NULL"
+            + " GROUP BY p.contract_date::date, p.dept_name"
+        )
+        rows_written = cursor.rowcount
+        affected = None
+    else:
+        low = state["last_change_id"]
+        if high <= low:
+            conn.rollback()
+            cursor.close()
+            return {"mode": "incremental", "affected_days": 0, "rows_written": 0,
+                    "duration_ms": round((time.monotonic() - started) * 1000, 1)}
+
+        cursor.execute(
+            """
+            CREATE TEMP TABLE rollup_affected_days ON COMMIT DROP AS
+            SELECT DISTINCT contract_day
+            FROM public_data.analytics_change_log
+            WHERE change_id > %s AND change_id <= %s
+              AND contract_day IS NOT NULL
+            """,
+            (low, high)
+        )
+        affected = cursor.rowcount
+
+        cursor.execute(
+            "DELETE FROM public_data.project_daily_rollup "
+            "WHERE contract_day IN (SELECT contract_day FROM rollup_affected_days)"
+        )
+        # Range join keeps the lookup on contract_date sargable
+        cursor.execute(
+            f"INSERT INTO public_data.project_daily_rollup ({ROLLUP_COLUMNS}) "
+            + ROLLUP_SELECT
+            + " JOIN rollup_affected_days a"
+            + " ON p.contract_date >= a.contract_day AND p.contract_date < a.contract_day + 1"
+            + " GROUP BY p.contract_date::date, p.dept_name"
+        )
+        rows_written = cursor.rowcount
+
+    mark_consumed(cursor, CONSUMER, high)
+    prune_change_log(cursor)
+    conn.commit()
+    cursor.close()
+
+    global _rollup_ready
+    _rollup_ready = True
+
+    result = {
+        "mode": "full" if full else "incremental",
+        "affected_days": affected,
+        "rows_written": rows_written,
+        "duration_ms": round((time.monotonic() - started) * 1000, 1),
+    }
+    logger.info(f"Project rollup refreshed: {result}")
+    return result
+
+def get_project_rollup_status(conn):
+    """Return refresh time and staleness of the project rollup"""
+    cursor = conn.cursor()
+    status = get_refresh_status(cursor, CONSUMER)
+    cursor.close()
+    return status
+
+def require_project_rollup(cursor):
+    """Raise 503 until the rollup has been built at least once"""
+    global _rollup_ready
+    if _rollup_ready:
+        return
+    cursor.execute("SELECT to_regclass('public_data.analytics_refresh_state') IS NOT NULL AS present")
+    if cursor.fetchone()["present"] and get_consumer_state(cursor, CONSUMER) is not None:
+        _rollup_ready = True
+        return
+    raise HTTPException(
+        status_code=503,
+        detail="Project rollup is still being built; try again shortly"
+    )
+
+def rollup_period_query(granularity, start_date=None, end_date=None, dept_name=None):
+    """
+    Build the query aggregating the daily rollup into periods.
+
+    Args:
+        granularity: "week", "month", "quarter" or "year"
+        start_date: First contract day to include
+        end_date: Last contract day to include
+        dept_name: Only include this department
+
+    Returns:
+        (query, params)
+    """
+    unit, label_format, year_field = GRANULARITIES[granularity]
+    period = f"date_trunc('{unit}', r.contract_day)::date"
+
+    query = f"""
+        SELECT
+            TO_CHAR({period}, 'Month') AS month,
+            EXTRACT({year_field} FROM {period})::int AS year,
+            SUM(r.total_sum_price_agree) AS total_sum_price_agree,
+            SUM(r.project_count) AS count,
+            TO_CHAR({period}, '{label_format}') AS period,
+            TO_CHAR({period}, 'YYYY-MM-DD') AS period_start
+        FROM public_data.project_daily_rollup r
+        WHERE TRUE
+    """
+    params = []
+    if start_date is not None:
+        query += " AND r.contract_day >= %s"
+        params.append(start_date)
+    if end_date is not None:
+        query += " AND r.contract_day <= %s"
+        params.append(end_date)
+    if dept_name is not None:
+        query += " AND r.dept_name = %s"
+        params.append(dept_name)
+
+    query += f"""
+        GROUP BY {period}
+        ORDER BY {period}
+    """
+    return query, params
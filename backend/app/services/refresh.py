@@ -0,0 +1,138 @@
+# app/services/refresh.py
+"""
+Refresh orchestration for the derived analytics stores.
+
+`refresh_all()` brings every maintained store up to date in dependency
+order. The app runs it once at startup and then on a fixed interval; the
+admin endpoint and `manage.py refresh-summaries` call it on demand.
+"""
+import asyncio
+import logging
+from ..database import run_db
+from ..utils.env import get_refresh_config, get_search_index_config, get_cobid_graph_config
+from .change_log import missing_change_capture, forget_consumer, get_consumer_state
+from .company_summary import CONSUMER as SUMMARY_CONSUMER, ensure_company_summary, refresh_company_summary
+from .project_rollup import CONSUMER as ROLLUP_CONSUMER, ensure_project_rollup, refresh_project_rollup
+from .bid_ratio_sketch import CONSUMER as SKETCH_CONSUMER, ensure_bid_ratio_sketch, refresh_bid_ratio_sketch
+from .search_index import get_search_index, load_search_index
+from .cobid_graph import CONSUMER as COBID_GRAPH_CONSUMER, refresh_cobid_graph
+from .bid_ratio_distribution import refresh_bid_ratio_distribution
+from .company_directory import refresh_company_directory
+from .cache import get_response_cache
+
+logger = logging.getLogger(__name__)
+
+# Stores the cached responses are rendered from
+CACHE_CONSUMERS = (SUMMARY_CONSUMER, ROLLUP_CONSUMER, SKETCH_CONSUMER)
+
+def ensure_all(conn):
+    """Create the tables the derived stores need"""
+    ensure_company_summary(conn)
+    ensure_project_rollup(conn)
+    ensure_bid_ratio_sketch(conn)
+
+def check_change_capture(conn):
+    """
+    Warn about change capture objects that `manage.py migrate` has not installed.
+
+    Returns:
+        True if the change log can be read, so the stores can be refreshed
+    """
+    cursor = conn.cursor()
+    missing = missing_change_capture(cursor)
+    cursor.close()
+    conn.rollback()
+    if missing:
+        logger.warning(
+            f"Change capture is incomplete, run `python manage.py migrate`; missing: {', '.join(missing)}"
+        )
+    return not any(name.startswith("public_data.analytics_") for name in missing)
+
+def refresh_all(conn, full=False):
+    """
+    Refresh every derived store.
+
+    Args:
+        conn: Database connection
+        full: Rebuild from scratch instead of applying logged changes
+
+    Returns:
+        Dictionary of per-store refresh results
+    """
+    results = {
+        "company_summary": refresh_company_summary(conn, full=full),
+        "project_rollup": refresh_project_rollup(conn, full=full),
+        "bid_ratio_sketch": refresh_bid_ratio_sketch(conn, full=full),
+    }
+
+    # Rebuild the in-memory search index whenever the summary changed
+    search_config = get_search_index_config()
+    if search_config["enabled"] and (
+        get_search_index() is None or results["company_summary"]["rows_written"]
+        or results["company_summary"]["affected_tins"]
+    ):
+        results["search_index"] = load_search_index(conn, search_config["max_bytes"])
+
+    # Cheap no-op unless the summary moved since the distribution was built
+    results["bid_ratio_distribution"] = refresh_bid_ratio_distribution(conn, full=full)
+    results["company_directory"] = refresh_company_directory(conn, full=full)
+
+    graph_config = get_cobid_graph_config()
+    if graph_config["enabled"]:
+        results["cobid_graph"] = refresh_cobid_graph(conn, graph_config["path"], full=full)
+    else:
+        # A disabled graph must not keep the change log from being pruned
+        cursor = conn.cursor()
+        if forget_consumer(cursor, COBID_GRAPH_CONSUMER):
+            logger.info("Co-bidding graph is disabled; dropped its change log state")
+        cursor.close()
+        conn.commit()
+
+    # Cached responses were rendered from the old data
+    invalidated = sync_response_cache(conn)
+    if results["company_summary"]["changes_applied"] or results["bid_ratio_sketch"]["changes_applied"]:
+        invalidated += get_response_cache().invalidate()
+    if invalidated:
+        results["response_cache"] = {"invalidated": invalidated}
+
+    return results
+
+def sync_response_cache(conn):
+    """
+    Clear this worker's response cache if any worker has refreshed the stores since.
+
+    The cache's version is the consumer change ids in the database, so a
+    worker whose own refresh found nothing to do still drops the bodies
+    rendered before another worker's refresh.
+
+    Returns:
+        Number of entries removed
+    """
+    cursor = conn.cursor()
+    version = []
+    for consumer in CACHE_CONSUMERS:
+        state = get_consumer_state(cursor, consumer)
+        version.append(state["last_change_id"] if state else None)
+    cursor.close()
+    conn.rollback()
+    return get_response_cache().sync(tuple(version))
+
+async def refresh_loop():
+    """Create the stores at startup, then refresh them periodically"""
+    interval = get_refresh_config()["interval"]
+    try:
+        await run_db(ensure_all)
+        if not await run_db(check_change_capture):
+            return
+    except Exception as e:
+        logger.error(f"Could not prepare analytics stores: {str(e)}")
+        return
+
+    while True:
+        try:
+            await run_db(refresh_all)
+        except Exception as e:
+            logger.error(f"Analytics refresh failed: {str(e)}")
+        if interval <= 0:
+            return
+        await asyncio.sleep(interval)
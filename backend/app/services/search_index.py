@@ -0,0 +1,209 @@
+# app/services/search_index.py
+"""
+In-process typeahead index over company names and TINs.
+
+Documents are the rows of `company_bid_summary`, ordered by total_bids so
+that document ids double as the default ranking. Candidate lookup uses a
+bigram index over the *base characters* of each name: Thai vowel signs and
+tone marks are combining characters, so they are dropped from the n-grams.
+A query that starts or stops in the middle of a character cluster still
+yields valid lookup keys, and the index stays small. Every candidate is
+then verified with a substring test on the normalized text, which gives
+the same matches as `ILIKE '%query%'`.
+"""
+import sys
+import time
+import logging
+import unicodedata
+from array import array
+
+logger = logging.getLogger(__name__)
+
+# Zero-width characters that show up in copy-pasted Thai text
+_INVISIBLE = dict.fromkeys(map(ord, "\u200b\u200c\u200d\u2060\ufeff"))
+
+# Legal-form prefixes skipped when deciding whether a query is a name prefix
+_LEGAL_PREFIXES = (
+    "บริษัท", "บจก.", "บมจ.", "ห้างหุ้นส่วนจำกัด", "ห้างหุ้นส่วนสามัญ", "หจก.", "หสน.",
+    "ร้าน", "สหกรณ์",
+)
+
+_RESULT_FIELDS = (
+    "tin", "company", "total_bids", "wins", "win_rate",
+    "total_bid_value", "avg_bid", "avg_bid_ratio",
+)
+
+def normalize(text):
+    """NFC-normalize, casefold, drop zero-width characters and collapse whitespace"""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFC", text).translate(_INVISIBLE).casefold()
+    return " ".join(text.split())
+
+def skeleton(text):
+    """Strip combining marks (Thai vowel signs, tone marks) from normalized text"""
+    return "".join(ch for ch in text if not unicodedata.category(ch).startswith("M"))
+
+def _bigrams(text):
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+def _strip_legal_prefix(name):
+    for prefix in _LEGAL_PREFIXES:
+        if name.startswith(prefix):
+            return name[len(prefix):].lstrip()
+    return name
+
+class CompanySearchIndex:
+    """
+    Immutable search index; a refresh builds a new one and swaps it in.
+
+    Args:
+        rows: Summary rows (dicts with the CompanyWinRate fields), any order
+        max_bytes: Memory ceiling; companies with the fewest bids are left
+            out once the estimated index size would exceed it
+    """
+
+    def __init__(self, rows, max_bytes):
+        started = time.monotonic()
+        rows = sorted(rows, key=lambda row: row["total_bids"], reverse=True)
+
+        self._names = []      # normalized company names
+        self._tins = []       # normalized TINs
+        self._prefixed = []   # names without legal-form prefix, for prefix ranking
+        self._results = []    # tuples in _RESULT_FIELDS order
+        postings = {}
+        size = 0
+
+        for doc_id, row in enumerate(rows):
+            name = normalize(row["company"])
+            tin = normalize(row["tin"])
+            result = tuple(
+                float(row[field]) if field in ("win_rate", "total_bid_value", "avg_bid", "avg_bid_ratio")
+                and row[field] is not None else row[field]
+                for field in _RESULT_FIELDS
+            )
+            grams = _bigrams(skeleton(name)) | _bigrams(tin)
+
+            doc_size = (
+                sys.getsizeof(name) + sys.getsizeof(tin) + sys.getsizeof(row["company"] or "")
+                + sys.getsizeof(result) + 8 * len(result) + 4 * len(grams)
+            )
+            if size + doc_size > max_bytes:
+                break
+            size += doc_size
+
+            self._names.append(name)
+            self._tins.append(tin)
+            self._prefixed.append(_strip_legal_prefix(name))
+            self._results.append(result)
+            for gram in grams:
+                posting = postings.get(gram)
+                if posting is None:
+                    posting = postings[gram] = array("I")
+                    size += sys.getsizeof(gram) + 64
+                posting.append(doc_id)
+
+        self._postings = postings
+        self.size_bytes = size
+        self.document_count = len(self._results)
+        self.total_rows = len(rows)
+        self.partial = self.document_count < self.total_rows
+        self.build_ms = round((time.monotonic() - started) * 1000, 1)
+
+        if self.partial:
+            logger.warning(
+                f"Search index hit its memory ceiling: indexed {self.document_count} "
+                f"of {self.total_rows} companies"
+            )
+
+    def _candidates(self, query_skeleton):
+        grams = _bigrams(query_skeleton)
+        if not grams:
+            # Single base character: nothing to narrow on, scan every document
+            return range(self.document_count)
+        lists = []
+        for gram in grams:
+            posting = self._postings.get(gram)
+            if posting is None:
+                return ()
+            lists.append(posting)
+        lists.sort(key=len)
+        if len(lists) == 1:
+            return lists[0]
+        others = [set(posting) for posting in lists[1:3]]
+        return [doc_id for doc_id in lists[0] if all(doc_id in other for other in others)]
+
+    def search(self, query, limit=20):
+        """
+        Return up to `limit` matching companies, best first.
+
+        Ranking: exact TIN, then TIN or name prefix, then a match at the start
+        of a word, then any substring match; ties go to the company with more
+        bids. Returns None when the index is partial and could not fill the
+        page, so the caller can fall back to the database.
+        """
+        q = normalize(query)
+        if not q:
+            return []
+
+        matches = []
+        for doc_id in self._candidates(skeleton(q)):
+            name = self._names[doc_id]
+            tin = self._tins[doc_id]
+            if tin == q:
+                tier = 0
+            elif tin.startswith(q) or name.startswith(q) or self._prefixed[doc_id].startswith(q):
+                tier = 1
+            else:
+                position = name.find(q)
+                if position > 0 and name[position - 1] == " ":
+                    tier = 2
+                elif position >= 0 or q in tin:
+                    tier = 3
+                else:
+                    continue
+            matches.append((tier, doc_id))
+
+        # A partial index may be missing lower-ranked companies, including the
+        # exact TIN being looked up
+        if self.partial and (len(matches) < limit or (q.isdigit() and not any(t == 0 for t, _ in matches))):
+            return None
+
+        matches.sort()
+        return [dict(zip(_RESULT_FIELDS, self._results[doc_id])) for _, doc_id in matches[:limit]]
+
+    def stats(self):
+        """Return size and coverage information"""
+        return {
+            "documents": self.document_count,
+            "total_rows": self.total_rows,
+            "partial": self.partial,
+            "size_bytes": self.size_bytes,
+            "bigrams": len(self._postings),
+            "build_ms": self.build_ms,
+        }
+
+_index = None
+
+def get_search_index():
+    """Return the current index, or None if it has not been loaded"""
+    return _index
+
+def load_search_index(conn, max_bytes):
+    """Build a fresh index from company_bid_summary and swap it in"""
+    global _index
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        SELECT tin, company, total_bids, wins, win_rate,
+               total_bid_value, avg_bid, avg_bid_ratio
+        FROM public_data.company_bid_summary
+        """
+    )
+    rows = cursor.fetchall()
+    cursor.close()
+
+    index = CompanySearchIndex(rows, max_bytes)
+    _index = index
+    logger.info(f"Search index loaded: {index.stats()}")
+    return index.stats()
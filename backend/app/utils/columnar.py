@@ -0,0 +1,177 @@
+# app/utils/columnar.py
+"""
+Columnar response encodings negotiated through the Accept header.
+
+Large analytical endpoints can answer with one array per column instead of
+a JSON array of objects, which drops the repeated keys and per-value text
+formatting on both ends:
+
+- Arrow IPC stream (`application/vnd.apache.arrow.stream`, needs pyarrow)
+- msgpack (`application/x-msgpack`, needs msgpack) of the form
+  {"length": n, "columns": [{"name", "type"}], "data": [column, ...]} where
+  float64 columns are little-endian float64 bytes (NaN for NULL) that load
+  straight into a Float64Array, and other columns are plain arrays
+
+Both libraries are optional; asking for a format whose library is not
+installed gets a 406.
+"""
+import numpy as np
+from fastapi import HTTPException, Request, Response
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+
+_FORMATS = {
+    ARROW_MEDIA_TYPE: "arrow",
+    MSGPACK_MEDIA_TYPE: "msgpack",
+    "application/msgpack": "msgpack",
+    "application/json": "json",
+    "application/*": "json",
+    "*/*": "json",
+}
+
+# OpenAPI `responses` entry for routes that negotiate columnar formats
+COLUMNAR_RESPONSES = {
+    200: {"content": {ARROW_MEDIA_TYPE: {}, MSGPACK_MEDIA_TYPE: {}}},
+    406: {"description": "Requested columnar format is not available"},
+}
+
+_REQUIREMENTS = {"arrow": "pyarrow", "msgpack": "msgpack"}
+
+# Postgres type OIDs by column type (NUMERIC is fetched as float)
+_FLOAT_OIDS = {700, 701, 1700}
+_INT_OIDS = {20, 21, 23}
+_BOOL_OIDS = {16}
+
+def _available(fmt):
+    if fmt == "arrow":
+        return pyarrow is not None
+    if fmt == "msgpack":
+        return msgpack is not None
+    return True
+
+def _parse_accept(header):
+    # (media type, q) pairs, highest q first; ties keep the client's order
+    accepted = []
+    for position, part in enumerate(header.split(",")):
+        media, *params = [item.strip() for item in part.split(";")]
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media:
+            accepted.append((-q, position, media.lower()))
+    return [(media, -q) for q, _, media in sorted(accepted)]
+
+def negotiate_format(request: Request):
+    """
+    Dependency choosing the response encoding from the Accept header.
+
+    Returns:
+        "json", "arrow" or "msgpack"
+
+    Raises:
+        HTTPException: 406 if only columnar formats whose library is not
+            installed are acceptable
+    """
+    header = request.headers.get("accept")
+    if not header:
+        return "json"
+
+    missing = []
+    for media, q in _parse_accept(header):
+        fmt = _FORMATS.get(media)
+        if q <= 0 or fmt is None:
+            continue
+        if _available(fmt):
+            return fmt
+        missing.append(fmt)
+
+    if missing:
+        raise HTTPException(
+            status_code=406,
+            detail=f"{', '.join(_REQUIREMENTS[fmt] for fmt in missing)} is not installed on the server; "
+                   f"request application/json instead"
+        )
+    return "json"
+
+def column_types(description):
+    """Map cursor.description to "float64", "int64", "bool" or "string" per column"""
+    types = []
+    for column in description:
+        if column.type_code in _FLOAT_OIDS:
+            types.append("float64")
+        elif column.type_code in _INT_OIDS:
+            types.append("int64")
+        elif column.type_code in _BOOL_OIDS:
+            types.append("bool")
+        else:
+            types.append("string")
+    return types
+
+def _float64_bytes(values):
+    array = np.fromiter((np.nan if value is None else value for value in values), dtype="<f8", count=len(values))
+    return array.tobytes()
+
+def encode_arrow(names, types, columns):
+    """Encode columns as an Arrow IPC stream with a single record batch"""
+    arrow_types = {
+        "float64": pyarrow.float64(),
+        "int64": pyarrow.int64(),
+        "bool": pyarrow.bool_(),
+        "string": pyarrow.string(),
+    }
+    arrays = [pyarrow.array(column, type=arrow_types[kind]) for kind, column in zip(types, columns)]
+    batch = pyarrow.record_batch(arrays, names=names)
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+def encode_msgpack(names, types, columns):
+    """Encode columns as msgpack, float64 columns as raw little-endian bytes"""
+    data = [
+        _float64_bytes(column) if kind == "float64" else list(column)
+        for kind, column in zip(types, columns)
+    ]
+    payload = {
+        "length": len(columns[0]) if columns else 0,
+        "columns": [{"name": name, "type": kind} for name, kind in zip(names, types)],
+        "data": data,
+    }
+    return msgpack.packb(payload, use_bin_type=True)
+
+def columnar_response(fmt, description, columns):
+    """
+    Build the response for a negotiated columnar format.
+
+    Args:
+        fmt: "arrow" or "msgpack" (from negotiate_format)
+        description: cursor.description of the query
+        columns: One sequence of values per column
+
+    Returns:
+        Response with the encoded body
+    """
+    names = [column.name for column in description]
+    types = column_types(description)
+    if fmt == "arrow":
+        body, media_type = encode_arrow(names, types, columns), ARROW_MEDIA_TYPE
+    else:
+        body, media_type = encode_msgpack(names, types, columns), MSGPACK_MEDIA_TYPE
+    return Response(content=body, media_type=media_type, headers={"Vary": "Accept"})
@@ -5,11 +5,21 @@ from dotenv import load_dotenv
 
 logger = logging.getLogger(__name__)
 
+# Result of the first load_env_vars() call; the .env files are only read once
+_env_loaded = None
+
 def load_env_vars():
     """
     Load environment variables from .env file.
     This function tries multiple locations to find the .env file.
+    The lookup runs once per process; later calls return the cached result.
     """
+    global _env_loaded
+    if _env_loaded is None:
+        _env_loaded = _find_and_load_env()
+    return _env_loaded
+
+def _find_and_load_env():
     # Try to find .env in the project root (parent of app directory)
     root_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
     env_path = os.path.join(root_path, '.env')
@@ -52,4 +62,175 @@ def get_db_config():
         "password": os.getenv("POSTGRES_PASSWORD", ""),
     }
     
-    return config
\ No newline at end of file
+    return config
+
+def get_pool_config():
+    """Get connection pool configuration from environment variables"""
+    load_env_vars()
+
+    min_size = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+    max_size = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+
+    config = {
+        "min_size": min_size,
+        "max_size": max(max_size, min_size, 1),
+        "acquire_timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        "health_check_interval": float(os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", "30")),
+    }
+
+    return config
+
+def get_replica_config():
+    """
+    Get read replica configuration from environment variables.
+
+    DB_REPLICAS is a comma-separated list of `host[:port][/dbname]`; port and
+    database default to the primary's, user and password are the primary's.
+    A host starting with "/" is a Unix socket directory (`/dir[:port]`, no
+    database suffix).
+    """
+    load_env_vars()
+
+    primary = get_db_config()
+    replicas = []
+    for entry in os.getenv("DB_REPLICAS", "").split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        address, dbname = entry, ""
+        if not entry.startswith("/"):
+            address, _, dbname = entry.partition("/")
+        host, colon, port = address.rpartition(":")
+        if not colon or not port.isdigit():
+            host, port = address, primary["port"]
+        replicas.append({
+            **primary,
+            "host": host,
+            "port": port,
+            "dbname": dbname or primary["dbname"],
+            "connect_timeout": int(float(os.getenv("DB_REPLICA_CONNECT_TIMEOUT", "3"))),
+        })
+
+    strategy = os.getenv("DB_REPLICA_STRATEGY", "round_robin").lower()
+    if strategy not in ("round_robin", "least_loaded"):
+        logger.warning(f"Unknown DB_REPLICA_STRATEGY {strategy!r}, using round_robin")
+        strategy = "round_robin"
+
+    config = {
+        "replicas": replicas,
+        "strategy": strategy,
+        # Replicas further behind than this are skipped until they catch up
+        "max_lag": float(os.getenv("DB_REPLICA_MAX_LAG", "30")),
+        "check_interval": float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "5")),
+        "max_size": max(int(os.getenv("DB_REPLICA_POOL_MAX_SIZE", str(get_pool_config()["max_size"]))), 1),
+    }
+
+    return config
+
+def get_executor_config():
+    """Get database executor configuration from environment variables"""
+    load_env_vars()
+
+    # One worker per pooled connection unless explicitly overridden
+    default_workers = get_pool_config()["max_size"]
+
+    config = {
+        "max_workers": max(int(os.getenv("DB_EXECUTOR_WORKERS", str(default_workers))), 1),
+    }
+
+    return config
+
+def get_refresh_config():
+    """Get analytics refresh configuration from environment variables"""
+    load_env_vars()
+
+    config = {
+        # Seconds between incremental refreshes; 0 refreshes once at startup only
+        "interval": float(os.getenv("ANALYTICS_REFRESH_INTERVAL", "300")),
+        # Consumers idle for longer stop holding back change log pruning
+        "stale_consumer_seconds": float(os.getenv("ANALYTICS_STALE_CONSUMER_HOURS", "24")) * 3600,
+    }
+
+    return config
+
+def get_search_index_config():
+    """Get in-memory search index configuration from environment variables"""
+    load_env_vars()
+
+    config = {
+        "enabled": os.getenv("SEARCH_INDEX_ENABLED", "true").lower() in ("1", "true", "yes"),
+        "max_bytes": int(float(os.getenv("SEARCH_INDEX_MAX_MB", "256")) * 1024 * 1024),
+    }
+
+    return config
+
+def get_cobid_graph_config():
+    """Get co-bidding graph configuration from environment variables"""
+    load_env_vars()
+
+    # Relative paths are resolved against the backend directory
+    root_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    path = os.getenv("COBID_GRAPH_PATH", os.path.join("data", "cobid_graph.npz"))
+
+    config = {
+        "enabled": os.getenv("COBID_GRAPH_ENABLED", "true").lower() in ("1", "true", "yes"),
+        "path": path if os.path.isabs(path) else os.path.join(root_path, path),
+    }
+
+    return config
+
+def get_metrics_config():
+    """Get metrics configuration from environment variables"""
+    load_env_vars()
+
+    config = {
+        # Request and SQL timing behind /metrics
+        "enabled": os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes"),
+    }
+
+    return config
+
+def get_tracing_config():
+    """Get request tracing and slow-query log configuration from environment variables"""
+    load_env_vars()
+
+    config = {
+        # Span trees and Server-Timing headers per request
+        "enabled": os.getenv("TRACING_ENABLED", "true").lower() in ("1", "true", "yes"),
+        # Requests at least this slow keep their span tree for /api/admin/traces
+        "slow_request_ms": float(os.getenv("TRACE_SLOW_REQUEST_MS", "1000")),
+        "keep": max(int(os.getenv("TRACE_KEEP", "50")), 1),
+        # Statements at least this slow are logged, a sampled fraction of them
+        "slow_query_ms": float(os.getenv("SLOW_QUERY_MS", "200")),
+        "slow_query_sample_rate": min(max(float(os.getenv("SLOW_QUERY_SAMPLE_RATE", "1")), 0.0), 1.0),
+    }
+
+    return config
+
+# Default TTLs (seconds) for the cached endpoints; override with CACHE_TTL_<NAME>
+_CACHE_TTL_DEFAULTS = {
+    "data": 3600,
+    "company_projects_top": 600,
+    "company_projects": 600,
+    "bid_strategy": 600,
+    "head_to_head": 600,
+    "company_dashboard": 600,
+}
+
+def get_cache_config():
+    """Get response cache configuration from environment variables"""
+    load_env_vars()
+
+    enabled = os.getenv("CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    ttls = {
+        name: float(os.getenv(f"CACHE_TTL_{name.upper()}", str(default))) if enabled else 0.0
+        for name, default in _CACHE_TTL_DEFAULTS.items()
+    }
+
+    config = {
+        "enabled": enabled,
+        "max_bytes": int(float(os.getenv("CACHE_MAX_MB", "64")) * 1024 * 1024),
+        "ttls": ttls,
+    }
+
+    return config
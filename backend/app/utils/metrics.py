@@ -0,0 +1,211 @@
+# app/utils/metrics.py
+"""
+Process metrics in the Prometheus text format.
+
+A small in-process registry of counters and histograms, cheap enough to
+leave on in production: an observation is a bisect over the bucket bounds
+and two additions under a per-metric lock. Rendering happens only when
+/metrics is scraped.
+
+- `MetricsMiddleware` times every HTTP request per route template, method
+  and status, and counts response bytes (streamed bodies included).
+- The pooled connections (see `InstrumentedConnection` in app/database.py)
+  time execute and fetch calls per query name and backend (the primary or
+  a read replica) and count the rows fetched.
+
+A query is named after the innermost app function that issued it, as
+`module.function` (e.g. `winrates._load_bid_strategy`). Statements run
+through the generic helpers (fetch_all, fetch_rowset, ...) are named after
+the route handler of the current request instead.
+"""
+import os
+import sys
+import math
+import time
+import threading
+import contextvars
+from bisect import bisect_left
+
+# Request latency: 1ms .. 30s
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# SQL time: 0.1ms .. 30s
+DB_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Response sizes: 256B .. 64MB in powers of 4
+SIZE_BUCKETS = tuple(256 * 4 ** power for power in range(10))
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in sorted(values):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+class Histogram:
+    """Cumulative histogram with fixed bucket upper bounds and labels"""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}   # labels -> [per-bucket counts (+Inf last), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            child = self._values.get(labels)
+            if child is None:
+                child = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            child[0][index] += 1
+            child[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            values = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+        for labels, counts, total in sorted(values):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = _format_labels(self.labelnames, labels, ("le", _format_value(float(bound))))
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+def render_family(name, metric_type, documentation, samples, labelnames=()):
+    """Render a gauge or counter family from (label values, value) pairs collected at scrape time"""
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {metric_type}"]
+    for labels, value in samples:
+        lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+    return lines
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency",
+    ("method", "route", "status"), LATENCY_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "HTTP response body size",
+    ("method", "route"), SIZE_BUCKETS,
+)
+DB_DURATION = Histogram(
+    "db_query_duration_seconds", "Time spent in cursor execute and fetch calls",
+    ("query", "phase", "backend"), DB_BUCKETS,
+)
+DB_ROWS = Counter("db_query_rows_total", "Rows fetched", ("query", "backend"))
+
+METRICS = [REQUEST_DURATION, RESPONSE_SIZE, DB_DURATION, DB_ROWS]
+
+def render_metrics(extra_lines=()):
+    """Render every registered metric plus scrape-time families as exposition text"""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    lines.extend(extra_lines)
+    return "\n".join(lines) + "\n"
+
+# Scope of the HTTP request being handled; run_db copies it into the worker thread
+_request_scope = contextvars.ContextVar("request_scope", default=None)
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+# Modules whose functions run statements on behalf of others
+_GENERIC_FILES = tuple(
+    os.path.join(_APP_DIR, path) for path in ("database.py", os.path.join("utils", "serialization.py"), os.path.join("utils", "metrics.py"))
+)
+_names = {}
+
+def _code_name(code):
+    name = _names.get(code)
+    if name is None:
+        name = _names[code] = f"{os.path.splitext(os.path.basename(code.co_filename))[0]}.{code.co_name}"
+    return name
+
+def query_name():
+    """Name the statement about to run after its issuing function or the current route handler"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        code = frame.f_code
+        if (code.co_filename.startswith(_APP_DIR) and not code.co_filename.startswith(_GENERIC_FILES)
+                and not code.co_name.startswith("<")):
+            return _code_name(code)
+        frame = frame.f_back
+
+    scope = _request_scope.get()
+    endpoint = scope.get("endpoint") if scope is not None else None
+    if endpoint is not None:
+        # Past the cache / fast_json wrappers to the handler itself
+        while hasattr(endpoint, "__wrapped__"):
+            endpoint = endpoint.__wrapped__
+        return _code_name(endpoint.__code__) if hasattr(endpoint, "__code__") else endpoint.__name__
+    return "unknown"
+
+def observe_db(name, phase, seconds, rows=None, backend="primary"):
+    DB_DURATION.observe((name, phase, backend), seconds)
+    if rows:
+        DB_ROWS.inc((name, backend), rows)
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and response size per route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        token = _request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_scope.reset(token)
+            # Route templates keep the label set bounded; unknown paths share one label
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            REQUEST_DURATION.observe((scope["method"], path, str(status)), time.perf_counter() - started)
+            RESPONSE_SIZE.observe((scope["method"], path), size)
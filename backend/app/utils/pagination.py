@@ -0,0 +1,41 @@
+# app/utils/pagination.py
+"""
+Opaque cursors for keyset pagination.
+
+A cursor is the sort key of the last row a client has seen, plus whatever
+the endpoint needs to resume, serialized as URL-safe base64 JSON. Key
+values are kept as text so they round-trip exactly (numeric, dates) and
+Postgres coerces them back to the column types.
+"""
+import json
+import base64
+from fastapi import HTTPException
+
+def encode_cursor(state):
+    """Serialize a JSON-compatible dict into an opaque cursor string"""
+    raw = json.dumps(state, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor):
+    """
+    Parse a cursor produced by encode_cursor.
+
+    Raises:
+        HTTPException: 400 if the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+    if not isinstance(state, dict):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+    return state
+
+def next_page_headers(request, cursor):
+    """Build X-Next-Cursor and Link headers pointing at the next page"""
+    next_url = request.url.include_query_params(cursor=cursor)
+    return {
+        "X-Next-Cursor": cursor,
+        "Link": f'<{next_url}>; rel="next"',
+    }
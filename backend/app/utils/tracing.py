@@ -0,0 +1,314 @@
+# app/utils/tracing.py
+"""
+Per-request tracing of SQL statements and response rendering.
+
+`TracingMiddleware` starts a trace for every HTTP request. Work done for the
+request is recorded as a tree of spans below it:
+
+- call      - a function run through run_db (e.g. `winrates._load_bid_strategy`),
+              including the wait for a pooled connection, and the backend
+              it ran on: "primary" or a read replica
+- sql       - one statement: execute plus every fetch on its cursor, with
+              the query name (see app/utils/metrics.py), rows, SQL text
+              and the backend that served it
+- serialize - rendering a response body in app/utils/serialization.py
+
+The trace is summed up in a `Server-Timing` header (db, serialize, total,
+with the backends in the db description), which browser dev tools show next
+to each request. Streaming responses send their headers before the body is
+produced, so only the work done by then is counted. DB time is the sum of
+statement times, which can exceed wall time when statements run
+concurrently (db_snapshot).
+
+Requests slower than TRACE_SLOW_REQUEST_MS keep their span tree in a small
+ring buffer served at /api/admin/traces. Statements slower than
+SLOW_QUERY_MS are logged (a SLOW_QUERY_SAMPLE_RATE fraction of them) with
+their query name, a fingerprint of the parameters and the duration; this
+also covers statements outside requests, such as the background refresh.
+"""
+import time
+import random
+import hashlib
+import logging
+import datetime
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from .env import get_tracing_config
+
+logger = logging.getLogger(__name__)
+
+# Spans recorded per request beyond this are only counted
+MAX_SPANS = 500
+
+_settings = None
+
+def _config():
+    global _settings
+    if _settings is None:
+        _settings = get_tracing_config()
+    return _settings
+
+def _normalize_sql(query):
+    text = query.decode() if isinstance(query, bytes) else str(query)
+    return " ".join(text.split())
+
+def sql_fingerprint(query):
+    """Short hash of the whitespace-normalized SQL text"""
+    return hashlib.sha1(_normalize_sql(query).encode()).hexdigest()[:8]
+
+def _shape(value):
+    if isinstance(value, dict):
+        return "{" + ", ".join(f"{key}: {_shape(item)}" for key, item in value.items()) + "}"
+    if isinstance(value, tuple):
+        return "(" + ", ".join(_shape(item) for item in value) + ")"
+    if isinstance(value, list):
+        return f"list[{len(value)}]"
+    return type(value).__name__
+
+def params_fingerprint(params):
+    """
+    Identify a parameter set without logging its values.
+
+    Returns:
+        Hash of the values followed by their types, e.g. "3f1c0a9b2e4d (str, list[300])"
+    """
+    if params is None:
+        return None
+    return f"{hashlib.sha1(repr(params).encode()).hexdigest()[:12]} {_shape(params)}"
+
+class Span:
+    """A timed piece of work within a trace"""
+
+    __slots__ = ("name", "kind", "start", "duration", "children", "rows", "query", "params", "trace", "backend")
+
+    def __init__(self, name, kind, start, trace=None):
+        self.name = name
+        self.kind = kind
+        self.start = start
+        self.duration = 0.0
+        self.children = []
+        self.rows = 0
+        self.query = None
+        self.params = None
+        self.trace = trace
+        self.backend = None
+
+    def to_dict(self, origin):
+        result = {
+            "name": self.name,
+            "kind": self.kind,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round(self.duration * 1000, 3),
+        }
+        if self.backend is not None:
+            result["backend"] = self.backend
+        if self.kind == "sql":
+            result["rows"] = self.rows
+            result["sql"] = _normalize_sql(self.query)[:300]
+            result["sql_fingerprint"] = sql_fingerprint(self.query)
+            result["params"] = params_fingerprint(self.params)
+        if self.children:
+            result["children"] = [
+                child.to_dict(origin) for child in sorted(self.children, key=lambda child: child.start)
+            ]
+        return result
+
+class Trace:
+    """The span tree and per-kind totals of one HTTP request"""
+
+    def __init__(self, method, path):
+        self.started_at = datetime.datetime.now(datetime.timezone.utc)
+        self.root = Span(f"{method} {path}", "request", time.perf_counter())
+        self.db = 0.0
+        self.serialize = 0.0
+        self.statements = 0
+        self.backends = set()
+        self.spans = 0
+        self.dropped = 0
+        self.status = None
+        self._lock = threading.Lock()
+
+    def add(self, parent, span):
+        # Spans arrive from the event loop and from executor threads
+        with self._lock:
+            if self.spans < MAX_SPANS:
+                self.spans += 1
+                parent.children.append(span)
+            else:
+                self.dropped += 1
+
+    def add_time(self, kind, seconds, statements=0, backend=None):
+        with self._lock:
+            if kind == "db":
+                self.db += seconds
+                self.statements += statements
+                if backend is not None:
+                    self.backends.add(backend)
+            else:
+                self.serialize += seconds
+
+    def server_timing(self):
+        """Server-Timing header value for the work recorded so far"""
+        total = time.perf_counter() - self.root.start
+        # Replica names are host:port/dbname; the description is a quoted string
+        backends = f' on {" + ".join(sorted(self.backends))}' if self.backends else ""
+        return (
+            f'db;dur={self.db * 1000:.1f};desc="{self.statements} statement{"" if self.statements == 1 else "s"}{backends}", '
+            f"serialize;dur={self.serialize * 1000:.1f}, "
+            f"total;dur={total * 1000:.1f}"
+        )
+
+    def to_dict(self):
+        origin = self.root.start
+        return {
+            "request": self.root.name,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.root.duration * 1000, 3),
+            "db_ms": round(self.db * 1000, 3),
+            "serialize_ms": round(self.serialize * 1000, 3),
+            "statements": self.statements,
+            "backends": sorted(self.backends),
+            "dropped_spans": self.dropped,
+            "spans": [child.to_dict(origin) for child in sorted(self.root.children, key=lambda child: child.start)],
+        }
+
+_trace = contextvars.ContextVar("trace", default=None)
+_parent = contextvars.ContextVar("trace_parent", default=None)
+
+_recent = None      # deque of trace dicts, created with the configured length
+_recent_lock = threading.Lock()
+
+def recent_traces(limit=None):
+    """Span trees of the latest slow requests, newest first"""
+    with _recent_lock:
+        traces = list(reversed(_recent)) if _recent is not None else []
+    return traces[:limit] if limit else traces
+
+def clear_traces():
+    with _recent_lock:
+        if _recent is not None:
+            _recent.clear()
+
+def _keep(trace):
+    global _recent
+    summary = trace.to_dict()
+    with _recent_lock:
+        if _recent is None:
+            _recent = deque(maxlen=_config()["keep"])
+        _recent.append(summary)
+
+@contextmanager
+def span(name, kind="call"):
+    """Record the enclosed block as a child of the current span, if a request is being traced"""
+    trace = _trace.get()
+    if trace is None:
+        yield None
+        return
+
+    parent = _parent.get() or trace.root
+    current = Span(name, kind, time.perf_counter())
+    token = _parent.set(current)
+    try:
+        yield current
+    finally:
+        _parent.reset(token)
+        current.duration = time.perf_counter() - current.start
+        trace.add(parent, current)
+        # Nested renders (fast path falling back to the generic one) count once
+        if kind == "serialize" and parent.kind != "serialize":
+            trace.add_time("serialize", current.duration)
+
+def record_serialize(name, seconds):
+    """Record rendering time measured by the caller (e.g. interleaved with fetches)"""
+    trace = _trace.get()
+    if trace is None:
+        return
+    parent = _parent.get() or trace.root
+    current = Span(name, "serialize", time.perf_counter() - seconds)
+    current.duration = seconds
+    trace.add(parent, current)
+    if parent.kind != "serialize":
+        trace.add_time("serialize", seconds)
+
+def start_statement(name, query, params, seconds, backend=None):
+    """
+    Record an executed statement.
+
+    Args:
+        backend: Name of the server that ran it ("primary" or a replica)
+
+    Returns:
+        Span to pass to extend_statement()/finish_statement(), or None when
+        tracing is disabled
+    """
+    if not _config()["enabled"]:
+        return None
+    statement = Span(name, "sql", time.perf_counter() - seconds)
+    statement.duration = seconds
+    statement.query = query
+    statement.params = params
+    statement.backend = backend
+
+    trace = _trace.get()
+    if trace is not None:
+        statement.trace = trace
+        trace.add(_parent.get() or trace.root, statement)
+        trace.add_time("db", seconds, statements=1, backend=backend)
+    return statement
+
+def extend_statement(statement, seconds, rows):
+    """Add a fetch to a statement"""
+    statement.duration += seconds
+    statement.rows += rows
+    if statement.trace is not None:
+        statement.trace.add_time("db", seconds)
+
+def finish_statement(statement):
+    """Log the statement if it was slow (sampled) once its cursor moves on or closes"""
+    config = _config()
+    seconds = statement.duration
+    if seconds * 1000 < config["slow_query_ms"] or random.random() >= config["slow_query_sample_rate"]:
+        return
+    where = f" in {statement.trace.root.name}" if statement.trace is not None else ""
+    logger.warning(
+        f"Slow query {statement.name}{where}: {seconds * 1000:.1f} ms, {statement.rows} rows, "
+        f"sql={sql_fingerprint(statement.query)} params={params_fingerprint(statement.params)}"
+    )
+
+class TracingMiddleware:
+    """ASGI middleware tracing each request and adding a Server-Timing header"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(scope["method"], scope["path"])
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                trace.status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                # Let the cross-origin frontend read it through the Resource Timing API
+                headers.append((b"timing-allow-origin", b"*"))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = _trace.set(trace)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _trace.reset(token)
+            trace.root.duration = time.perf_counter() - trace.root.start
+            route = scope.get("route")
+            if getattr(route, "path", None):
+                trace.root.name = f"{scope['method']} {route.path}"
+            if trace.root.duration * 1000 >= _config()["slow_request_ms"]:
+                _keep(trace)
@@ -0,0 +1,306 @@
+# benchmarks/endpoints.py
+"""
+Time every endpoint of the projects, search and winrates routers.
+
+Runs against a live server, usually on a dataset made with
+benchmarks/generate_dataset.py. Companies are picked from the data at
+three activity levels -- the busiest bidder, a median one and one near the
+tail -- and every company-specific endpoint is timed for each, since the
+skew makes their costs differ by orders of magnitude.
+
+For each case the script reports latency percentiles, the rows in the
+response (list items, or the longest list in an object, or NDJSON lines),
+rows per second at the median latency and the response size. The
+database backends that served the requests (primary or read replicas, from
+the Server-Timing header) are saved with each case. The suite
+refuses to run if a route in those routers has no case here, so new
+endpoints have to be added to CASES.
+
+Cached endpoints answer from the response cache after the first request.
+By default the cache is cleared (DELETE /api/admin/cache) before every
+request so the numbers are cold; --warm keeps it.
+
+Results are saved as JSON. --baseline compares with an earlier file and
+exits non-zero if any case's p50 or p95 got slower by more than
+--threshold (and by more than --min-delta-ms, so jitter on millisecond
+endpoints does not count).
+
+Usage:
+    uvicorn main:app --port 8000
+    python -m benchmarks.endpoints --repeat 20 --output results/10k.json
+    python -m benchmarks.endpoints --output new.json --baseline results/10k.json
+"""
+import re
+import sys
+import json
+import argparse
+import datetime
+import platform
+import statistics
+import subprocess
+import time
+
+import httpx
+
+from app.database import db_connection, close_db_pool
+from app.routers import projects, search, winrates
+from benchmarks.event_loop_latency import percentile
+
+# (name, method, path, body); {tin}, {competitor_tin}, {tins} and {search} are filled in per company
+CASES = [
+    ("data", "GET", "/api/data", None),
+    ("data-by-year", "GET", "/api/data?granularity=year", None),
+    ("data-weekly-downsampled", "GET", "/api/data?granularity=week&max_points=200", None),
+    ("company-projects-top", "GET", "/api/company-projects?limit=20", None),
+    ("search-companies", "GET", "/api/search-companies?query={search}", None),
+    ("company-projects", "GET", "/api/company-projects/{tin}", None),
+    ("company-projects-page", "GET", "/api/company-projects/{tin}?limit=100", None),
+    ("company-projects-stream", "GET", "/api/company-projects/{tin}?stream=true", None),
+    ("competitor-projects", "GET", "/api/competitor-projects?company_tin={tin}&competitor_tin={competitor_tin}", None),
+    ("competitor-projects-batch", "POST", "/api/competitor-projects",
+     {"company_tin": "{tin}", "competitor_tins": "{competitor_tins}", "include_summary": True}),
+    ("adjacent-companies", "GET", "/api/adjacent-companies/{tin}", None),
+    ("head-to-head", "GET", "/api/head-to-head?company_tin={tin}&top_n=20", None),
+    ("bid-strategy", "GET", "/api/bid-strategy?company_tin={tin}", None),
+    ("bid-ratio-distribution", "GET", "/api/bid-ratio-distribution?company_tin={tin}", None),
+    ("bid-ratio-quantiles", "GET", "/api/bid-ratio-quantiles?company_tin={tin}", None),
+    ("company-bids-analysis", "POST", "/api/company-bids-analysis", {"company_tins": "{tins}"}),
+    ("company-bids-analysis-month", "POST", "/api/company-bids-analysis", {"company_tins": "{tins}", "group_by": "month"}),
+    ("company-bids-analysis-downsampled", "POST", "/api/company-bids-analysis?max_points=2000", {"company_tins": "{tins}"}),
+]
+
+COMPANY_LEVELS = ("busiest", "median", "tail")
+
+def _route_paths():
+    paths = set()
+    for module in (projects, search, winrates):
+        for route in module.router.routes:
+            for method in route.methods:
+                paths.add((method, route.path))
+    return paths
+
+def check_coverage():
+    """Raise if a route of the benchmarked routers has no case"""
+    covered = {(method, path.split("?")[0]) for _, method, path, _ in CASES}
+    covered = {(method, path.replace("{tin}", "{company_tin}")) for method, path in covered}
+    missing = sorted(_route_paths() - covered)
+    if missing:
+        raise SystemExit(f"No benchmark case for: {', '.join(f'{m} {p}' for m, p in missing)}")
+
+def pick_companies(conn):
+    """
+    Choose the busiest, median and tail companies by bids, each with its
+    most frequent co-bidder.
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        WITH ranked AS (
+            SELECT tin, company, total_bids,
+                   ROW_NUMBER() OVER (ORDER BY total_bids DESC, tin) AS position,
+                   COUNT(*) OVER () AS companies
+            FROM public_data.company_bid_summary
+        )
+        SELECT tin, company, total_bids FROM ranked
+        WHERE position IN (1, GREATEST(companies / 2, 1), GREATEST(companies * 9 / 10, 1))
+        ORDER BY position
+        """
+    )
+    rows = cursor.fetchall()
+    if len(rows) < len(COMPANY_LEVELS):
+        raise SystemExit("company_bid_summary is empty; run python manage.py refresh-summaries first")
+
+    companies = {}
+    for level, row in zip(COMPANY_LEVELS, rows):
+        cursor.execute(
+            """
+            SELECT b.tin
+            FROM public_data.thai_project_bid_info a
+            JOIN public_data.thai_project_bid_info b ON a.project_id = b.project_id
+            WHERE a.tin = %s AND b.tin <> a.tin
+            GROUP BY b.tin
+            ORDER BY COUNT(*) DESC, b.tin
+            LIMIT 20
+            """,
+            (row["tin"],)
+        )
+        competitors = [competitor["tin"] for competitor in cursor.fetchall()] or [row["tin"]]
+        companies[level] = {
+            "tin": row["tin"],
+            "competitor_tin": competitors[0],
+            "competitor_tins": competitors,
+            "search": row["company"][:12],
+            "total_bids": row["total_bids"],
+        }
+    cursor.close()
+    return companies
+
+def _fill(template, company):
+    if isinstance(template, dict):
+        return {key: _fill(value, company) for key, value in template.items()}
+    if template == "{tins}":
+        return [company["tin"]]
+    if template == "{competitor_tins}":
+        return company["competitor_tins"]
+    if isinstance(template, str):
+        return template.format(**company)
+    return template
+
+def count_rows(response):
+    """Rows in a response: list items, the longest list in an object, or NDJSON lines"""
+    if response.headers.get("content-type", "").startswith("application/x-ndjson"):
+        return response.content.count(b"\n")
+    payload = response.json()
+    if isinstance(payload, list):
+        return len(payload)
+    if isinstance(payload, dict):
+        lengths = [len(value) for value in payload.values() if isinstance(value, list)]
+        return max(lengths) if lengths else 1
+    return 1
+
+# db;dur=...;desc="6 statements on primary + replica:5432/projects"
+_BACKENDS = re.compile(r'db;[^,]*desc="[^"]* on ([^"]+)"')
+
+def served_by(response):
+    """Database backends named in a response's Server-Timing header"""
+    match = _BACKENDS.search(response.headers.get("server-timing", ""))
+    return match.group(1).split(" + ") if match else []
+
+def run_case(client, method, path, body, args):
+    samples, statuses, cache_hits, backends = [], {}, 0, {}
+    response = None
+    for iteration in range(args.warmup + args.repeat):
+        if not args.warm:
+            client.delete("/api/admin/cache")
+        started = time.perf_counter()
+        response = client.request(method, path, json=body)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if iteration < args.warmup:
+            continue
+        samples.append(elapsed_ms)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        cache_hits += response.headers.get("x-cache") == "HIT"
+        for backend in served_by(response):
+            backends[backend] = backends.get(backend, 0) + 1
+
+    rows = count_rows(response) if response.status_code == 200 else 0
+    p50 = percentile(samples, 50)
+    return {
+        "method": method,
+        "path": path,
+        "count": len(samples),
+        "statuses": statuses,
+        "cache_hits": cache_hits,
+        "backends": backends,
+        "p50_ms": round(p50, 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "p99_ms": round(percentile(samples, 99), 3),
+        "max_ms": round(max(samples), 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "rows": rows,
+        "rows_per_s": round(rows / (p50 / 1000), 1) if p50 else None,
+        "bytes": len(response.content),
+    }
+
+def _dataset(conn):
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        SELECT (SELECT COUNT(*) FROM public_data.thai_govt_project) AS projects,
+               (SELECT COUNT(*) FROM public_data.thai_project_bid_info) AS bids
+        """
+    )
+    row = dict(cursor.fetchone())
+    cursor.close()
+    return row
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline, threshold, min_delta_ms):
+    """Print p50/p95 changes against a baseline run; return the number of regressions"""
+    regressions = 0
+    print(f"\n{'case':<40} {'p50 before':>11} {'p50 after':>10} {'p95 before':>11} {'p95 after':>10}")
+    for name, after in results["cases"].items():
+        before = baseline["cases"].get(name)
+        if before is None:
+            continue
+        slower = [
+            metric for metric in ("p50_ms", "p95_ms")
+            if before[metric]
+            and after[metric] > before[metric] * (1 + threshold)
+            and after[metric] - before[metric] > min_delta_ms
+        ]
+        regressions += bool(slower)
+        print(
+            f"{name:<40} {before['p50_ms']:>11.2f} {after['p50_ms']:>10.2f} "
+            f"{before['p95_ms']:>11.2f} {after['p95_ms']:>10.2f}{'  REGRESSION' if slower else ''}"
+        )
+    return regressions
+
+def main(args):
+    check_coverage()
+    with db_connection() as conn:
+        companies = pick_companies(conn)
+        dataset = _dataset(conn)
+
+    results = {
+        "meta": {
+            "started_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "base_url": args.base_url,
+            "repeat": args.repeat,
+            "warm_cache": args.warm,
+            "dataset": dataset,
+            "companies": companies,
+        },
+        "cases": {},
+    }
+
+    print(f"{'case':<40} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'rows':>8} {'rows/s':>11} {'bytes':>10}")
+    with httpx.Client(base_url=args.base_url, timeout=args.timeout) as client:
+        for name, method, path, body in CASES:
+            specific = "{" in path or body is not None
+            for level in COMPANY_LEVELS if specific else (None,):
+                company = companies[level] if level else {}
+                case = f"{name}[{level}]" if level else name
+                result = run_case(client, method, _fill(path, company), _fill(body, company), args)
+                results["cases"][case] = result
+                print(
+                    f"{case:<40} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} "
+                    f"{result['rows']:>8} {result['rows_per_s'] or 0:>11.1f} {result['bytes']:>10}"
+                )
+                if any(status >= 500 for status in result["statuses"]):
+                    print(f"  server errors: {result['statuses']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"{regressions} case(s) slower than the baseline by more than {args.threshold:.0%}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--repeat", type=int, default=10, help="Timed requests per case")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed requests per case")
+    parser.add_argument("--warm", action="store_true", help="Keep the response cache between requests")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Earlier results file to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown before a case counts as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="Ignore slowdowns smaller than this")
+    try:
+        main(parser.parse_args())
+    finally:
+        close_db_pool()
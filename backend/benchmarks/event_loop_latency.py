@@ -0,0 +1,135 @@
+# benchmarks/event_loop_latency.py
+"""
+Measure how cheap endpoints behave while heavy analytics queries are running.
+
+The script runs two phases against a live server:
+
+1. idle   - only the cheap endpoints (/health, /api/search-companies) are probed
+2. loaded - the same probes run while several workers hammer the heavy
+            analytics endpoints (head-to-head, bid-strategy, bids analysis)
+
+If database work blocks the event loop, p99 latency of the cheap endpoints
+jumps in the loaded phase. With the executor-backed data layer it should stay
+roughly flat.
+
+Usage:
+    uvicorn main:app --port 8000
+    python -m benchmarks.event_loop_latency --base-url http://localhost:8000 \\
+        --company-tin 0105551234567 --duration 20
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+CHEAP_ENDPOINTS = [
+    ("health", "GET", "/health", None),
+    ("search-companies", "GET", "/api/search-companies?query={search}", None),
+]
+
+HEAVY_ENDPOINTS = [
+    ("head-to-head", "GET", "/api/head-to-head?company_tin={tin}&top_n=20", None),
+    ("bid-strategy", "GET", "/api/bid-strategy?company_tin={tin}", None),
+    ("company-bids-analysis", "POST", "/api/company-bids-analysis", {"company_tins": ["{tin}"]}),
+]
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of floats"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(int(round(pct / 100.0 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+def summarize(samples):
+    """Return latency percentiles (ms) for a list of samples"""
+    return {
+        "count": len(samples),
+        "p50_ms": percentile(samples, 50),
+        "p95_ms": percentile(samples, 95),
+        "p99_ms": percentile(samples, 99),
+        "max_ms": max(samples) if samples else None,
+        "mean_ms": statistics.fmean(samples) if samples else None,
+    }
+
+def _format(template, args):
+    if isinstance(template, dict):
+        return {k: _format(v, args) for k, v in template.items()}
+    if isinstance(template, list):
+        return [_format(v, args) for v in template]
+    if isinstance(template, str):
+        return template.format(tin=args.company_tin, search=args.search)
+    return template
+
+async def _request(client, method, path, body):
+    started = time.perf_counter()
+    response = await client.request(method, path, json=body)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    return response.status_code, elapsed_ms
+
+async def probe_cheap(client, args, stop_at, samples):
+    """Hit the cheap endpoints at a fixed interval until stop_at"""
+    while time.perf_counter() < stop_at:
+        for name, method, path, body in CHEAP_ENDPOINTS:
+            status, elapsed_ms = await _request(client, method, _format(path, args), _format(body, args))
+            if status < 500:
+                samples.setdefault(name, []).append(elapsed_ms)
+        await asyncio.sleep(args.probe_interval)
+
+async def hammer_heavy(client, args, stop_at, samples):
+    """Issue heavy analytics requests back to back until stop_at"""
+    index = 0
+    while time.perf_counter() < stop_at:
+        name, method, path, body = HEAVY_ENDPOINTS[index % len(HEAVY_ENDPOINTS)]
+        index += 1
+        status, elapsed_ms = await _request(client, method, _format(path, args), _format(body, args))
+        samples.setdefault(name, []).append(elapsed_ms)
+
+async def run_phase(args, heavy_workers):
+    cheap_samples, heavy_samples = {}, {}
+    limits = httpx.Limits(max_connections=heavy_workers + 4)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        stop_at = time.perf_counter() + args.duration
+        tasks = [probe_cheap(client, args, stop_at, cheap_samples)]
+        tasks += [hammer_heavy(client, args, stop_at, heavy_samples) for _ in range(heavy_workers)]
+        await asyncio.gather(*tasks)
+    return {
+        "cheap": {name: summarize(values) for name, values in cheap_samples.items()},
+        "heavy": {name: summarize(values) for name, values in heavy_samples.items()},
+    }
+
+def print_report(results):
+    print(f"{'phase':<8} {'endpoint':<24} {'n':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for phase, data in results.items():
+        for group in ("cheap", "heavy"):
+            for name, stats in data[group].items():
+                print(
+                    f"{phase:<8} {name:<24} {stats['count']:>6} "
+                    f"{stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} "
+                    f"{stats['p99_ms']:>9.2f} {stats['max_ms']:>9.2f}"
+                )
+
+async def main(args):
+    results = {
+        "idle": await run_phase(args, heavy_workers=0),
+        "loaded": await run_phase(args, heavy_workers=args.heavy_workers),
+    }
+    print_report(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--company-tin", required=True, help="TIN of a company with many bids")
+    parser.add_argument("--search", default="บริษัท", help="Query string for /api/search-companies")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds per phase")
+    parser.add_argument("--heavy-workers", type=int, default=8, help="Concurrent heavy request loops")
+    parser.add_argument("--probe-interval", type=float, default=0.05, help="Seconds between cheap probes")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,296 @@
+# benchmarks/generate_dataset.py
+"""
+Fill a local database with a synthetic Thai procurement dataset.
+
+Writes `public_data.thai_govt_project` and `public_data.thai_project_bid_info`
+(creating them with the columns the API reads if they do not exist) with
+the skew of the real data:
+
+- bidders per project follow a Zipf law: most projects have one to three
+  bidders, a few have dozens
+- companies are picked by a Zipf popularity weight, so a handful of
+  contractors bid on a large share of all projects
+- each company has its own price level; the lowest bid wins, so wins
+  concentrate on the aggressive bidders rather than spreading evenly
+- reference prices are log-normal, departments Zipf-weighted, and contract
+  dates lean towards the end of the Thai fiscal year (July to September)
+
+The same --seed and scale always produce the same data. Rows are streamed
+with COPY in chunks, so 10M projects need no more memory than 10k.
+
+By default the tables are emptied first and the change-capture triggers are
+disabled during the load; the derived stores' refresh state is reset so the
+next refresh rebuilds them (pass --refresh to do it right away, and restart
+a running server afterwards). With --append the rows are added on top of
+the existing ones and captured as changes, for timing incremental refreshes.
+
+Usage:
+    python -m benchmarks.generate_dataset --scale 10k --refresh
+    python -m benchmarks.generate_dataset --projects 250000 --companies 8000 --seed 7
+    python -m benchmarks.generate_dataset --scale 1m --append
+"""
+import io
+import argparse
+import datetime
+import logging
+import time
+
+import numpy as np
+
+from app.database import db_connection, close_db_pool
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger("generate_dataset")
+
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+
+# Only the columns the API reads; existing tables may have more
+TABLES_DDL = """
+    CREATE SCHEMA IF NOT EXISTS public_data;
+    CREATE TABLE IF NOT EXISTS public_data.thai_govt_project (
+        project_id TEXT PRIMARY KEY,
+        project_name TEXT,
+        dept_name TEXT,
+        price_build NUMERIC,
+        sum_price_agree NUMERIC,
+        transaction_date DATE,
+        contract_date DATE,
+        winner TEXT,
+        winner_tin TEXT
+    );
+    CREATE TABLE IF NOT EXISTS public_data.thai_project_bid_info (
+        project_id TEXT,
+        company TEXT,
+        tin TEXT,
+        bid NUMERIC
+    );
+"""
+
+PROJECT_COLUMNS = (
+    "project_id", "project_name", "dept_name", "price_build", "sum_price_agree",
+    "transaction_date", "contract_date", "winner", "winner_tin",
+)
+BID_COLUMNS = ("project_id", "company", "tin", "bid")
+
+DEPARTMENTS = [
+    "กรมทางหลวง", "กรมทางหลวงชนบท", "กรมชลประทาน", "กรมโยธาธิการและผังเมือง",
+    "การประปาส่วนภูมิภาค", "การไฟฟ้าส่วนภูมิภาค", "กรมเจ้าท่า", "กรมป้องกันและบรรเทาสาธารณภัย",
+    "สำนักงานปลัดกระทรวงสาธารณสุข", "สำนักงานคณะกรรมการการศึกษาขั้นพื้นฐาน",
+]
+WORKS = [
+    "ก่อสร้างถนนคอนกรีตเสริมเหล็ก", "ซ่อมสร้างผิวทางแอสฟัลต์ติก", "ก่อสร้างอาคารเรียน",
+    "ขุดลอกคลอง", "ก่อสร้างระบบประปาหมู่บ้าน", "จัดซื้อครุภัณฑ์คอมพิวเตอร์",
+    "ก่อสร้างสะพานคอนกรีตเสริมเหล็ก", "ปรับปรุงระบบไฟฟ้าแสงสว่าง", "ก่อสร้างรางระบายน้ำ",
+]
+COMPANY_FORMS = [("บริษัท ", " จำกัด"), ("ห้างหุ้นส่วนจำกัด ", ""), ("บริษัท ", " จำกัด (มหาชน)")]
+COMPANY_WORDS = [
+    "ก่อสร้าง", "วิศวกรรม", "รุ่งเรือง", "เจริญ", "พัฒนา", "สยาม", "ไทย", "โยธา", "การโยธา",
+    "ทวีทรัพย์", "มั่นคง", "ศรีสุข", "อินเตอร์", "เอ็นจิเนียริ่ง", "คอนสตรัคชั่น", "ซัพพลาย",
+]
+
+START_DATE = datetime.date(2015, 1, 1)
+END_DATE = datetime.date(2024, 12, 31)
+
+# Monthly weight of contract dates, January..December (fiscal year ends in September)
+MONTH_WEIGHTS = np.array([0.7, 0.8, 1.0, 0.9, 0.9, 1.1, 1.4, 1.6, 2.0, 0.6, 0.7, 0.8])
+
+def zipf_weights(count, exponent):
+    """Normalized Zipf weights 1/rank^exponent for ranks 1..count"""
+    weights = 1.0 / np.arange(1, count + 1) ** exponent
+    return weights / weights.sum()
+
+def make_companies(rng, count):
+    """Names, 13-digit TINs, popularity weights and price levels of the companies"""
+    names = []
+    for index in range(count):
+        prefix, suffix = COMPANY_FORMS[index % len(COMPANY_FORMS)]
+        words = rng.choice(COMPANY_WORDS, size=2, replace=False)
+        names.append(f"{prefix}{words[0]}{words[1]} {index + 1}{suffix}")
+    tins = np.array([f"0{105500000000 + index:012d}" for index in range(count)], dtype=object)
+
+    # Popular companies are shuffled so TIN order says nothing about activity
+    popularity = rng.permutation(zipf_weights(count, 1.05))
+    # Below 1 bids under the reference price on average; the spread decides who wins
+    price_level = rng.lognormal(mean=np.log(0.94), sigma=0.05, size=count)
+    return np.array(names, dtype=object), tins, popularity, price_level
+
+def make_departments(rng, count):
+    names = list(DEPARTMENTS) + [f"องค์การบริหารส่วนตำบล {index}" for index in range(1, max(count - len(DEPARTMENTS), 0) + 1)]
+    names = np.array(names[:count], dtype=object)
+    return names, zipf_weights(len(names), 1.2)
+
+def _dates(rng, size):
+    days = np.arange((END_DATE - START_DATE).days + 1)
+    months = (np.datetime64(START_DATE) + days).astype("datetime64[M]").astype(int) % 12
+    weights = MONTH_WEIGHTS[months]
+    return np.datetime64(START_DATE) + rng.choice(days, size=size, p=weights / weights.sum())
+
+def _money(values):
+    return np.char.mod("%.2f", np.round(values, 2)).astype(object)
+
+def _optional(values, missing):
+    values = values.astype(object)
+    values[missing] = "\\N"
+    return values
+
+def generate_chunk(rng, first_index, size, companies, departments, max_bidders):
+    """
+    Generate one chunk of projects and their bids.
+
+    Returns:
+        (project columns, bid columns), each a list of string arrays
+    """
+    names, tins, popularity, price_level = companies
+    dept_names, dept_weights = departments
+
+    project_ids = np.char.mod("%d", np.arange(first_index, first_index + size) + 60_000_000_000).astype(object)
+    bidder_counts = np.minimum(rng.zipf(1.8, size), max_bidders)
+
+    # Draw bidders by popularity; a company drawn twice for a project bids once
+    bid_project = np.repeat(np.arange(size), bidder_counts)
+    bid_company = rng.choice(len(names), size=len(bid_project), p=popularity)
+    order = np.lexsort((bid_company, bid_project))
+    bid_project, bid_company = bid_project[order], bid_company[order]
+    keep = np.ones(len(bid_project), dtype=bool)
+    keep[1:] = (bid_project[1:] != bid_project[:-1]) | (bid_company[1:] != bid_company[:-1])
+    bid_project, bid_company = bid_project[keep], bid_company[keep]
+
+    price_build = np.clip(rng.lognormal(mean=np.log(1_500_000), sigma=1.4, size=size), 5_000, 5e9)
+    bids = price_build[bid_project] * price_level[bid_company] * rng.normal(1.0, 0.04, size=len(bid_project))
+    bids = np.round(bids, 2)
+
+    # Lowest bid per project wins: first row per project after sorting by (project, bid)
+    order = np.lexsort((bids, bid_project))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = bid_project[order][1:] != bid_project[order][:-1]
+    winning_rows = order[first]
+    winner_company = np.empty(size, dtype=np.int64)
+    winner_company[bid_project[winning_rows]] = bid_company[winning_rows]
+    contract_value = np.empty(size)
+    contract_value[bid_project[winning_rows]] = bids[winning_rows]
+
+    # Some projects are cancelled or still open: no winner and no contract value
+    no_winner = rng.random(size) < 0.02
+    transaction_dates = _dates(rng, size)
+    contract_dates = transaction_dates + rng.integers(0, 60, size=size)
+    no_contract_date = no_winner | (rng.random(size) < 0.05)
+    no_price_build = rng.random(size) < 0.03
+
+    works = np.array(WORKS, dtype=object)[rng.integers(0, len(WORKS), size=size)]
+    project_names = works + " โครงการที่ " + np.char.mod("%d", np.arange(first_index, first_index + size) + 1).astype(object)
+
+    projects = [
+        project_ids,
+        project_names,
+        dept_names[rng.choice(len(dept_names), size=size, p=dept_weights)],
+        _optional(_money(price_build), no_price_build),
+        _optional(_money(contract_value), no_winner),
+        np.datetime_as_string(transaction_dates, unit="D").astype(object),
+        _optional(np.datetime_as_string(contract_dates, unit="D"), no_contract_date),
+        _optional(names[winner_company], no_winner),
+        _optional(tins[winner_company], no_winner),
+    ]
+    bid_rows = [project_ids[bid_project], names[bid_company], tins[bid_company], _money(bids)]
+    return projects, bid_rows
+
+def _copy(cursor, table, columns, values):
+    buffer = io.StringIO()
+    buffer.write("\n".join(map("\t".join, zip(*values))))
+    buffer.write("\n")
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY public_data.{table} ({', '.join(columns)}) FROM STDIN", buffer)
+
+def _reset_derived_state(cursor):
+    # Consumers without state rebuild from scratch on their next refresh
+    cursor.execute("SELECT to_regclass('public_data.analytics_refresh_state') IS NOT NULL AS present")
+    if cursor.fetchone()["present"]:
+        cursor.execute("DELETE FROM public_data.analytics_refresh_state")
+    cursor.execute("SELECT to_regclass('public_data.analytics_change_log') IS NOT NULL AS present")
+    if cursor.fetchone()["present"]:
+        cursor.execute("TRUNCATE public_data.analytics_change_log")
+
+def generate(conn, args):
+    rng = np.random.default_rng(args.seed)
+    companies = make_companies(rng, args.companies)
+    departments = make_departments(rng, args.departments)
+
+    cursor = conn.cursor()
+    cursor.execute(TABLES_DDL)
+    first_index = 0
+    if args.append:
+        cursor.execute("SELECT COUNT(*) AS projects FROM public_data.thai_govt_project")
+        first_index = cursor.fetchone()["projects"]
+        # Same companies as the earlier load, but a fresh stream for the new projects
+        rng = np.random.default_rng([args.seed, first_index])
+    else:
+        cursor.execute("TRUNCATE public_data.thai_govt_project, public_data.thai_project_bid_info")
+        for table in ("thai_govt_project", "thai_project_bid_info"):
+            cursor.execute(f"ALTER TABLE public_data.{table} DISABLE TRIGGER USER")
+
+    started = time.monotonic()
+    project_rows = bid_rows = 0
+    for offset in range(0, args.projects, args.chunk_size):
+        size = min(args.chunk_size, args.projects - offset)
+        projects, bids = generate_chunk(rng, first_index + offset, size, companies, departments, args.max_bidders)
+        _copy(cursor, "thai_govt_project", PROJECT_COLUMNS, projects)
+        _copy(cursor, "thai_project_bid_info", BID_COLUMNS, bids)
+        project_rows += size
+        bid_rows += len(bids[0])
+        logger.info(f"{project_rows}/{args.projects} projects, {bid_rows} bids")
+
+    if not args.append:
+        for table in ("thai_govt_project", "thai_project_bid_info"):
+            cursor.execute(f"ALTER TABLE public_data.{table} ENABLE TRIGGER USER")
+        _reset_derived_state(cursor)
+    conn.commit()
+
+    cursor.execute("ANALYZE public_data.thai_govt_project")
+    cursor.execute("ANALYZE public_data.thai_project_bid_info")
+    conn.commit()
+    cursor.close()
+
+    return {
+        "projects": project_rows,
+        "bids": bid_rows,
+        "companies": args.companies,
+        "seed": args.seed,
+        "mode": "append" if args.append else "replace",
+        "duration_s": round(time.monotonic() - started, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    size = parser.add_mutually_exclusive_group(required=True)
+    size.add_argument("--scale", choices=sorted(SCALES, key=SCALES.get), help="Number of projects by name")
+    size.add_argument("--projects", type=int, help="Number of projects")
+    parser.add_argument("--companies", type=int, help="Number of companies (default: projects / 40, at least 300)")
+    parser.add_argument("--departments", type=int, default=2000)
+    parser.add_argument("--max-bidders", type=int, default=80, help="Cap on bidders per project")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="Projects per COPY")
+    parser.add_argument("--append", action="store_true", help="Add to the existing rows instead of replacing them")
+    parser.add_argument("--refresh", action="store_true", help="Rebuild the derived stores after loading")
+    args = parser.parse_args()
+    if args.scale:
+        args.projects = SCALES[args.scale]
+    if args.companies is None:
+        args.companies = max(args.projects // 40, 300)
+
+    try:
+        with db_connection() as conn:
+            result = generate(conn, args)
+            logger.info(f"Dataset generated: {result}")
+            if args.refresh:
+                from app.services.change_log import install_change_log
+                from app.services.refresh import ensure_all, refresh_all
+                cursor = conn.cursor()
+                install_change_log(cursor)
+                cursor.close()
+                conn.commit()
+                ensure_all(conn)
+                logger.info(f"Derived stores refreshed: {refresh_all(conn, full=not args.append)}")
+    finally:
+        close_db_pool()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+# benchmarks/head_to_head.py
+"""
+Compare the head-to-head implementations on companies of different sizes.
+
+For each target bid count the script picks the company whose number of bids
+is closest to it. It then times:
+
+- legacy - the original INTERSECT query with a project_id IN-list
+- single - one scan of the company's projects (app/services/h2h.py)
+- graph  - a neighbour lookup in the co-bidding graph (only with --graph)
+
+Before timing, the legacy and single-pass results are checked for equality
+with an unlimited top_n. Ties in the encounter count are ordered by TIN, as
+the legacy query leaves their order undefined. With --graph the graph's
+head-to-head and adjacent-companies rows must also equal the SQL paths,
+in order.
+
+Usage:
+    python -m benchmarks.head_to_head --sizes 10 1000 50000 --repeat 5 [--graph]
+"""
+import argparse
+import json
+import statistics
+import time
+
+from app.database import db_connection, close_db_pool
+from app.services.h2h import load_project_bidders, compute_head_to_head, head_to_head_from_graph
+from app.services.cobid_graph import CoBidGraph, BID_ROWS_SQL, _stream_rows
+from app.routers.search import _load_adjacent_companies
+
+LEGACY_H2H_SQL = """
+    WITH company_projects AS (
+        SELECT DISTINCT project_id
+        FROM public_data.thai_project_bid_info
+        WHERE tin = %s
+    ),
+    project_bidders AS (
+        SELECT
+            b.project_id,
+            b.tin,
+            b.company,
+            p.winner_tin,
+            CASE WHEN b.tin = p.winner_tin THEN 1 ELSE 0 END AS won_bid
+        FROM public_data.thai_project_bid_info b
+        JOIN public_data.thai_govt_project p ON b.project_id = p.project_id
+        WHERE b.project_id IN ({placeholders})
+    ),
+    competitor_encounters AS (
+        SELECT
+            pb.tin AS competitor_tin,
+            pb.company AS competitor,
+            COUNT(DISTINCT pb.project_id) AS encounters
+        FROM project_bidders pb
+        WHERE pb.tin != %s
+        GROUP BY pb.tin, pb.company
+        HAVING COUNT(DISTINCT pb.project_id) > 1
+        ORDER BY encounters DESC
+        LIMIT %s
+    )
+    SELECT
+        ce.competitor_tin,
+        ce.competitor,
+        ce.encounters,
+        SUM(CASE WHEN pb.tin = %s AND pb.won_bid = 1 THEN 1 ELSE 0 END) AS company_wins,
+        SUM(CASE WHEN pb.tin = ce.competitor_tin AND pb.won_bid = 1 THEN 1 ELSE 0 END) AS competitor_wins
+    FROM competitor_encounters ce
+    JOIN project_bidders pb ON (pb.tin = ce.competitor_tin OR pb.tin = %s)
+        AND pb.project_id IN (
+            SELECT project_id FROM project_bidders
+            WHERE tin = ce.competitor_tin
+            INTERSECT
+            SELECT project_id FROM project_bidders
+            WHERE tin = %s
+        )
+    GROUP BY ce.competitor_tin, ce.competitor, ce.encounters
+    ORDER BY ce.encounters DESC
+"""
+
+def legacy_head_to_head(conn, company_tin, top_n):
+    """The pre-existing implementation, kept here as the reference"""
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT project_id FROM public_data.thai_project_bid_info WHERE tin = %s",
+        (company_tin,)
+    )
+    company_projects = [row["project_id"] for row in cursor.fetchall()]
+    if not company_projects:
+        cursor.close()
+        return []
+
+    query = LEGACY_H2H_SQL.format(placeholders=", ".join(["%s"] * len(company_projects)))
+    params = [company_tin] + company_projects + [company_tin, top_n, company_tin, company_tin, company_tin]
+    cursor.execute(query, params)
+    competitors = []
+    for row in cursor.fetchall():
+        row = dict(row)
+        encounters = row["encounters"]
+        win_rate = (row["company_wins"] / encounters * 100) if encounters > 0 else 0
+        row["win_rate_vs_competitor"] = round(win_rate, 2)
+        competitors.append(row)
+    cursor.close()
+    return competitors
+
+def single_pass_head_to_head(conn, company_tin, top_n):
+    return compute_head_to_head(load_project_bidders(conn, company_tin), company_tin, top_n)
+
+def pick_companies(conn, sizes):
+    """Return (target, tin, bids) for the company closest to each target size"""
+    cursor = conn.cursor()
+    picked = []
+    for size in sizes:
+        cursor.execute(
+            """
+            SELECT tin, COUNT(*) AS bids
+            FROM public_data.thai_project_bid_info
+            WHERE tin IS NOT NULL
+            GROUP BY tin
+            ORDER BY ABS(COUNT(*) - %s), tin
+            LIMIT 1
+            """,
+            (size,)
+        )
+        row = cursor.fetchone()
+        if row:
+            picked.append((size, row["tin"], row["bids"]))
+    cursor.close()
+    return picked
+
+def _normalize(competitors):
+    return sorted(
+        (
+            c["competitor_tin"], c["competitor"], int(c["encounters"]),
+            int(c["company_wins"]), int(c["competitor_wins"]), float(c["win_rate_vs_competitor"]),
+        )
+        for c in competitors
+    )
+
+def _time(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return {"median_ms": round(statistics.median(samples), 3), "min_ms": round(min(samples), 3)}
+
+def main(args):
+    results = []
+    with db_connection() as conn:
+        graph = None
+        if args.graph:
+            graph = CoBidGraph()
+            graph.build(_stream_rows(conn, BID_ROWS_SQL))
+
+        for target, tin, bids in pick_companies(conn, args.sizes):
+            legacy_all = legacy_head_to_head(conn, tin, 10 ** 9)
+            single_all = single_pass_head_to_head(conn, tin, 10 ** 9)
+            result = {
+                "target_bids": target,
+                "tin": tin,
+                "bids": bids,
+                "competitors": len(single_all),
+                "identical": _normalize(legacy_all) == _normalize(single_all),
+                "legacy": _time(lambda: legacy_head_to_head(conn, tin, args.top_n), args.repeat),
+                "single": _time(lambda: single_pass_head_to_head(conn, tin, args.top_n), args.repeat),
+            }
+            if graph is not None:
+                adjacent = [(c["tin"], c["company"], c["common_bids"]) for c in _load_adjacent_companies(conn, tin)]
+                result["graph_identical"] = (
+                    head_to_head_from_graph(graph, tin, 10 ** 9) == single_all
+                    and [(n["tin"], n["company"], n["encounters"]) for n in graph.neighbors(tin, limit=20)] == adjacent
+                )
+                result["graph"] = _time(lambda: head_to_head_from_graph(graph, tin, args.top_n), args.repeat)
+            results.append(result)
+
+    print(f"{'target':>8} {'bids':>8} {'same':>5} {'legacy ms':>10} {'single ms':>10} {'graph ms':>10} {'graph same':>10}")
+    for r in results:
+        graph_ms = f"{r['graph']['median_ms']:>10.3f}" if "graph" in r else f"{'-':>10}"
+        graph_same = f"{str(r['graph_identical']):>10}" if "graph" in r else f"{'-':>10}"
+        print(
+            f"{r['target_bids']:>8} {r['bids']:>8} {str(r['identical']):>5} "
+            f"{r['legacy']['median_ms']:>10.3f} {r['single']['median_ms']:>10.3f} {graph_ms} {graph_same}"
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 50000], help="Target bid counts")
+    parser.add_argument("--top-n", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--graph", action="store_true", help="Also time the co-bidding graph lookup")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    try:
+        main(parser.parse_args())
+    finally:
+        close_db_pool()
@@ -0,0 +1,87 @@
+# benchmarks/metrics_overhead.py
+"""
+Measure what the metrics and tracing instrumentation adds per request and
+per statement.
+
+- per statement: `SELECT 1` executed and fetched on a plain connection and
+  on an InstrumentedConnection (query naming, two histogram observations,
+  a row counter and a trace statement checked against the slow-query log)
+- per request: GET /health through the app without middleware, with
+  MetricsMiddleware, and with MetricsMiddleware plus TracingMiddleware
+  (in-process, no network)
+
+Usage:
+    python -m benchmarks.metrics_overhead [--statements 20000] [--requests 5000]
+"""
+import argparse
+import time
+
+import psycopg2
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.database import InstrumentedConnection
+from app.utils.env import get_db_config
+from app.utils.metrics import MetricsMiddleware
+from app.utils.tracing import TracingMiddleware
+
+def _connect(connection_factory=None):
+    config = get_db_config()
+    return psycopg2.connect(
+        host=config["host"], port=config["port"], database=config["dbname"],
+        user=config["user"], password=config["password"], connection_factory=connection_factory,
+    )
+
+def time_statements(conn, count):
+    cursor = conn.cursor()
+    started = time.perf_counter()
+    for _ in range(count):
+        cursor.execute("SELECT 1")
+        cursor.fetchall()
+    elapsed = time.perf_counter() - started
+    cursor.close()
+    conn.rollback()
+    return elapsed / count * 1e6
+
+def time_requests(middlewares, count):
+    app = FastAPI()
+    for middleware in middlewares:
+        app.add_middleware(middleware)
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    with TestClient(app) as client:
+        for _ in range(200):
+            client.get("/health")
+        started = time.perf_counter()
+        for _ in range(count):
+            client.get("/health")
+        return (time.perf_counter() - started) / count * 1e6
+
+def main(args):
+    plain, instrumented = _connect(), _connect(InstrumentedConnection)
+    try:
+        # Alternate so drift affects both sides equally
+        results = {"plain": [], "instrumented": []}
+        for _ in range(3):
+            results["plain"].append(time_statements(plain, args.statements))
+            results["instrumented"].append(time_statements(instrumented, args.statements))
+    finally:
+        plain.close()
+        instrumented.close()
+    plain_us, instrumented_us = min(results["plain"]), min(results["instrumented"])
+    print(f"statement: {plain_us:.1f} us plain, {instrumented_us:.1f} us instrumented (+{instrumented_us - plain_us:.1f} us)")
+
+    without = min(time_requests((), args.requests) for _ in range(3))
+    with_metrics = min(time_requests((MetricsMiddleware,), args.requests) for _ in range(3))
+    with_tracing = min(time_requests((MetricsMiddleware, TracingMiddleware), args.requests) for _ in range(3))
+    print(f"request:   {without:.1f} us without middleware, {with_metrics:.1f} us with metrics (+{with_metrics - without:.1f} us), "
+          f"{with_tracing:.1f} us with metrics and tracing (+{with_tracing - without:.1f} us)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--statements", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=5000)
+    main(parser.parse_args())
@@ -0,0 +1,201 @@
+# benchmarks/query_plans.py
+"""
+Capture the query plans of every statement the routers issue and compare
+them with a saved baseline.
+
+The app runs in-process on a pool whose connections record each SELECT
+they execute. Every case of benchmarks/endpoints.py is requested once per
+company level (response cache cleared first), so the recorded statements
+are exactly what the projects, search and winrates routes send, with
+representative parameters from the dataset. Each statement is then run
+with EXPLAIN (ANALYZE, BUFFERS) and reduced to:
+
+- shape: the plan tree as node types with their relations, indexes, join
+  types and aggregate strategies (no costs or row counts), plus its
+  fingerprint (hash)
+- total_cost: the planner's estimate for the whole statement
+- buffers: shared blocks hit + read
+- execution_ms: measured time (reported, not compared; too noisy)
+
+Statements are keyed by case and position within the request, so editing a
+query's text still compares it with its previous plan. The run fails when a
+plan's shape changed, or its cost or buffers grew by more than --threshold.
+Plans depend on table sizes and statistics, so baselines are only
+comparable on the same dataset (see benchmarks/generate_dataset.py).
+
+Usage:
+    python -m benchmarks.generate_dataset --scale 1m --refresh
+    python -m benchmarks.query_plans --save plans/1m.json
+    python -m benchmarks.query_plans --baseline plans/1m.json
+"""
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+
+import psycopg2.extensions
+from fastapi.testclient import TestClient
+
+from app.database import db_connection, close_db_pool, init_db_pool
+from benchmarks.endpoints import CASES, COMPANY_LEVELS, pick_companies, _fill, _dataset
+
+_current_case = None
+_statements = {}    # case -> [(template, statement)]
+_lock = threading.Lock()
+
+def _recording_cursor(factory):
+    class RecordingCursor(factory):
+        def execute(self, query, vars=None):
+            case = _current_case
+            if case is not None:
+                text = query.decode() if isinstance(query, bytes) else query
+                if re.match(r"\s*(SELECT|WITH)\b", text, re.IGNORECASE):
+                    statement = self.mogrify(query, vars).decode()
+                    with _lock:
+                        recorded = _statements.setdefault(case, [])
+                        if all(existing != statement for _, existing in recorded):
+                            recorded.append((text, statement))
+            return super().execute(query, vars)
+    return RecordingCursor
+
+_cursor_classes = {}
+
+class RecordingConnection(psycopg2.extensions.connection):
+    """Connection whose cursors record the SELECT statements they run"""
+
+    def cursor(self, *args, **kwargs):
+        factory = kwargs.get("cursor_factory") or self.cursor_factory or psycopg2.extensions.cursor
+        if factory not in _cursor_classes:
+            _cursor_classes[factory] = _recording_cursor(factory)
+        kwargs["cursor_factory"] = _cursor_classes[factory]
+        return super().cursor(*args, **kwargs)
+
+def capture_statements(companies):
+    """Request every endpoint case and return the statements each one ran"""
+    global _current_case
+    # Refresh the derived stores once, and record nothing until that is done
+    os.environ["ANALYTICS_REFRESH_INTERVAL"] = "0"
+    import main
+
+    with TestClient(main.app) as client:
+        while not main.app.state.refresh_task.done():
+            time.sleep(0.1)
+        # The first pass only warms up one-time lookups (store readiness checks)
+        for record in (False, True):
+            for name, method, path, body in CASES:
+                specific = "{" in path or body is not None
+                for level in COMPANY_LEVELS if specific else (None,):
+                    company = companies[level] if level else {}
+                    case = f"{name}[{level}]" if level else name
+                    client.delete("/api/admin/cache")
+                    _current_case = case if record else None
+                    try:
+                        response = client.request(method, _fill(path, company), json=_fill(body, company))
+                    finally:
+                        _current_case = None
+                    if response.status_code >= 500:
+                        raise SystemExit(f"{case} failed with {response.status_code}: {response.text[:200]}")
+    return _statements
+
+def _describe(node):
+    parts = [node["Node Type"]]
+    for key in ("Join Type", "Strategy", "Relation Name", "Index Name", "CTE Name", "Parent Relationship"):
+        if key in node:
+            parts.append(f"{key.split()[0].lower()}={node[key]}")
+    children = [_describe(child) for child in node.get("Plans", [])]
+    return f"{' '.join(parts)}({', '.join(children)})" if children else " ".join(parts)
+
+def explain(cursor, statement):
+    """Run EXPLAIN (ANALYZE, BUFFERS) and reduce the plan to shape, cost and buffers"""
+    cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}")
+    row = cursor.fetchone()
+    result = (row["QUERY PLAN"] if isinstance(row, dict) else row[0])[0]
+    plan = result["Plan"]
+    shape = _describe(plan)
+    return {
+        "fingerprint": hashlib.sha1(shape.encode()).hexdigest()[:16],
+        "shape": shape,
+        "total_cost": plan["Total Cost"],
+        "buffers": plan.get("Shared Hit Blocks", 0) + plan.get("Shared Read Blocks", 0),
+        "execution_ms": round(result["Execution Time"], 3),
+        "seq_scans": sorted(set(re.findall(r"Seq Scan relation=(\w+)", shape))),
+    }
+
+def explain_all(statements):
+    plans = {}
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        for case, recorded in statements.items():
+            for position, (template, statement) in enumerate(recorded, start=1):
+                plan = explain(cursor, statement)
+                plan["sql_hash"] = hashlib.sha1(" ".join(template.split()).encode()).hexdigest()[:16]
+                plan["statement"] = " ".join(statement.split())[:300]
+                plans[f"{case}#{position}"] = plan
+                # EXPLAIN ANALYZE runs the statement; never keep its effects
+                conn.rollback()
+        cursor.close()
+    return plans
+
+def compare(plans, baseline, threshold):
+    """Return a list of (key, problem) for plans that regressed against the baseline"""
+    problems = []
+    for key, before in baseline["plans"].items():
+        after = plans.get(key)
+        if after is None:
+            problems.append((key, "statement no longer issued"))
+            continue
+        changed_sql = " (SQL text changed)" if after["sql_hash"] != before["sql_hash"] else ""
+        if after["fingerprint"] != before["fingerprint"]:
+            problems.append((key, f"plan shape changed{changed_sql}:\n    before: {before['shape']}\n    after:  {after['shape']}"))
+        for metric in ("total_cost", "buffers"):
+            if before[metric] and after[metric] > before[metric] * (1 + threshold):
+                problems.append((key, f"{metric} {before[metric]} -> {after[metric]}{changed_sql}"))
+    for key in plans.keys() - baseline["plans"].keys():
+        print(f"new statement without baseline: {key}")
+    return problems
+
+def main(args):
+    init_db_pool(connection_factory=RecordingConnection)
+    with db_connection() as conn:
+        companies = pick_companies(conn)
+        dataset = _dataset(conn)
+
+    statements = capture_statements(companies)
+    plans = explain_all(statements)
+
+    print(f"{'statement':<44} {'cost':>12} {'buffers':>9} {'ms':>9}  seq scans")
+    for key, plan in plans.items():
+        print(f"{key:<44} {plan['total_cost']:>12.1f} {plan['buffers']:>9} {plan['execution_ms']:>9.2f}  {', '.join(plan['seq_scans'])}")
+
+    result = {"dataset": dataset, "companies": companies, "plans": plans}
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"Saved {len(plans)} plans to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["dataset"] != dataset:
+            raise SystemExit(f"Baseline was captured on a different dataset ({baseline['dataset']} vs {dataset})")
+        problems = compare(plans, baseline, args.threshold)
+        for key, problem in problems:
+            print(f"{key}: {problem}")
+        if problems:
+            print(f"{len(problems)} plan regression(s)")
+            sys.exit(1)
+        print(f"{len(baseline['plans'])} plans match the baseline")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--save", help="Write the captured plans to this file")
+    parser.add_argument("--baseline", help="Compare with plans saved earlier")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed growth of cost and buffers")
+    try:
+        main(parser.parse_args())
+    finally:
+        close_db_pool()
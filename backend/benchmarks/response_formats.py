@@ -0,0 +1,130 @@
+# benchmarks/response_formats.py
+"""
+Compare JSON against the columnar encodings for large analytical payloads.
+
+For each requested number of companies the script runs the
+/api/company-bids-analysis query for that many of the busiest bidders and
+measures, from the fetched rows:
+
+- json    - dict rows rendered the way the endpoint renders them
+- arrow   - Arrow IPC stream from the column tuples (needs pyarrow)
+- msgpack - msgpack columns, floats as raw float64 (needs msgpack)
+
+Encode times exclude the query itself. Sizes are reported raw and gzipped
+(what a compressing proxy would send).
+
+Usage:
+    python -m benchmarks.response_formats --companies 5 50 300 --repeat 5
+"""
+import argparse
+import gzip
+import json
+import statistics
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.database import db_connection, close_db_pool, _fetch_columns
+from app.utils import columnar
+
+ANALYSIS_SQL = """
+    WITH company_bids AS (
+        SELECT b.project_id, b.tin AS company_tin, b.company AS company_name, b.bid
+        FROM public_data.thai_project_bid_info b
+        WHERE b.tin = ANY(%s)
+    )
+    SELECT
+        p.project_id,
+        p.project_name,
+        p.winner,
+        p.winner_tin,
+        p.sum_price_agree,
+        p.price_build,
+        TO_CHAR(p.transaction_date, 'YYYY-MM-DD') as transaction_date,
+        TO_CHAR(p.contract_date, 'YYYY-MM-DD') as contract_date,
+        cb.company_tin,
+        cb.company_name,
+        cb.bid,
+        COALESCE(
+            CASE WHEN p.price_build > 0 THEN (p.sum_price_agree / p.price_build - 1) ELSE NULL END,
+            -0.05
+        ) AS price_cut,
+        COALESCE(p.winner_tin = cb.company_tin, FALSE) AS is_winner
+    FROM public_data.thai_govt_project p
+    JOIN company_bids cb ON p.project_id = cb.project_id
+    WHERE p.project_name IS NOT NULL
+    ORDER BY COALESCE(p.contract_date, p.transaction_date) DESC NULLS LAST
+"""
+
+def busiest_companies(conn, count):
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        SELECT tin FROM public_data.thai_project_bid_info
+        WHERE tin IS NOT NULL
+        GROUP BY tin
+        ORDER BY COUNT(*) DESC
+        LIMIT %s
+        """,
+        (count,)
+    )
+    tins = [row["tin"] for row in cursor.fetchall()]
+    cursor.close()
+    return tins
+
+def _time(func, repeat):
+    samples = []
+    body = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return body, round(statistics.median(samples), 3)
+
+def main(args):
+    encoders = {
+        "json": lambda rows, description, columns: JSONResponse(jsonable_encoder([dict(row) for row in rows])).body,
+    }
+    if columnar.pyarrow is not None:
+        encoders["arrow"] = lambda rows, description, columns: columnar.columnar_response("arrow", description, columns).body
+    if columnar.msgpack is not None:
+        encoders["msgpack"] = lambda rows, description, columns: columnar.columnar_response("msgpack", description, columns).body
+
+    results = []
+    with db_connection() as conn:
+        for count in args.companies:
+            tins = busiest_companies(conn, count)
+            cursor = conn.cursor()
+            cursor.execute(ANALYSIS_SQL, (tins,))
+            rows = cursor.fetchall()
+            cursor.close()
+            description, columns = _fetch_columns(conn, ANALYSIS_SQL, (tins,))
+
+            result = {"companies": len(tins), "rows": len(rows)}
+            for name, encode in encoders.items():
+                body, ms = _time(lambda: encode(rows, description, columns), args.repeat)
+                result[name] = {"encode_ms": ms, "bytes": len(body), "gzip_bytes": len(gzip.compress(body))}
+            results.append(result)
+
+    print(f"{'companies':>9} {'rows':>8} {'format':>8} {'encode ms':>10} {'bytes':>10} {'gzip':>10}")
+    for r in results:
+        for name in encoders:
+            f = r[name]
+            print(
+                f"{r['companies']:>9} {r['rows']:>8} {name:>8} "
+                f"{f['encode_ms']:>10.3f} {f['bytes']:>10} {f['gzip_bytes']:>10}"
+            )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--companies", type=int, nargs="+", default=[5, 50, 300], help="Numbers of companies to analyze")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    try:
+        main(parser.parse_args())
+    finally:
+        close_db_pool()
@@ -0,0 +1,82 @@
+# benchmarks/row_pipeline.py
+"""
+Compare the dict row pipeline with the tuple row pipeline on the
+/api/company-bids-analysis query.
+
+- legacy - RealDictCursor.fetchall(), a dict(row) copy per row, then
+  jsonable_encoder + JSONResponse (what the endpoint used to do)
+- lean   - server-side cursor, fetchmany batches of tuples rendered by
+  render_query_json (what the endpoint does now)
+
+Both bodies are checked to be byte-identical. Time includes the query;
+peak memory is the Python heap measured by tracemalloc (libpq's own result
+buffer is not visible to it, and the lean path only ever holds one batch).
+
+Usage:
+    python -m benchmarks.row_pipeline --companies 50 300 --repeat 3
+"""
+import sys
+import argparse
+import statistics
+import time
+import tracemalloc
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.database import db_connection, close_db_pool
+from app.utils.serialization import render_query_json
+from benchmarks.response_formats import ANALYSIS_SQL, busiest_companies
+
+def legacy(conn, tins):
+    cursor = conn.cursor()
+    cursor.execute(ANALYSIS_SQL, (tins,))
+    rows = cursor.fetchall()
+    cursor.close()
+    return JSONResponse(jsonable_encoder([dict(row) for row in rows])).body
+
+def lean(conn, tins):
+    return render_query_json(conn, ANALYSIS_SQL, (tins,))
+
+def _measure(func, conn, tins, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = func(conn, tins)
+        samples.append((time.perf_counter() - started) * 1000)
+        conn.rollback()
+
+    tracemalloc.start()
+    func(conn, tins)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    conn.rollback()
+    return body, round(statistics.median(samples), 1), peak
+
+def main(args):
+    failures = 0
+    print(f"{'companies':>9} {'rows':>8} {'pipeline':>8} {'ms':>9} {'peak MB':>9} {'bytes':>10}")
+    with db_connection() as conn:
+        for count in args.companies:
+            tins = busiest_companies(conn, count)
+            bodies = {}
+            for name, func in (("legacy", legacy), ("lean", lean)):
+                body, ms, peak = _measure(func, conn, tins, args.repeat)
+                bodies[name] = body
+                rows = body.count(b'{"project_id":')
+                print(f"{len(tins):>9} {rows:>8} {name:>8} {ms:>9.1f} {peak / 2**20:>9.1f} {len(body):>10}")
+            if bodies["legacy"] != bodies["lean"]:
+                failures += 1
+                print(f"{len(tins)} companies: bodies differ")
+
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--companies", type=int, nargs="+", default=[50, 300], help="Numbers of companies to analyze")
+    parser.add_argument("--repeat", type=int, default=3)
+    try:
+        main(parser.parse_args())
+    finally:
+        close_db_pool()
@@ -0,0 +1,115 @@
+# benchmarks/serialization.py
+"""
+Conformance check and timing of the compiled JSON encoders.
+
+Every response model rendered with `fast_json` / `cached(..., fast=True)`
+is checked for byte-identical output against `render_json` (pydantic
+validation plus Starlette's JSON encoding, i.e. what FastAPI sends) on live
+rows: the company projects of the busiest bidders, the top company projects
+and every company_bid_summary row, also as a RowSet of tuples. Then both
+renderers are timed on them. Exits non-zero on any mismatch.
+
+The edge cases (escapes, Thai and non-BMP text, control characters, Decimal
+and integral values, -0.0, large and tiny floats, missing optional fields,
+extra keys and invalid rows) are covered without a database by
+tests/test_serialization.py.
+
+Usage:
+    python -m benchmarks.serialization [--companies 20] [--repeat 5]
+"""
+import sys
+import argparse
+import statistics
+import time
+from typing import List
+
+from app.database import db_connection, close_db_pool, RowSet
+from app.models import CompanyProject, CompanyWinRate
+from app.routers.search import _load_company_projects, _split_sort_key
+from app.utils.serialization import render_json, render_json_fast, compile_json_encoder
+
+PROJECTS = List[CompanyProject]
+WIN_RATES = List[CompanyWinRate]
+
+def live_rows(conn, companies):
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        SELECT tin FROM public_data.thai_project_bid_info
+        WHERE tin IS NOT NULL
+        GROUP BY tin ORDER BY COUNT(*) DESC LIMIT %s
+        """,
+        (companies,)
+    )
+    tins = [row["tin"] for row in cursor.fetchall()]
+    projects = []
+    for tin in tins:
+        rows, _ = _load_company_projects(conn, tin)
+        projects.extend(_split_sort_key(row)[0] for row in rows)
+
+    cursor.execute(
+        """
+        SELECT p.winner, p.project_name, p.sum_price_agree,
+               TO_CHAR(p.transaction_date, 'YYYY-MM-DD') as transaction_date,
+               TO_CHAR(p.contract_date, 'YYYY-MM-DD') as contract_date
+        FROM public_data.thai_govt_project p
+        WHERE p.winner IS NOT NULL AND p.project_name IS NOT NULL AND p.sum_price_agree > 0
+        """
+    )
+    top_projects = [dict(row) for row in cursor.fetchall()]
+
+    cursor.execute(
+        """
+        SELECT tin, company, total_bids, wins, win_rate,
+               total_bid_value, avg_bid, avg_bid_ratio
+        FROM public_data.company_bid_summary
+        WHERE total_bid_value IS NOT NULL AND avg_bid IS NOT NULL AND avg_bid_ratio IS NOT NULL
+        """
+    )
+    win_rates = [dict(row) for row in cursor.fetchall()]
+    cursor.close()
+    return {"company_projects": (PROJECTS, projects), "top_projects": (PROJECTS, top_projects), "win_rates": (WIN_RATES, win_rates)}
+
+def _time(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(samples), 3)
+
+def main(args):
+    failures = 0
+
+    with db_connection() as conn:
+        datasets = live_rows(conn, args.companies)
+
+    print(f"{'dataset':>20} {'rows':>7} {'same':>5} {'pydantic ms':>12} {'compiled ms':>12}")
+    for name, (model, rows) in datasets.items():
+        expected = render_json(rows, model)
+        # The compiled encoder itself, not the fallback, must produce the bytes
+        identical = compile_json_encoder(model)(rows) == expected and render_json_fast(rows, model) == expected
+        # Same rows as tuples, where every row has the same keys
+        columns = tuple(rows[0]) if rows else ()
+        if all(tuple(row) == columns for row in rows):
+            rowset = RowSet(columns, [tuple(row.values()) for row in rows])
+            identical = identical and compile_json_encoder(model, columns)(rowset.rows) == expected
+        failures += not identical
+        print(
+            f"{name:>20} {len(rows):>7} {str(identical):>5} "
+            f"{_time(lambda: render_json(rows, model), args.repeat):>12.3f} "
+            f"{_time(lambda: render_json_fast(rows, model), args.repeat):>12.3f}"
+        )
+
+    if failures:
+        print(f"{failures} conformance failure(s)")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--companies", type=int, default=20, help="Busiest bidders whose projects are rendered")
+    parser.add_argument("--repeat", type=int, default=5)
+    try:
+        main(parser.parse_args())
+    finally:
+        close_db_pool()
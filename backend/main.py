@@ -1,12 +1,18 @@
 # main.py
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import logging
 import os
 from dotenv import load_dotenv
 
 # Import your routers
-from app.routers import projects, search, winrates, diagnostic
+from app.routers import projects, search, winrates, diagnostic, admin, dashboard, metrics
+from app.database import init_db_pool, close_db_pool, init_db_executor, close_db_executor, monitor_replicas
+from app.services.refresh import refresh_loop
+from app.utils.env import get_metrics_config, get_tracing_config
+from app.utils.metrics import MetricsMiddleware
+from app.utils.tracing import TracingMiddleware
 
 # Load environment variables
 load_dotenv()
@@ -32,13 +38,53 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
+    expose_headers=["X-Next-Cursor", "Link"],  # Pagination headers readable by the frontend
 )
 
+# Request latency and response size per route, served at /metrics
+if get_metrics_config()["enabled"]:
+    app.add_middleware(MetricsMiddleware)
+
+# Per-request span trees, Server-Timing headers (see app/utils/tracing.py)
+if get_tracing_config()["enabled"]:
+    app.add_middleware(TracingMiddleware)
+
+@app.on_event("startup")
+async def startup():
+    """
+    Create the database connection pool and executor once for the lifetime of the app.
+    """
+    init_db_executor()
+    try:
+        init_db_pool()
+    except Exception as e:
+        # Keep serving; db_connection() retries pool creation on first use
+        logger.error(f"Could not create database pool at startup: {str(e)}")
+
+    # Build/refresh the derived analytics stores in the background
+    app.state.refresh_task = asyncio.create_task(refresh_loop())
+
+    # Keep the read replicas' availability and lag current (returns at once without DB_REPLICAS)
+    app.state.replica_task = asyncio.create_task(monitor_replicas())
+
+@app.on_event("shutdown")
+async def shutdown():
+    """
+    Stop background refreshes, drain the database executor and close all pooled connections.
+    """
+    app.state.refresh_task.cancel()
+    app.state.replica_task.cancel()
+    close_db_executor()
+    close_db_pool()
+
 # Include routers
 app.include_router(projects.router)
 app.include_router(search.router)
 app.include_router(winrates.router)
 app.include_router(diagnostic.router)
+app.include_router(admin.router)
+app.include_router(dashboard.router)
+app.include_router(metrics.router)
 
 @app.get("/")
 async def root():
@@ -0,0 +1,93 @@
+# manage.py
+"""
+Maintenance commands for the backend.
+
+Usage:
+    python manage.py refresh-summaries [--full]
+    python manage.py summary-status
+    python manage.py build-graph [--full] [--path PATH]
+    python manage.py migrate [--benchmark] [--status]
+"""
+import argparse
+import json
+import logging
+
+from app.database import db_connection, close_db_pool
+from app.services.refresh import ensure_all, refresh_all, check_change_capture
+from app.services.company_summary import get_company_summary_status
+from app.services.project_rollup import get_project_rollup_status
+from app.services.bid_ratio_sketch import get_bid_ratio_sketch_status
+from app.services.cobid_graph import refresh_cobid_graph
+from app.services.migrations import migrate as apply_migrations, get_schema_status
+from app.utils.env import get_cobid_graph_config
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+
+def _prepare_stores(conn):
+    ensure_all(conn)
+    if not check_change_capture(conn):
+        raise SystemExit("The change log is not installed; run `python manage.py migrate` first")
+
+def refresh_summaries(args):
+    with db_connection() as conn:
+        _prepare_stores(conn)
+        return refresh_all(conn, full=args.full)
+
+def summary_status(args):
+    with db_connection() as conn:
+        return {
+            "company_summary": get_company_summary_status(conn),
+            "project_rollup": get_project_rollup_status(conn),
+            "bid_ratio_sketch": get_bid_ratio_sketch_status(conn),
+        }
+
+def build_graph(args):
+    path = args.path or get_cobid_graph_config()["path"]
+    with db_connection() as conn:
+        _prepare_stores(conn)
+        return refresh_cobid_graph(conn, path, full=args.full)
+
+def migrate(args):
+    with db_connection() as conn:
+        if args.status:
+            return get_schema_status(conn)
+        # Some indexes are on tables the derived stores create
+        ensure_all(conn)
+        return apply_migrations(conn, benchmark=args.benchmark, repeat=args.repeat)
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    refresh = subparsers.add_parser("refresh-summaries", help="Bring the derived analytics stores up to date")
+    refresh.add_argument("--full", action="store_true", help="Rebuild from scratch instead of applying logged changes")
+    refresh.set_defaults(func=refresh_summaries)
+
+    status = subparsers.add_parser("summary-status", help="Show refresh time and staleness of the derived stores")
+    status.set_defaults(func=summary_status)
+
+    graph = subparsers.add_parser("build-graph", help="Build or update the persisted co-bidding graph")
+    graph.add_argument("--full", action="store_true", help="Rebuild from the bid table instead of applying logged changes")
+    graph.add_argument("--path", help="Output file (default: COBID_GRAPH_PATH)")
+    graph.set_defaults(func=build_graph)
+
+    migrations = subparsers.add_parser(
+        "migrate", help="Install the change capture triggers and create the indexes the queries need"
+    )
+    migrations.add_argument("--status", action="store_true", help="Only report applied/pending migrations and index state")
+    migrations.add_argument("--benchmark", action="store_true", help="Time each migration's queries before and after it")
+    migrations.add_argument("--repeat", type=int, default=5, help="Timed runs per benchmark query")
+    migrations.set_defaults(func=migrate)
+
+    args = parser.parse_args()
+    try:
+        result = args.func(args)
+        print(json.dumps(result, indent=2, default=str))
+    finally:
+        close_db_pool()
+
+if __name__ == "__main__":
+    main()
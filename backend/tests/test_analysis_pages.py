@@ -0,0 +1,37 @@
+# tests/test_analysis_pages.py
+"""Raw-row pages of /api/company-bids-analysis rendered from row batches"""
+import json
+import pytest
+from app.routers import winrates
+from app.utils.serialization import render_rows_json
+
+COLUMNS = ("project_id", "bid")
+
+def _batched_rows(total, batch_size=5000):
+    # Stands in for iter_row_batches: a query returning `total` rows
+    def iter_row_batches(conn, query, params=None):
+        for start in range(0, total, batch_size):
+            yield COLUMNS, [(f"P{index}", index) for index in range(start, min(start + batch_size, total))]
+    return iter_row_batches
+
+@pytest.mark.parametrize("limit", [5000, 10000])
+@pytest.mark.parametrize("extra", [1, 0])
+def test_page_at_batch_boundary_is_valid_json(monkeypatch, limit, extra):
+    # The query asks for limit + 1 rows; with fewer the page is the last one
+    monkeypatch.setattr(winrates, "iter_row_batches", _batched_rows(limit + extra))
+    body, last, more = winrates._render_analysis_page(None, "", {}, limit)
+    rows = json.loads(body)
+    assert len(rows) == limit
+    assert more is bool(extra)
+    assert last == {"project_id": f"P{limit - 1}", "bid": limit - 1}
+
+def test_page_shorter_than_limit(monkeypatch):
+    monkeypatch.setattr(winrates, "iter_row_batches", _batched_rows(7))
+    body, last, more = winrates._render_analysis_page(None, "", {}, 10000)
+    assert len(json.loads(body)) == 7
+    assert not more and last["bid"] == 6
+
+def test_render_rows_json_skips_empty_batches():
+    body = render_rows_json([(("a",), [(1,), (2,)]), (("a",), []), (("a",), [(3,)])])
+    assert body == b'[{"a":1},{"a":2},{"a":3}]'
+    assert render_rows_json([(("a",), [])]) == b"[]"
@@ -0,0 +1,120 @@
+# tests/test_cobid_graph.py
+"""The co-bidding graph against the SQL-path rules in app/services/h2h.py"""
+import random
+import pytest
+from app.services.cobid_graph import CoBidGraph
+from app.services.h2h import compute_head_to_head, head_to_head_from_graph
+
+NAMES = {
+    "T01": ["Alpha"],
+    "T02": ["Beta", "Beta Co"],          # one TIN, two names
+    "T03": [None, "Gamma"],              # a null name
+    "T04": ["Delta"],
+    "T05": ["Epsilon", "EPSILON", "Eps"],
+    "T06": ["Zeta"],
+    "T07": ["Eta"],
+    "T08": ["Theta"],
+}
+
+def _bids(seed=7, projects=300):
+    """
+    Joined bid rows: (project_id, tin, company, winner_tin).
+
+    Covers duplicate bid rows (including duplicate winning rows), companies
+    bidding under several names on one project, winners that did not bid,
+    projects without a winner and bids without a TIN.
+    """
+    rng = random.Random(seed)
+    tins = sorted(NAMES)
+    rows = []
+    for index in range(projects):
+        project_id = f"P{index:04d}"
+        bidders = rng.sample(tins, rng.randint(1, 5))
+        winner = rng.choice(bidders + ["T99", None])
+        for tin in bidders:
+            for _ in range(rng.choice([1, 1, 1, 2])):
+                rows.append((project_id, tin, rng.choice(NAMES[tin]), winner))
+        if rng.random() < 0.1:
+            rows.append((project_id, None, "Unknown", winner))
+    return rows
+
+def _graph_rows(bids):
+    # BID_ROWS_SQL drops bids without a TIN
+    return [row for row in bids if row[1] is not None]
+
+def _project_bidders(bids, company_tin):
+    # What load_project_bidders returns for company_tin
+    projects = {row[0] for row in bids if row[1] == company_tin}
+    return [
+        (project_id, tin, company, 1 if tin is not None and tin == winner else 0)
+        for project_id, tin, company, winner in bids
+        if project_id in projects
+    ]
+
+def _adjacent(bids, company_tin):
+    # The adjacent-companies query: distinct shared projects per (TIN, name)
+    projects = {row[0] for row in bids if row[1] == company_tin}
+    shared = {}
+    for project_id, tin, company, _ in bids:
+        if project_id in projects and tin is not None and tin != company_tin:
+            shared.setdefault((tin, company), set()).add(project_id)
+    ranked = sorted(shared.items(), key=lambda item: (-len(item[1]), item[0][0], item[0][1] is None, item[0][1] or ""))
+    return [(tin, company, len(projects)) for (tin, company), projects in ranked]
+
+def _neighbors(graph, company_tin, limit=None):
+    return [(n["tin"], n["company"], n["encounters"]) for n in graph.neighbors(company_tin, limit=limit)]
+
+@pytest.fixture
+def bids():
+    return _bids()
+
+@pytest.fixture
+def graph(bids):
+    graph = CoBidGraph()
+    graph.build(_graph_rows(bids), batch_projects=37)
+    return graph
+
+@pytest.mark.parametrize("company_tin", sorted(NAMES))
+@pytest.mark.parametrize("top_n", [3, 10 ** 9])
+def test_head_to_head_matches_sql_path(bids, graph, company_tin, top_n):
+    expected = compute_head_to_head(_project_bidders(bids, company_tin), company_tin, top_n)
+    assert expected
+    assert head_to_head_from_graph(graph, company_tin, top_n) == expected
+
+@pytest.mark.parametrize("company_tin", sorted(NAMES))
+def test_adjacent_companies_match_sql_path(bids, graph, company_tin):
+    assert _neighbors(graph, company_tin) == _adjacent(bids, company_tin)
+    assert _neighbors(graph, company_tin, limit=20) == _adjacent(bids, company_tin)[:20]
+
+def test_unknown_company_has_no_neighbors(graph):
+    assert graph.neighbors("T99") == []
+    assert head_to_head_from_graph(graph, "T99", 5) == []
+
+def test_incremental_update_matches_full_build(bids):
+    before = _graph_rows(_bids(seed=3))
+    after = _graph_rows(bids)
+    graph = CoBidGraph()
+    graph.build(before)
+
+    # Every project touched by either version, plus one that only appears now
+    changed = sorted({row[0] for row in before} ^ {row[0] for row in after} | {f"P{i:04d}" for i in range(0, 300, 3)})
+    graph.apply_project_changes(changed, [row for row in after if row[0] in set(changed)])
+    unchanged = set(changed)
+    graph.apply_project_changes(
+        sorted({row[0] for row in after} - unchanged),
+        [row for row in after if row[0] not in unchanged],
+    )
+
+    for company_tin in NAMES:
+        assert _neighbors(graph, company_tin) == _adjacent(bids, company_tin)
+        expected = compute_head_to_head(_project_bidders(bids, company_tin), company_tin, 10 ** 9)
+        assert head_to_head_from_graph(graph, company_tin, 10 ** 9) == expected
+
+def test_save_and_load_roundtrip(tmp_path, bids, graph):
+    path = str(tmp_path / "graph.npz")
+    graph.last_change_id = 42
+    graph.save(path)
+    loaded = CoBidGraph.load(path)
+    assert loaded.last_change_id == 42
+    for company_tin in NAMES:
+        assert loaded.neighbors(company_tin) == graph.neighbors(company_tin)
@@ -0,0 +1,52 @@
+# tests/test_company_directory.py
+"""Company name resolution: directory first, then the bid table"""
+import pytest
+from app.services import company_directory
+from app.services.company_directory import (
+    CompanyDirectory, CANONICAL_NAME_SQL, ANY_BID_NAME_SQL, company_name_for_tin,
+)
+
+class FakeCursor:
+    """Answers the name queries from in-memory bid rows of (tin, company, bid)"""
+
+    def __init__(self, bids):
+        self.bids = bids
+        self.queries = []
+        self._row = None
+
+    def execute(self, query, params):
+        self.queries.append(query)
+        (tin,) = params
+        positive_only = query == CANONICAL_NAME_SQL
+        counts = {}
+        for bid_tin, company, bid in self.bids:
+            if bid_tin == tin and company is not None and (not positive_only or (bid or 0) > 0):
+                counts[company] = counts.get(company, 0) + 1
+        best = min(counts.items(), key=lambda item: (-item[1], item[0]), default=None)
+        self._row = {"company": best[0]} if best else None
+
+    def fetchone(self):
+        return self._row
+
+@pytest.fixture(autouse=True)
+def directory(monkeypatch):
+    # The directory only holds TINs with positive bids, like company_bid_summary
+    monkeypatch.setattr(company_directory, "_directory", CompanyDirectory({"T1": [("Alpha", 3)]}, version=1))
+
+def test_name_from_directory_skips_the_database():
+    cursor = FakeCursor([])
+    assert company_name_for_tin(cursor, "T1") == "Alpha"
+    assert cursor.queries == []
+
+def test_positive_bids_pick_the_canonical_name():
+    cursor = FakeCursor([("T2", "Beta", 10), ("T2", "Beta Zero", 0), ("T2", "Beta Zero", 0)])
+    assert company_name_for_tin(cursor, "T2") == "Beta"
+    assert cursor.queries == [CANONICAL_NAME_SQL]
+
+def test_tin_with_only_zero_bids_still_has_a_name():
+    cursor = FakeCursor([("T3", "Gamma", 0), ("T3", "Gamma Ltd", None), ("T3", "Gamma", 0)])
+    assert company_name_for_tin(cursor, "T3") == "Gamma"
+    assert cursor.queries == [CANONICAL_NAME_SQL, ANY_BID_NAME_SQL]
+
+def test_unknown_tin_has_no_name():
+    assert company_name_for_tin(FakeCursor([("T2", "Beta", 10)]), "T9") is None
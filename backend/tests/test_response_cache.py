@@ -0,0 +1,51 @@
+# tests/test_response_cache.py
+"""Response cache invalidation across workers sharing one database"""
+import pytest
+from app.services import cache as cache_module, refresh
+from app.services.cache import ResponseCache
+
+class FakeConnection:
+    def cursor(self):
+        return self
+
+    def close(self):
+        pass
+
+    def rollback(self):
+        pass
+
+@pytest.fixture
+def consumer_state(monkeypatch):
+    # The analytics_refresh_state table every worker reads
+    state = {consumer: 10 for consumer in refresh.CACHE_CONSUMERS}
+
+    def get_consumer_state(cursor, consumer):
+        return {"consumer": consumer, "last_change_id": state[consumer]}
+
+    monkeypatch.setattr(refresh, "get_consumer_state", get_consumer_state)
+    return state
+
+def _worker(monkeypatch):
+    worker = ResponseCache(1024, {"head_to_head": 600})
+    monkeypatch.setattr(cache_module, "_cache", worker)
+    refresh.sync_response_cache(FakeConnection())
+    worker.put("head_to_head", "k", b"old", version=worker.version)
+    return worker
+
+def test_idle_worker_drops_entries_after_another_worker_refreshed(monkeypatch, consumer_state):
+    worker = _worker(monkeypatch)
+    assert refresh.sync_response_cache(FakeConnection()) == 0
+    assert worker.get("head_to_head", "k") == (b"old", {})
+
+    # Another worker applied changes: the summary watermark moved in the database
+    consumer_state[refresh.CACHE_CONSUMERS[0]] = 11
+    assert refresh.sync_response_cache(FakeConnection()) == 1
+    assert worker.get("head_to_head", "k") is None
+
+def test_body_rendered_across_a_version_change_is_not_stored(monkeypatch, consumer_state):
+    worker = _worker(monkeypatch)
+    version = worker.version
+    consumer_state[refresh.CACHE_CONSUMERS[-1]] = 12
+    refresh.sync_response_cache(FakeConnection())
+    worker.put("head_to_head", "k2", b"rendered from old data", version=version)
+    assert worker.get("head_to_head", "k2") is None
@@ -0,0 +1,71 @@
+# tests/test_serialization.py
+"""Compiled JSON encoders against render_json (what FastAPI sends) on edge-case rows"""
+from decimal import Decimal
+from typing import List
+import pytest
+from app.database import RowSet
+from app.models import CompanyProject, CompanyWinRate
+from app.utils.serialization import render_json, render_json_fast, compile_json_encoder
+
+PROJECTS = List[CompanyProject]
+WIN_RATES = List[CompanyWinRate]
+
+SYNTHETIC_PROJECTS = [
+    {"winner": "บริษัท ทดสอบ จำกัด", "project_name": 'quote " backslash \\ slash /', "sum_price_agree": Decimal("1234567.89")},
+    {"winner": "tab\tnewline\ncr\r", "project_name": "\x00\x01\x1f\x7f", "sum_price_agree": 0,
+     "transaction_date": "2024-01-02", "contract_date": None},
+    {"winner": "emoji \U0001f600 \u2028 \u2029", "project_name": "\u200b\ufeff\u3000", "sum_price_agree": -0.0,
+     "contract_date": "2024-12-31", "unexpected": "ignored"},
+    {"winner": "", "project_name": "x", "sum_price_agree": Decimal("1E+16")},
+    {"winner": "a", "project_name": "b", "sum_price_agree": 1e-7},
+    {"winner": "a", "project_name": "b", "sum_price_agree": Decimal("123456789.123456789123456789")},
+    {"winner": "a", "project_name": "b", "sum_price_agree": 12345678901234567890},
+    {"winner": "a", "project_name": "b", "sum_price_agree": True},
+    {"winner": "a", "project_name": "b", "sum_price_agree": "1.5"},
+]
+
+SYNTHETIC_WIN_RATES = [
+    {"tin": "0105", "company": "c", "total_bids": Decimal("3"), "wins": 2.0, "win_rate": Decimal("33.33"),
+     "total_bid_value": Decimal("0.1"), "avg_bid": 1, "avg_bid_ratio": 0.9999999999999999},
+    {"tin": "1", "company": "c", "total_bids": True, "wins": 0, "win_rate": 0,
+     "total_bid_value": 5e300, "avg_bid": -1.5, "avg_bid_ratio": Decimal("-0")},
+]
+
+INVALID = [
+    (PROJECTS, [{"winner": None, "project_name": "b", "sum_price_agree": 1}]),
+    (PROJECTS, [{"winner": "a", "project_name": 5, "sum_price_agree": 1}]),
+    (PROJECTS, [{"winner": "a", "project_name": "b"}]),
+    (PROJECTS, [{"winner": "a", "project_name": "b", "sum_price_agree": float("nan")}]),
+    (PROJECTS, [{"winner": "a", "project_name": "b", "sum_price_agree": "abc"}]),
+    (PROJECTS, [{"winner": "\ud800", "project_name": "b", "sum_price_agree": 1}]),
+    (WIN_RATES, [dict(SYNTHETIC_WIN_RATES[0], total_bids=2.5)]),
+]
+
+def _outcome(render, rows, model):
+    try:
+        return ("ok", render(rows, model))
+    except Exception as e:
+        return ("error", type(e).__name__)
+
+@pytest.mark.parametrize("model, rows", [
+    (PROJECTS, SYNTHETIC_PROJECTS),
+    (WIN_RATES, SYNTHETIC_WIN_RATES),
+])
+def test_compiled_encoder_is_byte_identical(model, rows):
+    expected = render_json(rows, model)
+    # The compiled encoder itself, not the fallback, must produce the bytes
+    assert compile_json_encoder(model)(rows) == expected
+    assert render_json_fast(rows, model) == expected
+
+@pytest.mark.parametrize("model, rows", [
+    (PROJECTS, [{key: row.get(key) for key in ("winner", "project_name", "sum_price_agree")} for row in SYNTHETIC_PROJECTS]),
+    (WIN_RATES, SYNTHETIC_WIN_RATES),
+])
+def test_tuple_rows_are_byte_identical(model, rows):
+    columns = tuple(rows[0])
+    rowset = RowSet(columns, [tuple(row[column] for column in columns) for row in rows])
+    assert compile_json_encoder(model, columns)(rowset.rows) == render_json(rows, model)
+
+@pytest.mark.parametrize("model, rows", INVALID)
+def test_invalid_rows_fail_the_same_way(model, rows):
+    assert _outcome(render_json_fast, rows, model) == _outcome(render_json, rows, model)
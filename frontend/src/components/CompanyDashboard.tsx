@@ -42,6 +42,9 @@ const CompanyDashboard: React.FC = () => {
   const [loading, setLoading] = useState<boolean>(false);
   const [error, setError] = useState<string | null>(null);
   const [analysisData, setAnalysisData] = useState<any[]>([]);
+  const [analysisSeries, setAnalysisSeries] = useState<any[]>([]);
+  const [analysisCursor, setAnalysisCursor] = useState<string | null>(null);
+  const [isLoadingMoreProjects, setIsLoadingMoreProjects] = useState<boolean>(false);
   const [isAnalysisLoading, setIsAnalysisLoading] = useState<boolean>(false);
 
   // Fetch company data
@@ -53,24 +56,20 @@ const CompanyDashboard: React.FC = () => {
       setError(null);
     
       try {
-        // Fetch company data
-        const response = await api.searchCompanies(selectedCompanyTin);
+        // Fetch every dashboard view of the company in one request
+        const response = await api.getCompanyDashboard(selectedCompanyTin);
         // Axios already parses JSON, so we can use response.data directly
         const data = response.data;
-        
-        if (data && data.length > 0) {
-          // Find the exact match
-          const matchedCompany = data.find((c: any) => c.tin === selectedCompanyTin);
-          if (matchedCompany) {
-            setCompanyData(matchedCompany);
-          }
+
+        if (data.overview) {
+          setCompanyData(data.overview);
+        }
+        setProjectsData(data.projects || []);
+        setAdjacentCompanies(data.adjacent_companies || []);
+
+        if (data.errors && Object.keys(data.errors).length > 0) {
+          console.warn('Some dashboard views failed to load:', data.errors);
         }
-        
-        // Fetch company projects
-        const projectsResponse = await api.getCompanyProjectsByTin(selectedCompanyTin);
-        // Same here, use .data directly
-        const projectsData = projectsResponse.data;
-        setProjectsData(projectsData || []);
         
         setLoading(false);
       } catch (err: any) {
@@ -96,6 +95,12 @@ const CompanyDashboard: React.FC = () => {
 const handleFindAdjacentCompanies = async () => {
   if (!selectedCompanyTin) return;
 
+  // Already loaded with the dashboard
+  if (adjacentCompanies.length > 0) {
+    setActiveTab('competitors');
+    return;
+  }
+
   setLoading(true);
   setError(null);
 
@@ -131,11 +136,16 @@ const handleFindAdjacentCompanies = async () => {
       // Include the main company TIN plus all selected adjacent company TINs
       const allCompanyTins = [selectedCompanyTin, ...selectedAdjacentTins];
       
-      // Use API service to call the endpoint
-      const response = await api.analyzeCompanyBids(allCompanyTins);
+      // Per-company totals for the chart, and the first page of bids for the table
+      const [totalsResponse, rowsResponse] = await Promise.all([
+        api.analyzeCompanyBids(allCompanyTins, { groupBy: 'company' }),
+        api.analyzeCompanyBids(allCompanyTins)
+      ]);
       
       // Set the analysis data for the component to use
-      setAnalysisData(response.data);
+      setAnalysisSeries(totalsResponse.data.series || []);
+      setAnalysisData(rowsResponse.data);
+      setAnalysisCursor(rowsResponse.headers['x-next-cursor'] || null);
       
       // Switch to analysis tab
       setActiveTab('analysis');
@@ -148,6 +158,23 @@ const handleFindAdjacentCompanies = async () => {
     }
   };
 
+  // Load the next page of bids into the projects table
+  const handleLoadMoreProjects = async () => {
+    if (!analysisCursor) return;
+
+    setIsLoadingMoreProjects(true);
+    try {
+      const allCompanyTins = [selectedCompanyTin, ...selectedAdjacentTins];
+      const response = await api.analyzeCompanyBids(allCompanyTins, { cursor: analysisCursor });
+      setAnalysisData(previous => [...previous, ...response.data]);
+      setAnalysisCursor(response.headers['x-next-cursor'] || null);
+    } catch (err: any) {
+      console.error('Error loading more projects:', err);
+      setError(err.response?.data?.detail || err.message || 'Error loading more projects');
+    }
+    setIsLoadingMoreProjects(false);
+  };
+
   // Available tabs configuration
   const tabs = [
     { id: 'overview' as TabId, label: 'Overview' },
@@ -218,6 +245,7 @@ const handleFindAdjacentCompanies = async () => {
         ) : activeTab === 'competitors' ? (
           <CompetitorsView
             adjacentCompanies={adjacentCompanies}
+            mainCompanyTin={selectedCompanyTin}
             mainCompanyName={selectedCompanyName}
             onCompanySelect={handleCompanySelect}
             onSelectionChange={handleAdjacentSelectionChange}
@@ -228,6 +256,10 @@ const handleFindAdjacentCompanies = async () => {
         ) : activeTab === 'analysis' ? (
           <CompetitorAnalysis
             analysisData={analysisData}
+            analysisSeries={analysisSeries}
+            hasMoreProjects={analysisCursor !== null}
+            isLoadingMoreProjects={isLoadingMoreProjects}
+            onLoadMoreProjects={handleLoadMoreProjects}
             mainCompanyName={selectedCompanyName}
             mainCompanyTin={selectedCompanyTin}
             competitors={adjacentCompanies.filter(company => 
@@ -27,8 +27,22 @@ interface ProjectBidData {
   is_winner: boolean;
 }
 
+// One company's totals from /api/company-bids-analysis with group_by=company
+interface CompanySeries {
+  company_tin: string;
+  company_name: string;
+  bids: number[];
+  wins: number[];
+  total_value: number[];
+  avg_price_cut: number[];
+}
+
 interface CompetitorAnalysisProps {
   analysisData: ProjectBidData[];
+  analysisSeries: CompanySeries[];
+  hasMoreProjects: boolean;
+  isLoadingMoreProjects: boolean;
+  onLoadMoreProjects: () => void;
   mainCompanyName: string;
   mainCompanyTin: string;
   competitors: AdjacentCompany[];
@@ -36,6 +50,10 @@ interface CompetitorAnalysisProps {
 
 const CompetitorAnalysis: React.FC<CompetitorAnalysisProps> = ({
   analysisData,
+  analysisSeries,
+  hasMoreProjects,
+  isLoadingMoreProjects,
+  onLoadMoreProjects,
   mainCompanyName,
   mainCompanyTin,
   competitors
@@ -63,46 +81,17 @@ const CompetitorAnalysis: React.FC<CompetitorAnalysisProps> = ({
     return map;
   }, [mainCompanyTin, mainCompanyName, competitors, analysisData]);
   
-  // Prepare chart data
+  // Prepare chart data from the per-company totals aggregated by the server
   const chartData = useMemo(() => {
     const data: any[] = [];
     
-    // Group projects by company
-    const companiesData = new Map<string, {
-      tin: string,
-      name: string,
-      projects: ProjectBidData[],
-      isMain: boolean
-    }>();
-    
-    // Initialize with default values for all companies
-    companyNamesMap.forEach((name, tin) => {
-      companiesData.set(tin, {
-        tin,
-        name,
-        projects: [],
-        isMain: tin === mainCompanyTin
-      });
-    });
-    
-    // Group projects by company
-    analysisData.forEach(project => {
-      const companyData = companiesData.get(project.company_tin);
-      if (companyData) {
-        companyData.projects.push(project);
-      }
-    });
-    
-    // Calculate metrics for each company
-    companiesData.forEach((companyData) => {
-      const { tin, name, projects, isMain } = companyData;
+    analysisSeries.forEach(series => {
+      const totalProjects = series.bids[0] || 0;
+      if (totalProjects === 0) return;
       
-      if (projects.length === 0) return;
-      
-      const totalProjects = projects.length;
-      const wins = projects.filter(p => p.is_winner).length;
-      const totalValue = projects.reduce((sum, p) => sum + p.sum_price_agree, 0);
-      const avgPriceCut = projects.reduce((sum, p) => sum + (p.price_cut || 0), 0) / totalProjects;
+      const wins = series.wins[0] || 0;
+      const totalValue = series.total_value[0] || 0;
+      const avgPriceCut = series.avg_price_cut[0] || 0;
       
       let value: number;
       
@@ -121,9 +110,9 @@ const CompetitorAnalysis: React.FC<CompetitorAnalysisProps> = ({
       }
       
       data.push({
-        name,
+        name: companyNamesMap.get(series.company_tin) || series.company_name,
         y: value,
-        isMain,
+        isMain: series.company_tin === mainCompanyTin,
         totalProjects,
         totalValue,
         avgPriceCut,
@@ -132,7 +121,7 @@ const CompetitorAnalysis: React.FC<CompetitorAnalysisProps> = ({
     });
     
     return data;
-  }, [analysisData, chartMetric, companyNamesMap, mainCompanyTin]);
+  }, [analysisSeries, chartMetric, companyNamesMap, mainCompanyTin]);
   
   // Handle changing the chart metric
   const handleChartMetricChange = (e: React.ChangeEvent<HTMLSelectElement>) => {
@@ -182,6 +171,18 @@ const CompetitorAnalysis: React.FC<CompetitorAnalysisProps> = ({
         companyNamesMap={companyNamesMap}
         mainCompanyTin={mainCompanyTin}
       />
+      
+      {hasMoreProjects && (
+        <div className="p-4 text-center">
+          <button
+            className="analyze-button"
+            onClick={onLoadMoreProjects}
+            disabled={isLoadingMoreProjects}
+          >
+            {isLoadingMoreProjects ? 'Loading...' : `Load more projects (${analysisData.length} shown)`}
+          </button>
+        </div>
+      )}
     </div>
   );
 };
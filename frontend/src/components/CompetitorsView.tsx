@@ -1,4 +1,5 @@
-import React from 'react';
+import React, { useState, useEffect } from 'react';
+import api from '../services/api';
 
 interface AdjacentCompany {
   tin: string;
@@ -9,8 +10,16 @@ interface AdjacentCompany {
   win_rate: number;
 }
 
+interface PairSummary {
+  shared_projects: number;
+  company_wins: number;
+  competitor_wins: number;
+  company_lower_bids: number;
+}
+
 interface CompetitorsViewProps {
   adjacentCompanies: AdjacentCompany[];
+  mainCompanyTin: string;
   mainCompanyName: string;
   onCompanySelect: (tin: string, companyName: string) => void;
   onSelectionChange: (selectedTins: string[]) => void;
@@ -21,6 +30,7 @@ interface CompetitorsViewProps {
 
 const CompetitorsView: React.FC<CompetitorsViewProps> = ({
   adjacentCompanies,
+  mainCompanyTin,
   mainCompanyName,
   onCompanySelect,
   onSelectionChange,
@@ -28,6 +38,38 @@ const CompetitorsView: React.FC<CompetitorsViewProps> = ({
   onAnalyzeCompetitors,
   isAnalysisLoading
 }) => {
+  const [pairSummaries, setPairSummaries] = useState<Record<string, PairSummary>>({});
+
+  // Head-to-head summaries for every card, fetched in one batched request
+  useEffect(() => {
+    if (!mainCompanyTin || adjacentCompanies.length === 0) return;
+
+    let cancelled = false;
+    const fetchSummaries = async () => {
+      try {
+        const response = await api.getCompetitorProjectsBatch(
+          mainCompanyTin,
+          adjacentCompanies.map(company => company.tin),
+          { includeSummary: true, includeProjects: false }
+        );
+        if (cancelled) return;
+        const summaries: Record<string, PairSummary> = {};
+        response.data.competitors.forEach((entry: { competitor_tin: string; summary: PairSummary }) => {
+          summaries[entry.competitor_tin] = entry.summary;
+        });
+        setPairSummaries(summaries);
+      } catch (err: any) {
+        console.error('Error fetching competitor summaries:', err);
+      }
+    };
+
+    setPairSummaries({});
+    fetchSummaries();
+    return () => {
+      cancelled = true;
+    };
+  }, [mainCompanyTin, adjacentCompanies]);
+
   const handleCompanyClick = (tin: string, companyName: string) => {
     onCompanySelect(tin, companyName);
   };
@@ -101,6 +143,20 @@ const CompetitorsView: React.FC<CompetitorsViewProps> = ({
                   <span className="detail-label">Win Rate</span>
                   <span className="detail-value">{company.win_rate.toFixed(1)}%</span>
                 </div>
+                {pairSummaries[company.tin] && (
+                  <>
+                    <div className="detail-item">
+                      <span className="detail-label">Head-to-Head (W-L)</span>
+                      <span className="detail-value">
+                        {pairSummaries[company.tin].company_wins}-{pairSummaries[company.tin].competitor_wins}
+                      </span>
+                    </div>
+                    <div className="detail-item">
+                      <span className="detail-label">Lower Bids</span>
+                      <span className="detail-value">{pairSummaries[company.tin].company_lower_bids}</span>
+                    </div>
+                  </>
+                )}
               </div>
             </div>
             
@@ -38,9 +38,21 @@ apiClient.interceptors.response.use(
 // API methods
 const api = {
   // Project data
-  async getMonthlyData(year?: number): Promise<any> {
+  async getMonthlyData(
+    year?: number,
+    options: {
+      startDate?: string;
+      endDate?: string;
+      granularity?: 'week' | 'month' | 'quarter' | 'year';
+      deptName?: string;
+    } = {}
+  ): Promise<any> {
     const params: any = {};
     if (year) params.year = year;
+    if (options.startDate) params.start_date = options.startDate;
+    if (options.endDate) params.end_date = options.endDate;
+    if (options.granularity) params.granularity = options.granularity;
+    if (options.deptName) params.dept_name = options.deptName;
     return apiClient.get('/api/data', { params });
   },
 
@@ -57,6 +69,11 @@ const api = {
     return apiClient.get(`/api/company-projects/${tin}`);
   },
 
+  // All dashboard views of one company in a single request
+  async getCompanyDashboard(tin: string, topN: number = 5): Promise<any> {
+    return apiClient.get(`/api/company-dashboard/${tin}`, { params: { top_n: topN } });
+  },
+
   async getAdjacentCompanies(tin: string): Promise<any> {
     return apiClient.get(`/api/adjacent-companies/${tin}`);
   },
@@ -67,6 +84,20 @@ const api = {
     });
   },
 
+  // Shared projects with several competitors in one request, grouped by competitor
+  async getCompetitorProjectsBatch(
+    companyTin: string,
+    competitorTins: string[],
+    options: { includeSummary?: boolean; includeProjects?: boolean } = {}
+  ): Promise<any> {
+    return apiClient.post('/api/competitor-projects', {
+      company_tin: companyTin,
+      competitor_tins: competitorTins,
+      include_summary: options.includeSummary ?? false,
+      include_projects: options.includeProjects ?? true
+    });
+  },
+
   // Win rates
   async getHeadToHead(companyTin: string, topN: number = 5): Promise<any> {
     return apiClient.get('/api/head-to-head', {
@@ -81,9 +112,21 @@ const api = {
   },
 
   // Add this to the api object in api.ts
-  async analyzeCompanyBids(companyTins: string[]): Promise<any> {
+  // Raw bid rows come in pages (cursor from the X-Next-Cursor header);
+  // with groupBy the database returns one aggregated series per company
+  async analyzeCompanyBids(
+    companyTins: string[],
+    options: {
+      groupBy?: 'company' | 'month' | 'quarter' | 'department' | 'price_cut';
+      limit?: number;
+      cursor?: string;
+    } = {}
+  ): Promise<any> {
     return apiClient.post('/api/company-bids-analysis', {
-      company_tins: companyTins
+      company_tins: companyTins,
+      ...(options.groupBy ? { group_by: options.groupBy } : {})
+    }, {
+      params: { limit: options.limit, cursor: options.cursor }
     });
   },
 
@@ -6,6 +6,8 @@ export interface ProjectData {
   year: number;
   total_sum_price_agree: number;
   count: number;
+  period?: string;
+  period_start?: string;
 }
 
 export interface ProjectInfo {
@@ -75,7 +77,7 @@ export interface DepartmentAnalysis {
   bids: number;
   wins: number;
   win_rate: number;
-  avg_bid_ratio: number;
+  avg_bid_ratio?: number;
 }
 
 export interface BidStrategyResponse {